@@ -0,0 +1,70 @@
+# Fast extraction of the visible text from html markup
+# Gives the same text as BeautifulSoup(markup, 'html.parser').get_text(), without building a document tree.
+# Entities are decoded with html.unescape, so unknown or unterminated entities may differ from BeautifulSoup.
+import html
+import re
+
+# https://docs.python.org/3/library/re.html
+# https://docs.python.org/3/library/html.html#html.unescape
+
+# markup which is not part of the visible text:
+# - elements whose content is hidden
+# - comments, declarations and processing instructions
+# - start and end tags; attribute values may contain '>'
+_markup = re.compile(
+    r'<(?P<hidden>script|style|template)\b[^>]*>.*?(?:</(?P=hidden)\s*>|\Z)'
+    r'|<!--.*?(?:-->|\Z)|<![^>]*>|<\?[^>]*>'
+    r'|</?(?P<tag>[a-zA-Z][^\s/>]*)[^>"\']*(?:(?:"[^"]*"|\'[^\']*\')[^>"\']*)*>',
+    re.IGNORECASE | re.DOTALL)
+_words = re.compile(r'(\w+)')
+
+_preserve_whitespace_tags = {'pre', 'textarea'}     # tags in which whitespace only text is kept as is
+_ascii_spaces = '\x20\x0a\x09\x0c\x0d'
+
+
+def _text(data, preserve):
+    """
+    Get the text for the data between two pieces of markup
+    :param data: data string
+    :param preserve: True if whitespace only text should be kept as is
+    :return: text
+    """
+    if '&' in data:
+        data = html.unescape(data)
+    if not preserve and not data.strip(_ascii_spaces):
+        # whitespace only text is reduced to a single newline or space
+        data = '\n' if '\n' in data else ' '
+    return data
+
+
+def strip_html(markup):
+    """
+    Get the text from a html string
+    :param markup: html string
+    :return: text
+    """
+    text = []
+    preserve = 0    # depth of tags preserving whitespace
+    pos = 0
+    for match in _markup.finditer(markup):
+        if match.start() > pos:
+            text.append(_text(markup[pos:match.start()], preserve > 0))
+        tag = match.group('tag')
+        if tag is not None and tag.lower() in _preserve_whitespace_tags:
+            if match.group(0)[1] == '/':
+                preserve = max(preserve - 1, 0)
+            else:
+                preserve += 1
+        pos = match.end()
+    if len(markup) > pos:
+        text.append(_text(markup[pos:], preserve > 0))
+    return ''.join(text)
+
+
+def count_words(markup):
+    """
+    Count the words in the text of a html string
+    :param markup: html string
+    :return: number of words
+    """
+    return len(_words.findall(strip_html(markup)))
@@ -8,17 +8,24 @@
 # How many people with the sameWebsiteUrl
 # Users with above the average number of words AboutMe section
 # Users with below the average number of words AboutMe section
-import csv
 import datetime as dt
-import os.path as osp
 import sys
-from io import StringIO
-import time
 import timeit
-import xml.etree.ElementTree as eT
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
 import pandas as pd
-from bs4 import BeautifulSoup
+
+from html_text import count_words
+from users_aggregate import AggregationEngine, Bins, Counts, Extremes, Filter, Histogram, Mean, RowSet
+from users_arrow import load_table, save_table
+from users_columns import GrowableArray, StringColumn, load_columns, save_columns
+from users_index import SortedIndex, refresh_order, sort_orders
+from users_parallel import count_words_parallel, parse_parallel
+from users_reader import ProgressReporter, iter_rows
+from users_refresh import refresh_columns
+from users_sketch import HeavyHitters
+from users_stats import ColumnStats, refresh_zones, table_zones
 
 # https://docs.python.org/3/library/xml.etree.elementtree.html?highlight=elementtree
 
@@ -46,11 +53,92 @@ process_limit = sys.maxsize  # set to sys.maxsize to process all records or a sm
 
 timeit_count = 0                        # set to desired number of executions, or 0 to disable timing
 display_output = (timeit_count == 0)    # display output if not timing execution
-
-csv_source_type = 'sio'        # set to 'file' to store and read csv data from a file, or 'sio' to use a StringIO
-csv_file_name = 'users.csv'     # name of csv file for csv_source_type = 'file'
-
-xml_source = 'Users.xml'
+progress_output = True                  # display progress while reading, if displaying output
+
+parse_workers = 1   # number of processes to parse the xml with, 1 to parse in this process or None for 1 per cpu;
+                    # only used when processing all records
+about_me_workers = 1    # number of processes to count AboutMe words with, 1 to count in this process or None for 1 per cpu
+
+csv_file_name = None    # name of csv file to also export the users to, e.g. 'users.csv', or None to not export
+
+date_dtype = 'datetime64[ms]'   # NumPy type for dates
+
+table_file_name = None      # name of Parquet (.parquet) or Arrow IPC/Feather (.feather, .arrow) file to save the users to
+                            # and load them from, e.g. 'users.feather', or None to not use one; requires pyarrow
+table_compression = 'zstd'  # compression for the table file, e.g. 'zstd', 'lz4', 'snappy' (Parquet only) or None
+dictionary_columns = ['Location', 'WebsiteUrl']     # string columns to store dictionary encoded in the table file
+
+column_cache_dir = 'users_cache'    # directory for the binary column cache, or None to disable the cache
+refresh_source = None   # newer dump to refresh the users in the column cache from, e.g. 'Users-new.xml.gz', or None; only
+                        # its new and changed users are applied, and the refreshed cache is then kept for it
+
+approximate_counts = False  # set to True to count locations and website urls with bounded memory sketches; counts are
+                            # then approximate, and are displayed with the max amount they may be high by
+sketch_counters = 1000      # number of counters kept for the most frequent values; counts may be low by at most
+                            # users / (sketch_counters + 1) before the count-min sketch tightens them
+count_min_width = 65536     # width of count-min sketch; its counts may be high by at most e / width * users,
+count_min_depth = 5         # with probability 1 - e^-depth
+
+xml_source = 'Users.xml.gz'     # plain or compressed (.gz, .bz2, .xz) xml file
+
+reports = ['oldest_newest', 'average_age', 'highest_lowest', 'inactive', 'age_groups', 'locations', 'website_urls',
+           'about_me']     # names of reports to run; only the columns they read are loaded, see report_columns
+row_columns = None      # columns to include when displaying the rows found by reports; None for all, or e.g. [] to only
+                        # load the columns the reports read
+
+# columns read by each report, and the reports which display the rows they find
+report_columns = {
+    'oldest_newest': ['CreationDate'],
+    'average_age': ['Age'],
+    'highest_lowest': ['DownVotes', 'Views', 'UpVotes'],
+    'inactive': ['LastAccessDate'],
+    'age_groups': ['Age'],
+    'locations': ['Location'],
+    'website_urls': ['WebsiteUrl'],
+    'about_me': ['AboutMe'],
+}
+row_reports = ['oldest_newest', 'highest_lowest', 'inactive', 'age_groups']
+
+age_bins = [18, 26, 36, 47]    # edges of the age groups; users are counted below the first edge, from each edge up to
+                                # the next, and from the last edge up
+sorted_index_columns = ['CreationDate', 'LastAccessDate']  # columns to keep a sorted index of in the column cache, for
+                                                            # date range queries such as inactive users
+
+
+# attributes of a user entry
+attr_id = {"name": "Id", "type": intAttrib}
+attr_reputation = {"name": "Reputation", "type": intAttrib}
+attr_creation_date = {"name": "CreationDate", "type": dateAttrib}
+attr_display_name = {"name": "DisplayName", "type": strAttrib}
+attr_last_access_date = {"name": "LastAccessDate", "type": dateAttrib}
+attr_website_url = {"name": "WebsiteUrl", "type": strAttrib}
+attr_location = {"name": "Location", "type": strAttrib}
+attr_about_me = {"name": "AboutMe", "type": htmlAttrib}
+attr_views = {"name": "Views", "type": intAttrib}
+attr_up_votes = {"name": "UpVotes", "type": intAttrib}
+attr_down_votes = {"name": "DownVotes", "type": intAttrib}
+attrib_age = {"name": "Age", "type": intAttrib}
+attr_account_id = {"name": "AccountId", "type": intAttrib}
+all_attributes = [
+    attr_id, attr_reputation, attr_creation_date, attr_display_name, attr_last_access_date, attr_website_url,
+    attr_location, attr_about_me, attr_views, attr_up_votes, attr_down_votes, attrib_age, attr_account_id
+]
+
+
+def select_attributes(attributes):
+    """
+    Select the attributes to load for the reports to run
+    :param attributes: list of all attributes, the first of which is the user id
+    :return: list of attributes to load, in the same order
+    """
+    names = {attributes[0]["name"]}
+    for report in reports:
+        names.update(report_columns[report])
+    if any(report in row_reports for report in reports):
+        if row_columns is None:
+            return attributes
+        names.update(row_columns)
+    return [attrib for attrib in attributes if attrib["name"] in names]
 
 
 def read_attributes_to_array(entry, attributes):
@@ -58,7 +146,7 @@ def read_attributes_to_array(entry, attributes):
     Read the attributes for an user xml entry
     :param entry: xml entry string
     :param attributes: list of attributes to read
-    :return: array of attribute values
+    :return: array of attribute values; dates are left as ISO 8601 strings to be converted in bulk
     """
     attr_array = []
     for attrib in attributes:
@@ -66,17 +154,21 @@ def read_attributes_to_array(entry, attributes):
         attrib_str = entry.get(name)
         if attrib_str is None:
             if attrib["type"] == dateAttrib:
-                attrib_value = 0
+                attrib_value = 'NaT'
             elif attrib["type"] == intAttrib:
                 attrib_value = 0
             elif attrib["type"] == floatAttrib:
                 attrib_value = 0.0
-            elif attrib["type"] == htmlAttrib:
-                attrib_value = ""
             else:
-                attrib_value = attrib_str
-        else:
+                attrib_value = np.nan   # missing strings are NaN, as pandas reads them
+        elif attrib["type"] == intAttrib:
+            attrib_value = int(attrib_str)
+        elif attrib["type"] == floatAttrib:
+            attrib_value = float(attrib_str)
+        elif attrib["type"] == dateAttrib or len(attrib_str) > 0:
             attrib_value = attrib_str
+        else:
+            attrib_value = np.nan
         attr_array.append(attrib_value)
     return attr_array
 
@@ -107,177 +199,257 @@ def print_header(title):
     display(f"\n{title}\n----------------------------------")
 
 
-def find_highest(title, name, df, column):
+def find_highest(title, name, df, extremes):
     """
-    Display the entries with the highest value for the specified column in a DataFrame
+    Display the entries with the highest value for a column in a DataFrame
     :param title: header to display
     :param name: name of column
     :param df: Pandas DateFrame
-    :param column: column to find highest values for
+    :param extremes: Extremes aggregate of the column
     """
     print_header(title)
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.max.html#pandas.DataFrame.max
-    high = df[column].max()
-    display(f'highest {name}: {high}')
-    highest = df.loc[df[column] == high]
+    display(f'highest {name}: {extremes.high}')
+    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.loc.html#pandas.DataFrame.loc
+    highest = df.loc[extremes.high_rows]
     display(f'highest {name} count: {highest.shape[0]}')
     if not highest.empty:
         display(highest)
 
 
-def find_lowest(title, name, df, column):
+def find_lowest(title, name, df, extremes):
     """
-    Display the entries with the lowest value for the specified column in a DataFrame
+    Display the entries with the lowest value for a column in a DataFrame
     :param title: header to display
     :param name: name of column
     :param df: Pandas DateFrame
-    :param column: column to find lowest values for
+    :param extremes: Extremes aggregate of the column
     """
     print_header(title)
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.min.html#pandas.DataFrame.min
-    low = df[column].min()
-    display(f'lowest {name}: {low}')
-    lowest = df.loc[df[column] == low]
+    display(f'lowest {name}: {extremes.low}')
+    lowest = df.loc[extremes.low_rows]
     display(f'highest {name} count: {lowest.shape[0]}')
     if not lowest.empty:
         display(lowest)
 
 
-def get_mean(series):
+def value_counts(counts, name):
     """
-    Get the mean of a series
-    :param series: series to get mean of
-    :return: mean value
+    Get the counts of unique values as a series in descending count order, as Series.value_counts() would
+    :param counts: Counts aggregate of a column
+    :param name: name of column
+    :return: series of counts indexed by value
     """
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.fillna.html#pandas.Series.fillna
-    val_series = series.fillna(value=0)
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.mean.html#pandas.Series.mean
-    return val_series.mean()
+    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.argsort.html
+    order = np.argsort(-counts.counts, kind='stable')   # values are in order of first occurrence, so ties keep it
+    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.html
+    return pd.Series(counts.counts[order], index=pd.Index(counts.values[order], name=name), name='count')
 
 
-def show_progress(count, bs):
+def approximate_value_counts(heavy_hitters, name, n):
     """
-    Show progress
-    :param count: count to display
-    :param bs: backspace string to overwrite current display
-    :return: backspace string to overwrite this display
+    Get the approximate counts of the most frequent values, in descending count order
+    :param heavy_hitters: HeavyHitters aggregate of a column
+    :param name: name of column
+    :param n: number of values
+    :return: DataFrame of count and error bound columns indexed by value; the true counts are at most error lower
     """
-    # give some in progress feedback
-    msg = f'{count}'
-    if len(bs) > 0:
-        sys.stdout.write(bs)
-    bs = '\b' * (len(msg))
-    sys.stdout.write(msg)
-    sys.stdout.flush()
-    time.sleep(0.05)
-    return bs
+    values, counts, errors = heavy_hitters.top(n)
+    return pd.DataFrame({'count': counts, 'error': errors}, index=pd.Index(values, name=name))
 
 
-def read_xml(xml_file, attributes):
+def read_rows(rows, attributes, progress=None):
     """
-    Read the attributes for an user xml entry
-    :param xml_file: name of xml to read
-    :param attributes: list of attributes to read
-    :return: array of user dictionaries
+    Read the attributes for user xml entries into typed columns
+    :param rows: iterable of xml entries
+    :param attributes: list of attributes to read, the first of which is the user id
+    :param progress: optional ProgressReporter to update
+    :return: dictionary of column name and array
     """
-    tree = eT.parse(xml_file)
-    root = tree.getroot()
+    # per-column buffers; numbers are stored as they are read, strings and dates are collected in lists and converted
+    # together once all rows are read
+    buffers = []
+    for attrib in attributes:
+        if attrib["type"] == intAttrib:
+            buffers.append(GrowableArray(np.int64))
+        elif attrib["type"] == floatAttrib:
+            buffers.append(GrowableArray(np.float64))
+        else:
+            buffers.append([])
 
-    # load into an array of dictionaries ignoring first row as it's not a user
-    users_array = []
-    bs = ''
+    # load ignoring first row as it's not a user
     count = 0
-    display('user count: ', end='')
-    for userXml in root:
+    for userXml in rows:
         user_arr = read_attributes_to_array(userXml, attributes)
-        if int(user_arr[0]) > 0:
-            users_array.append(user_arr)
-            count = len(users_array)
-            if display_output and (count % 100 == 0):
+        if user_arr[0] > 0:
+            for buffer, value in zip(buffers, user_arr):
+                buffer.append(value)
+            count += 1
+            if progress is not None:
                 # give some in progress feedback
-                bs = show_progress(count, bs)
+                progress.update(count)
 
             global process_limit
             if count > process_limit:
                 break
-    show_progress(count, bs)
-    display('\n')
-    
-    return users_array
+
+    columns = {}
+    for attrib, buffer in zip(attributes, buffers):
+        if isinstance(buffer, GrowableArray):
+            columns[attrib["name"]] = buffer.array()
+        elif attrib["type"] == dateAttrib:
+            # https://docs.scipy.org/doc/numpy/reference/arrays.datetime.html
+            columns[attrib["name"]] = np.array(buffer, dtype=date_dtype)
+        else:
+            columns[attrib["name"]] = np.array(buffer, dtype=object)
+    return columns
 
 
-def export_csv_file(filename, users, header=None):
+def read_xml(xml_file, attributes):
     """
-    Export the user details to a csv file
-    :param filename: name of file to export to
-    :param users: array of dictionaries with user details
-    :param header: Optional header row
+    Read the attributes for the user entries in an xml file into typed columns
+    :param xml_file: name of xml to read
+    :param attributes: list of attributes to read, the first of which is the user id
+    :return: dictionary of column name and array
     """
-    # export to csv file
-    with open(filename, 'w', newline='') as csv_file:
-        writer = csv.writer(csv_file)
-        if header is not None:
-            writer.writerow(header)
-        writer.writerows(users)
+    progress = ProgressReporter('user count', enabled=display_output and progress_output)
+    if parse_workers == 1 or process_limit != sys.maxsize:
+        columns = read_rows(iter_rows(xml_file, progress), attributes, progress)
+    else:
+        # parse ranges of the file in parallel, and join the results in file order
+        chunks = parse_parallel(xml_file, read_rows, (attributes,), parse_workers)
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.concatenate.html
+        columns = {attrib["name"]: np.concatenate([chunk[attrib["name"]] for chunk in chunks])
+                   for attrib in attributes}
+    progress.finish(len(columns[attributes[0]["name"]]))
+    display('\n')
 
+    return columns
 
 
-def main():
-    attr_id = {"name": "Id", "type": intAttrib}
-    attr_reputation = {"name": "Reputation", "type": intAttrib}
-    attr_creation_date = {"name": "CreationDate", "type": dateAttrib}
-    attr_display_name = {"name": "DisplayName", "type": strAttrib}
-    attr_last_access_date = {"name": "LastAccessDate", "type": dateAttrib}
-    attr_website_url = {"name": "WebsiteUrl", "type": strAttrib}
-    attr_location = {"name": "Location", "type": strAttrib}
-    attr_about_me = {"name": "AboutMe", "type": htmlAttrib}
-    attr_views = {"name": "Views", "type": intAttrib}
-    attr_up_votes = {"name": "UpVotes", "type": intAttrib}
-    attr_down_votes = {"name": "DownVotes", "type": intAttrib}
-    attrib_age = {"name": "Age", "type": intAttrib}
-    attr_account_id = {"name": "AccountId", "type": intAttrib}
-    user_attributes = [
-        attr_id, attr_reputation, attr_creation_date, attr_display_name, attr_last_access_date, attr_website_url,
-        attr_location, attr_about_me, attr_views, attr_up_votes, attr_down_votes, attrib_age, attr_account_id
-    ]
-    header = []
-    for attrib in user_attributes:
-        header.append(attrib["name"])
+def export_csv_file(filename, df):
+    """
+    Export the user details to a csv file
+    :param filename: name of file to export to
+    :param df: Pandas DataFrame of users
+    """
+    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.to_csv.html
+    df.to_csv(filename, index=False)
 
-    global csv_source_type, csv_file_name, xml_source
-    if csv_source_type == 'file':
-        if not osp.exists(csv_file_name):
 
-            users_array = read_xml(xml_source, user_attributes)
+def dataframe_from_columns(columns, masks):
+    """
+    Create a DataFrame from cached columns
+    :param columns: dictionary of column name and array, or StringColumn for object columns
+    :param masks: dictionary of column name and mask of missing entries
+    :return: Pandas DataFrame
+    """
+    data = {}
+    for name, column in columns.items():
+        if isinstance(column, StringColumn):
+            column = column.decode()
+        # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.html
+        series = pd.Series(column, copy=False)
+        if name in masks:
+            # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.where.html
+            series = series.where(~masks[name])
+        data[name] = series
+    return pd.DataFrame(data, copy=False)
+
+
+def load_dataframe(user_attributes, xml_file=None):
+    """
+    Load the users from the xml source into a DataFrame
+    :param user_attributes: list of attributes to read, the first of which is the user id
+    :param xml_file: name of xml file, or None for xml_source
+    :return: Pandas DataFrame
+    """
+    columns = read_xml(xml_file if xml_file is not None else xml_source, user_attributes)
+    # the typed columns are used as they are, without copying
+    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.html
+    pd_users = pd.DataFrame(columns, copy=False)
 
-            # export to csv file, so don't have to do conversion again
-            export_csv_file(csv_file_name, users_array)
+    if csv_file_name is not None:
+        export_csv_file(csv_file_name, pd_users)
 
-        csv_source = csv_file_name  # set source to file to read
-    else:
-        # https://docs.python.org/3/library/io.html#io.StringIO
-        csv_buffer = StringIO()
+    return pd_users
 
-        users_array = read_xml(xml_source, user_attributes)
 
-        writer = csv.writer(csv_buffer)
-        # writer.writerow(header)
-        writer.writerows(users_array)
+def refresh_dataframe(pd_users, orders, zones, user_attributes):
+    """
+    Refresh the users from refresh_source, applying only its new and changed users
+    :param pd_users: Pandas DataFrame of users
+    :param orders: dictionary of column name and sort order
+    :param zones: dictionary of column name and chunk statistics
+    :param user_attributes: list of attributes to read, the first of which is the user id
+    :return: tuple of dictionary of column name and refreshed column, refreshed sort orders and chunk statistics
+    """
+    new_columns = read_xml(refresh_source, user_attributes)
+    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.to_numpy.html
+    columns = {name: pd_users[name].to_numpy() for name in new_columns}
+    columns, changed, added = refresh_columns(columns, new_columns, user_attributes[0]['name'])
+    display(f'refresh: {len(changed)} changed users, {len(added)} new users')
 
-        csv_buffer.seek(0)
+    rows = np.concatenate([changed, added])
+    orders = {name: refresh_order(order, columns[name], rows) for name, order in orders.items()}
+    zones = {name: refresh_zones(column_zones, columns[name], rows) for name, column_zones in zones.items()}
+    return columns, orders, zones
 
-        csv_source = csv_buffer  # set source to StringIO to read
 
-    # load csv data using pandas
-    display('load csv')
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.read_csv.html
-    pd_users = pd.read_csv(csv_source, converters={
-        attr_creation_date["name"]: pd.to_datetime,
-        attr_last_access_date["name"]: pd.to_datetime
-    }, names=header)
+def main():
+    # only load the columns the reports read
+    user_attributes = select_attributes(all_attributes)
+    header = []
+    for attrib in user_attributes:
+        header.append(attrib["name"])
 
-    if isinstance(csv_source, StringIO):
-        csv_source.close()
+    # settings which change the data loaded, so invalidate the cache
+    cache_settings = {"process_limit": process_limit, "columns": header}
+    pd_users = None
+    orders = None
+    zones = None
+    source = xml_source if refresh_source is None else refresh_source
+    if table_file_name is not None:
+        pd_users = load_table(table_file_name, source, cache_settings)
+        if pd_users is not None:
+            display('load table file')
+
+    if pd_users is None:
+        cached = None
+        refresh = False     # refresh the cached users from refresh_source
+        if column_cache_dir is not None:
+            cached = load_columns(column_cache_dir, source, cache_settings)
+            if cached is None and refresh_source is not None:
+                cached = load_columns(column_cache_dir, xml_source, cache_settings)
+                refresh = cached is not None
+
+        if cached is not None:
+            display('load column cache')
+            pd_users = dataframe_from_columns(cached[0], cached[1])
+            orders = cached[2]
+            zones = cached[3]
+            if refresh:
+                columns, orders, zones = refresh_dataframe(pd_users, orders, zones, user_attributes)
+                pd_users = pd.DataFrame(columns, copy=False)
+                save_columns(column_cache_dir, source, columns, cache_settings, orders, zones)
+        else:
+            pd_users = load_dataframe(user_attributes, source)
+            # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.to_numpy.html
+            columns = {name: pd_users[name].to_numpy() for name in header}
+            orders = sort_orders(columns, sorted_index_columns)
+            zones = table_zones(columns)
+            if column_cache_dir is not None:
+                save_columns(column_cache_dir, source, columns, cache_settings, orders, zones)
+
+        if table_file_name is not None:
+            save_table(table_file_name, pd_users, source, cache_settings, table_compression, dictionary_columns)
+
+    if orders is None:
+        # the table file does not keep the indexes or statistics
+        columns = {name: pd_users[name].to_numpy() for name in header}
+        orders = sort_orders(columns, sorted_index_columns)
+        zones = table_zones(columns)
+    indexes = {name: SortedIndex(pd_users[name].to_numpy(), order) for name, order in orders.items()}
+    stats = {name: ColumnStats(column_zones) for name, column_zones in zones.items()}
 
     # misc
     # display(pd_users)
@@ -291,144 +463,163 @@ def main():
     # for head in header:
     #     display(pd_users[head])
 
-    # The oldest user
-    print_header("Oldest user")
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.min.html#pandas.DataFrame.min
-    display(f"date for oldest user: {pd_users[attr_creation_date['name']].min()}")
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.idxmin.html#pandas.DataFrame.idxmin
-    index = pd_users[attr_creation_date['name']].idxmin()
-    display(f'row index of oldest user: {index}')
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.loc.html#pandas.DataFrame.loc
-    display(pd_users.loc[index, :])
+    # register the aggregates for the reports, so all are computed in a single pass over the columns
+    # the extremes and means of columns with statistics come from them instead
+    engine = AggregationEngine()
+    word_pool = None    # pool of workers counting AboutMe words
+
+    def extremes(name):
+        if name in stats:
+            return stats[name].extremes(pd_users[name].to_numpy())
+        return engine.add(Extremes(name))
+
+    if 'oldest_newest' in reports:
+        creation = extremes(attr_creation_date['name'])
+    if 'average_age' in reports:
+        age_mean = stats[attrib_age['name']] if attrib_age['name'] in stats else engine.add(Mean(attrib_age['name']))
+    if 'highest_lowest' in reports:
+        down_votes = extremes(attr_down_votes['name'])
+        views = extremes(attr_views['name'])
+        up_votes = extremes(attr_up_votes['name'])
+    if 'inactive' in reports:
+        num_days = 180
+        check_times = [dt.datetime.now(), dt.datetime(2014, 6, 1)]
+        date_limits = [check_time - dt.timedelta(days=num_days) for check_time in check_times]
+        last_access = indexes.get(attr_last_access_date['name'])
+        if last_access is not None:
+            # count for all the check times in one search of the sorted dates; the rows are a slice of the sort order
+            inactive = []
+            for count in last_access.count_inactive(check_times, num_days):
+                inactive.append(RowSet())
+                inactive[-1].add(last_access.first_rows(count), 0)
+        else:
+            inactive = [engine.add(Filter(attr_last_access_date['name'],
+                                          lambda values, limit=np.datetime64(date_limit, 'ms'): values < limit)).matches
+                        for date_limit in date_limits]
+    if 'age_groups' in reports:
+        age_groups = engine.add(Bins(attrib_age['name'], age_bins))
+    if 'locations' in reports:
+        if approximate_counts:
+            locations = engine.add(HeavyHitters(attr_location['name'], sketch_counters))
+        else:
+            locations = engine.add(Counts(attr_location['name']))
+    if 'website_urls' in reports:
+        if approximate_counts:
+            web_urls = engine.add(HeavyHitters(attr_website_url['name'], sketch_counters,
+                                               count_min_width, count_min_depth))
+        else:
+            web_urls = engine.add(Counts(attr_website_url['name']))
+    if 'about_me' in reports:
+        # count the words in the text of the html, without building a document tree for each entry
+        # the words are counted for each chunk of rows, so the pool of workers is shared by all the chunks
+        if about_me_workers != 1:
+            word_pool = ProcessPoolExecutor(max_workers=about_me_workers)
+
+        def count_chunk_words(about_me):
+            about_me = np.where(about_me == about_me, about_me, '')     # replace empty (NaN) with ''
+            if about_me_workers == 1:
+                # https://docs.scipy.org/doc/numpy/reference/generated/numpy.fromiter.html
+                return np.fromiter((count_words(markup) for markup in about_me), dtype=np.int64, count=len(about_me))
+            return count_words_parallel(about_me, about_me_workers, word_pool)
+
+        # a histogram of word counts is kept, rather than a count per user
+        about_me_words = engine.add(Histogram(attr_about_me['name'], count_chunk_words))
+
+    try:
+        # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.to_numpy.html
+        engine.run({name: pd_users[name].to_numpy() for name in header}, len(pd_users))
+    finally:
+        if word_pool is not None:
+            word_pool.shutdown()
 
-    # The newest user
-    print_header("Newest user")
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.max.html#pandas.DataFrame.max
-    display(f"date for newest user: {pd_users[attr_creation_date['name']].max()}")
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.idxmax.html#pandas.DataFrame.idxmax
-    index = pd_users[attr_creation_date['name']].idxmax()
-    display(f'row index of newest user: {index}')
-    display(pd_users.loc[index, :])
+    # The oldest user
+    if 'oldest_newest' in reports:
+        print_header("Oldest user")
+        # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Timestamp.html
+        display(f"date for oldest user: {pd.Timestamp(creation.low)}")
+        index = creation.argmin
+        display(f'row index of oldest user: {index}')
+        # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.loc.html#pandas.DataFrame.loc
+        display(pd_users.loc[index, :])
+
+        # The newest user
+        print_header("Newest user")
+        display(f"date for newest user: {pd.Timestamp(creation.high)}")
+        index = creation.argmax
+        display(f'row index of newest user: {index}')
+        display(pd_users.loc[index, :])
 
     # Average user age
-    print_header("Average user age")
-    avg = get_mean(pd_users[attrib_age['name']])
-    display(f"average user age: {avg}")
+    if 'average_age' in reports:
+        print_header("Average user age")
+        display(f"average user age: {age_mean.mean}")
 
     # User with highest downvote and highest views
-    find_highest("User with highest downvote", "downvote", pd_users, attr_down_votes['name'])
-    find_highest("User with highest views", "views", pd_users, attr_views['name'])
+    if 'highest_lowest' in reports:
+        find_highest("User with highest downvote", "downvote", pd_users, down_votes)
+        find_highest("User with highest views", "views", pd_users, views)
 
-    # User with highest upvote and lowest views
-    find_highest("User with highest upvote", "upvote", pd_users, attr_up_votes['name'])
-    find_lowest("User with lowest views", "views", pd_users, attr_views['name'])
+        # User with highest upvote and lowest views
+        find_highest("User with highest upvote", "upvote", pd_users, up_votes)
+        find_lowest("User with lowest views", "views", pd_users, views)
 
     # Users that do not access the website for more than 180 days
-    check_time = dt.datetime.now()
-    num_days = 180
-    date_limit = check_time - dt.timedelta(days=num_days)
-    more_than_date_limit = pd_users.loc[pd_users[attr_last_access_date['name']] < date_limit]
-    print_header(f"Users that do not access the website for more than {num_days} days: {len(more_than_date_limit)}")
-    if not more_than_date_limit.empty:
-        display(more_than_date_limit)
-
-    check_time = dt.datetime(2014, 6, 1)
-    date_limit = check_time - dt.timedelta(days=num_days)
-    more_than_date_limit = pd_users.loc[pd_users[attr_last_access_date['name']] < date_limit]
-    print_header(
-        f"Users that do not access the website for more than {num_days} days before {check_time} i.e. {date_limit}: {len(more_than_date_limit)}")
-    if not more_than_date_limit.empty:
-        display(more_than_date_limit)
+    if 'inactive' in reports:
+        more_than_date_limit = pd_users.loc[inactive[0].rows]
+        print_header(f"Users that do not access the website for more than {num_days} days: {len(more_than_date_limit)}")
+        if not more_than_date_limit.empty:
+            display(more_than_date_limit)
+
+        check_time = check_times[1]
+        date_limit = date_limits[1]
+        more_than_date_limit = pd_users.loc[inactive[1].rows]
+        print_header(
+            f"Users that do not access the website for more than {num_days} days before {check_time} i.e. {date_limit}: {len(more_than_date_limit)}")
+        if not more_than_date_limit.empty:
+            display(more_than_date_limit)
 
     # How many people are below 18, from 18-25, 25-35,36-46, above 46
-    age_group = pd_users.loc[pd_users[attrib_age['name']] < 18]
-    print_header(f"Users that are below 18: {len(age_group)}")
-    if not age_group.empty:
-        display(age_group)
-
-    age_group = pd_users.loc[(pd_users[attrib_age['name']] >= 18) & (pd_users[attrib_age['name']] <= 25)]
-    print_header(f"Users that are from 18-25: {len(age_group)}")
-    if not age_group.empty:
-        display(age_group)
-
-    age_group = pd_users.loc[(pd_users[attrib_age['name']] >= 25) & (pd_users[attrib_age['name']] <= 35)]
-    print_header(f"Users that are from 25-35: {len(age_group)}")
-    if not age_group.empty:
-        display(age_group)
-
-    age_group = pd_users.loc[(pd_users[attrib_age['name']] >= 36) & (pd_users[attrib_age['name']] <= 46)]
-    print_header(f"Users that are from 36-46: {len(age_group)}")
-    if not age_group.empty:
-        display(age_group)
-
-    age_group = pd_users.loc[pd_users[attrib_age['name']] > 46]
-    print_header(f"Users that are above 46: {len(age_group)}")
-    if age_group.size > 0:
-        display(age_group)
+    if 'age_groups' in reports:
+        for idx, title in enumerate(age_groups.titles()):
+            age_group = pd_users.loc[age_groups.rows(idx)]
+            print_header(f"Users that are {title}: {len(age_group)}")
+            if not age_group.empty:
+                display(age_group)
 
     # Calculate the top 20 frequent locations
-    top_count = 20
-    locations = pd_users[attr_location['name']]  # series of locations
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.value_counts.html#pandas.Series.value_counts
-    locations = locations.value_counts()  # series containing counts of unique locations
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.nlargest.html#pandas.Series.nlargest
-    locations = locations.nlargest(n=top_count, keep="first")  # series of largest n elements
-    print_header(f"Top {top_count} locations:")
-    if not locations.empty:
-        display(locations)
+    if 'locations' in reports:
+        top_count = 20
+        if approximate_counts:
+            locations = approximate_value_counts(locations, attr_location['name'], top_count)
+        else:
+            locations = value_counts(locations, attr_location['name'])  # series containing counts of unique locations
+            # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.nlargest.html#pandas.Series.nlargest
+            locations = locations.nlargest(n=top_count, keep="first")  # series of largest n elements
+        print_header(f"Top {top_count} locations:")
+        if not locations.empty:
+            display(locations)
 
     # How many people with the sameWebsiteUrl
-    web_url = pd_users[attr_website_url['name']]  # series of website urls
-    web_url = web_url.value_counts()  # series containing counts of unique website urls
-    print_header(f"Counts of users with same website urls:")
-    display(web_url)
+    if 'website_urls' in reports:
+        if approximate_counts:
+            web_url = approximate_value_counts(web_urls, attr_website_url['name'], sketch_counters)
+        else:
+            web_url = value_counts(web_urls, attr_website_url['name'])  # series containing counts of unique website urls
+        print_header(f"Counts of users with same website urls:")
+        display(web_url)
 
     # Users with above the average number of words AboutMe section
     # Users with below the average number of words AboutMe section
-    print_header(f"Counts of users with above/below average number of words AboutMe section:")
-    about_me = pd_users[attr_about_me['name']]  # series of about me text
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.fillna.html#pandas.Series.fillna
-    about_me = about_me.fillna('')          # replace empty with ''
-
-    def strip_html(markup):
-        """
-        Get the text from a html string
-        :param markup: html string
-        :return: text
-        """
-        soup = BeautifulSoup(markup, 'html.parser')
-        #display(f'{soup.get_text()}')
-        return soup.get_text()
-
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.map.html#pandas.Series.map
-    about_me = about_me.map(strip_html)  # series of just text
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.str.count.html
-    about_me_lens = about_me.str.count(r'(\w+)')    # series of word counts
-
-    avg = get_mean(about_me_lens)
-    display(f"average AboutMe word count: {avg}")
-
-    def mean_map(x):
-        mapped = 'm'
-        if x < avg:
-            mapped = 'b'
-        elif x > avg:
-            mapped = 'a'
-        return mapped
-    # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.map.html#pandas.Series.map
-    about_me_lens = about_me_lens.map(mean_map)  # set value to 'b' if length < mean, 'a' if length > mean or 'm' if == mean
-    about_me_counts = about_me_lens.value_counts()  # count unique values
-    for x in ['a', 'b', 'm']:
-        if x in about_me_counts.index:
-            count = about_me_counts[x]
-        else:
-            count = 0
-        if x == 'a':
-            display(f"number of users with above average number of words AboutMe section: {count}")
-        elif x == 'b':
-            display(f"number of users with below average number of words AboutMe section: {count}")
-        else:
-            display(f"number of users with average number of words AboutMe section: {count}")
+    if 'about_me' in reports:
+        print_header(f"Counts of users with above/below average number of words AboutMe section:")
+        avg = about_me_words.mean
+        display(f"average AboutMe word count: {avg}")
+
+        # count the users with word counts below, equal to and above the average from the histogram
+        below, equal, above = about_me_words.split(avg)
+        display(f"number of users with above average number of words AboutMe section: {above}")
+        display(f"number of users with below average number of words AboutMe section: {below}")
+        display(f"number of users with average number of words AboutMe section: {equal}")
 
 
 if __name__ == '__main__':
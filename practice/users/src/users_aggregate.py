@@ -0,0 +1,488 @@
+# Single pass aggregation for the users solutions
+# The aggregates for all the reports are registered with an engine, which reads the columns once, a chunk of rows at
+# a time, updating every aggregate from each chunk while it is in the cache. Adding reports adds aggregates, not scans.
+# The chunks may also be streamed from the xml reader, in which case the aggregates can limit the rows they keep, so
+# memory use does not grow with the size of the input.
+import numpy as np
+
+from users_columns import DictionaryColumn, StringColumn
+
+aggregate_chunk_rows = 65536    # number of rows in each chunk of the columns
+
+
+def column_chunk(column, start, stop):
+    """
+    Get a range of rows of a column, without copying them
+    :param column: array, StringColumn or DictionaryColumn
+    :param start: index of first row
+    :param stop: index after last row
+    :return: column of the same type
+    """
+    if isinstance(column, (StringColumn, DictionaryColumn)):
+        return column.slice(start, stop)
+    return column[start:stop]
+
+
+def valid_mask(values):
+    """
+    Get a mask of the entries of an array which are not missing, i.e. not NaN or NaT
+    :param values: array
+    :return: boolean array, or None if no entries can be missing
+    """
+    if np.issubdtype(values.dtype, np.datetime64):
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.isnat.html
+        return ~np.isnat(values)
+    if np.issubdtype(values.dtype, np.floating):
+        return ~np.isnan(values)
+    if values.dtype == object:
+        return values == values     # NaN is not equal to itself
+    return None
+
+
+def chunk_counts(values):
+    """
+    Count the unique values in a chunk of a column; missing values are not counted
+    :param values: chunk of column, array or DictionaryColumn
+    :return: tuple of array of unique values and array of their counts; for a DictionaryColumn the values are in
+             ascending order, otherwise they are in order of first occurrence
+    """
+    if isinstance(values, DictionaryColumn):
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.bincount.html
+        unique = values.values
+        counts = np.bincount(values.codes, minlength=len(unique))
+        present = counts > 0    # the chunk may not use all the values in the dictionary
+        return unique[present], counts[present]
+
+    valid = valid_mask(values)
+    if valid is not None:
+        values = values[valid]
+    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.unique.html
+    unique, first, counts = np.unique(values, return_index=True, return_counts=True)
+    order = np.argsort(first, kind='stable')
+    return unique[order], counts[order]
+
+
+class RowSet:
+    """
+    Set of rows found by an aggregate
+    All matching rows are counted, but only the first limit rows are kept, along with their values if a table is
+    provided when they are added.
+    """
+
+    def __init__(self, limit=None):
+        """
+        Create a row set
+        :param limit: max number of rows to keep, or None to keep all
+        """
+        self.limit = limit
+        self.reset()
+
+    def reset(self):
+        """
+        Remove all rows
+        """
+        self.count = 0
+        self._rows = []
+        self._kept = 0
+        self.records = []
+
+    def add(self, rows, offset, table=None):
+        """
+        Add rows
+        :param rows: array of indices of the rows in the chunk
+        :param offset: index of the first row of the chunk
+        :param table: optional chunk table, to keep the values of the rows from
+        """
+        self.count += len(rows)
+        if self.limit is not None:
+            rows = rows[:max(self.limit - self._kept, 0)]
+        if len(rows) > 0:
+            self._rows.append(rows + offset)
+            self._kept += len(rows)
+            if table is not None:
+                self.records.extend(table[int(row)] for row in rows)
+
+    @property
+    def rows(self):
+        """
+        Indices of the rows kept, in ascending order
+        """
+        return np.concatenate(self._rows) if len(self._rows) > 0 else np.empty(0, dtype=np.int64)
+
+    @property
+    def first(self):
+        """
+        Index of the first row, or None if there are none
+        """
+        return self._rows[0][0] if len(self._rows) > 0 else None
+
+
+class Aggregate:
+    """
+    Base class for aggregates of a column
+    """
+
+    def __init__(self, column):
+        """
+        Create an aggregate
+        :param column: name of column to aggregate
+        """
+        self.column = column
+
+    def update(self, values, offset, table=None):
+        """
+        Update the aggregate with a chunk of rows
+        :param values: chunk of the column
+        :param offset: index of the first row of the chunk
+        :param table: optional chunk table, for aggregates keeping the values of rows
+        """
+        raise NotImplementedError
+
+
+class Extremes(Aggregate):
+    """
+    Lowest and highest values of a column, and the rows holding them; missing values are ignored
+    """
+
+    def __init__(self, column, limit=None):
+        """
+        Create an extremes aggregate
+        :param column: name of column to aggregate
+        :param limit: max number of rows holding each extreme to keep, or None to keep all
+        """
+        super().__init__(column)
+        self.low = None
+        self.high = None
+        self.lows = RowSet(limit)
+        self.highs = RowSet(limit)
+
+    def update(self, values, offset, table=None):
+        valid = valid_mask(values)
+        if valid is not None and not valid.all():
+            # https://docs.scipy.org/doc/numpy/reference/generated/numpy.flatnonzero.html
+            rows = np.flatnonzero(valid)
+            values = values[rows]
+        else:
+            rows = None
+        if len(values) == 0:
+            return
+
+        def ties(value):
+            tie_rows = np.flatnonzero(values == value)
+            return rows[tie_rows] if rows is not None else tie_rows
+
+        low = values.min()
+        if self.low is None or low <= self.low:
+            if self.low is None or low < self.low:
+                self.low = low
+                self.lows.reset()
+            self.lows.add(ties(low), offset, table)
+        high = values.max()
+        if self.high is None or high >= self.high:
+            if self.high is None or high > self.high:
+                self.high = high
+                self.highs.reset()
+            self.highs.add(ties(high), offset, table)
+
+    @property
+    def low_rows(self):
+        """
+        Rows holding the lowest value, in ascending order
+        """
+        return self.lows.rows
+
+    @property
+    def high_rows(self):
+        """
+        Rows holding the highest value, in ascending order
+        """
+        return self.highs.rows
+
+    @property
+    def argmin(self):
+        """
+        First row holding the lowest value
+        """
+        return self.lows.first
+
+    @property
+    def argmax(self):
+        """
+        First row holding the highest value
+        """
+        return self.highs.first
+
+
+class Mean(Aggregate):
+    """
+    Mean of a column, with missing values counted as 0
+    """
+
+    def __init__(self, column):
+        super().__init__(column)
+        self.total = 0
+        self.count = 0
+
+    def update(self, values, offset, table=None):
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.nan_to_num.html
+        self.total += np.nan_to_num(values, nan=0).sum()
+        self.count += len(values)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count > 0 else np.nan
+
+
+class Filter(Aggregate):
+    """
+    Rows of a column matching a condition
+    """
+
+    def __init__(self, column, condition, limit=None):
+        """
+        Create a filter
+        :param column: name of column to filter
+        :param condition: function returning a boolean array of the matching entries for an array of column values
+        :param limit: max number of matching rows to keep, or None to keep all
+        """
+        super().__init__(column)
+        self.condition = condition
+        self.matches = RowSet(limit)
+
+    def update(self, values, offset, table=None):
+        self.matches.add(np.flatnonzero(self.condition(values)), offset, table)
+
+    @property
+    def rows(self):
+        """
+        Matching rows, in ascending order
+        """
+        return self.matches.rows
+
+
+class Counts(Aggregate):
+    """
+    Counts of the unique values of a column; missing values are not counted
+    For DictionaryColumns the values are in ascending order, otherwise they are in order of first occurrence.
+    While the chunks of a DictionaryColumn share its unique values, the codes are counted into an array indexed by
+    code; chunks with their own unique values, e.g. when streaming, are merged by value.
+    Memory use grows with the number of unique values, see users_sketch for bounded memory approximate counts.
+    """
+
+    def __init__(self, column):
+        super().__init__(column)
+        self._counts = {}
+        self._sorted = False
+        self._dictionary = None     # chunk of the DictionaryColumn whose codes are counted in _code_counts
+        self._code_counts = np.zeros(0, dtype=np.int64)
+
+    def update(self, values, offset, table=None):
+        self._sorted = isinstance(values, DictionaryColumn)
+        if self._sorted and len(self._counts) == 0 and \
+                (self._dictionary is None or values.shares_values(self._dictionary)):
+            # https://docs.scipy.org/doc/numpy/reference/generated/numpy.bincount.html
+            counts = np.bincount(values.codes, minlength=max(len(values.values), len(self._code_counts)))
+            counts[:len(self._code_counts)] += self._code_counts
+            self._code_counts = counts
+            self._dictionary = values
+            return
+
+        self._merge_codes()
+        unique, counts = chunk_counts(values)
+        for value, count in zip(unique.tolist(), counts.tolist()):
+            self._counts[value] = self._counts.get(value, 0) + count
+
+    def _merge_codes(self):
+        """
+        Move the counts by code into the counts by value
+        """
+        if self._dictionary is not None:
+            present = np.flatnonzero(self._code_counts)
+            for value, count in zip(self._dictionary.values[present].tolist(), self._code_counts[present].tolist()):
+                self._counts[value] = self._counts.get(value, 0) + count
+            self._dictionary = None
+            self._code_counts = np.zeros(0, dtype=np.int64)
+
+    def _code_order(self):
+        # codes of the values counted, in ascending order of value
+        present = np.flatnonzero(self._code_counts)
+        values = self._dictionary.values[present]
+        if len(values) > 1 and not (values[:-1] <= values[1:]).all():
+            present = present[np.argsort(values, kind='stable')]
+        return present
+
+    @property
+    def values(self):
+        if self._dictionary is not None:
+            return self._dictionary.values[self._code_order()]
+        if self._sorted:
+            return np.array(sorted(self._counts), dtype=np.str_)
+        return np.array(list(self._counts.keys()), dtype=object)
+
+    @property
+    def counts(self):
+        if self._dictionary is not None:
+            return self._code_counts[self._code_order()]
+        if self._sorted:
+            return np.array([self._counts[value] for value in sorted(self._counts)], dtype=np.int64)
+        return np.array(list(self._counts.values()), dtype=np.int64)
+
+
+class Bins(Aggregate):
+    """
+    Counts of the values of a column in bins, from a single pass; missing values are not counted
+    Bin 0 holds the values below the first edge, bin i the values from edges[i - 1] up to but not including edges[i],
+    and the last bin the values from the last edge up. The rows in each bin are found lazily from the bin numbers of
+    all the rows, or if the aggregate is keeping the values of rows, are kept as they are found.
+    """
+
+    def __init__(self, column, edges, limit=None):
+        """
+        Create a bins aggregate
+        :param column: name of column
+        :param edges: ascending list of bin edges
+        :param limit: max number of rows to keep for each bin, when keeping the values of rows
+        """
+        super().__init__(column)
+        self.edges = np.asarray(edges)
+        self.counts = np.zeros(len(edges) + 1, dtype=np.int64)
+        self._bins = []
+        self._matches = [RowSet(limit) for _ in range(len(self.counts))]
+
+    def update(self, values, offset, table=None):
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.digitize.html
+        bins = np.digitize(values, self.edges).astype(np.int8 if len(self.counts) < 128 else np.int64)
+        valid = valid_mask(values)
+        if valid is not None:
+            bins[~valid] = -1
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.bincount.html
+        self.counts += np.bincount(bins[bins >= 0], minlength=len(self.counts))
+        if table is not None:
+            for idx, matches in enumerate(self._matches):
+                matches.add(np.flatnonzero(bins == idx), offset, table)
+        else:
+            self._bins.append(bins)
+
+    def titles(self):
+        """
+        Get titles for the bins of integer values, e.g. 'below 18', 'from 18-25' and 'above 46'
+        :return: list of titles
+        """
+        edges = self.edges.tolist()
+        return [f'below {edges[0]}'] + \
+               [f'from {low}-{high - 1}' for low, high in zip(edges[:-1], edges[1:])] + \
+               [f'above {edges[-1] - 1}']
+
+    def matches(self, idx):
+        """
+        Get the rows in a bin
+        :param idx: index of bin
+        :return: RowSet of the rows
+        """
+        matches = self._matches[idx]
+        if len(self._bins) > 0 and matches.count == 0:
+            # find the rows from the bin numbers, the first time they are required
+            self._bins = [np.concatenate(self._bins)]
+            matches.add(np.flatnonzero(self._bins[0] == idx), 0)
+        return matches
+
+    def rows(self, idx):
+        """
+        Rows in a bin, in ascending order
+        :param idx: index of bin
+        """
+        return self.matches(idx).rows
+
+
+class Histogram(Aggregate):
+    """
+    Histogram of the non-negative integer values of a column transformed per chunk, e.g. the word counts of html
+    entries; its size depends on the largest value, not the number of rows
+    """
+
+    def __init__(self, column, transform):
+        """
+        Create a histogram
+        :param column: name of column
+        :param transform: function returning an array of non-negative integers for a chunk of the column
+        """
+        super().__init__(column)
+        self.transform = transform
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def update(self, values, offset, table=None):
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.bincount.html
+        counts = np.bincount(np.asarray(self.transform(values), dtype=np.int64), minlength=len(self.counts))
+        counts[:len(self.counts)] += self.counts
+        self.counts = counts
+
+    @property
+    def count(self):
+        return self.counts.sum()
+
+    @property
+    def mean(self):
+        count = self.count
+        return (self.counts * np.arange(len(self.counts))).sum() / count if count > 0 else np.nan
+
+    def split(self, value):
+        """
+        Count the values below, equal to and above a value
+        :param value: value to compare with
+        :return: tuple of the counts below, equal to and above the value
+        """
+        # the bins are the sorted values 0, 1, 2, ..., so the counts either side of a value come from the cumulative
+        # counts at its position in them
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.searchsorted.html
+        bins = np.arange(len(self.counts))
+        low = np.searchsorted(bins, value, side='left')
+        high = np.searchsorted(bins, value, side='right')
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.cumsum.html
+        cumulative = np.zeros(len(self.counts) + 1, dtype=np.int64)
+        np.cumsum(self.counts, out=cumulative[1:])
+        return cumulative[low], cumulative[high] - cumulative[low], cumulative[-1] - cumulative[high]
+
+
+class AggregationEngine:
+    """
+    Engine computing a set of aggregates in a single pass over the columns of a table, or over a stream of chunks
+    """
+
+    def __init__(self, chunk_rows=None, keep_records=False):
+        """
+        Create an engine
+        :param chunk_rows: number of rows in each chunk of the columns, or None for aggregate_chunk_rows
+        :param keep_records: keep the values of the rows found by aggregates, for when the table is not kept
+        """
+        self.chunk_rows = chunk_rows if chunk_rows is not None else aggregate_chunk_rows
+        self.keep_records = keep_records
+        self.aggregates = []
+
+    def add(self, aggregate):
+        """
+        Add an aggregate to compute
+        :param aggregate: aggregate
+        :return: the aggregate
+        """
+        self.aggregates.append(aggregate)
+        return aggregate
+
+    def update(self, chunk, offset):
+        """
+        Update all the aggregates with a chunk of rows
+        :param chunk: table or dictionary of column name and chunk of column
+        :param offset: index of the first row of the chunk
+        """
+        for aggregate in self.aggregates:
+            aggregate.update(chunk[aggregate.column], offset, chunk if self.keep_records else None)
+
+    def run(self, table, rows):
+        """
+        Compute all the aggregates over a table, a chunk of rows at a time
+        :param table: dictionary-like of column name and column
+        :param rows: number of rows in the table
+        """
+        names = {aggregate.column for aggregate in self.aggregates}
+        for start in range(0, rows, self.chunk_rows):
+            stop = min(start + self.chunk_rows, rows)
+            self.update({name: column_chunk(table[name], start, stop) for name in names}, start)
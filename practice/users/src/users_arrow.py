@@ -0,0 +1,110 @@
+# Typed table files for the users solutions
+# Saves and loads the user table as Parquet or Arrow IPC (Feather) files, keeping the int64, timestamp and dictionary
+# encoded string column types, so loading does not need to infer types or parse values. Requires pyarrow.
+import json
+import os
+import os.path as osp
+
+from users_columns import file_hash, source_key
+
+# https://arrow.apache.org/docs/python/parquet.html
+# https://arrow.apache.org/docs/python/feather.html
+# https://arrow.apache.org/docs/python/ipc.html
+
+parquet_suffixes = ['.parquet', '.pq']                 # file name suffixes for Parquet files
+feather_suffixes = ['.feather', '.arrow', '.ipc']      # file name suffixes for Arrow IPC (Feather) files
+source_metadata_key = b'users.source'                 # schema metadata key for the source key of the table
+
+
+def table_format(filename):
+    """
+    Get the format of a table file from its name
+    :param filename: name of file
+    :return: 'parquet' or 'feather'
+    """
+    suffix = osp.splitext(filename)[1].lower()
+    if suffix in parquet_suffixes:
+        return 'parquet'
+    if suffix in feather_suffixes:
+        return 'feather'
+    raise ValueError(f'Unknown table file type: {filename}')
+
+
+def save_table(filename, df, source_file, settings=None, compression='zstd', dictionary_columns=None):
+    """
+    Save a DataFrame to a Parquet or Arrow IPC (Feather) file
+    :param filename: name of file to save to; the format is chosen by the suffix, see table_format()
+    :param df: Pandas DataFrame to save
+    :param source_file: name of file the table was read from
+    :param settings: optional dictionary of settings affecting the table data
+    :param compression: compression codec, e.g. 'zstd', 'lz4' or 'snappy' (Parquet only), or None for uncompressed
+    :param dictionary_columns: optional list of names of string columns to dictionary encode
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    fmt = table_format(filename)
+    # https://arrow.apache.org/docs/python/generated/pyarrow.Table.html#pyarrow.Table.from_pandas
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for name in dictionary_columns if dictionary_columns is not None else []:
+        if name in table.column_names:
+            idx = table.column_names.index(name)
+            table = table.set_column(idx, name, table.column(idx).dictionary_encode())
+
+    key = source_key(source_file, settings)
+    metadata = dict(table.schema.metadata or {})
+    metadata[source_metadata_key] = json.dumps(key).encode('utf-8')
+    table = table.replace_schema_metadata(metadata)
+
+    # write to a temporary file and replace, so a partly written file is never loaded
+    temp_name = f'{filename}.tmp'
+    if fmt == 'parquet':
+        pq.write_table(table, temp_name, compression=compression if compression is not None else 'none')
+    else:
+        feather.write_feather(table, temp_name, compression=compression if compression is not None else 'uncompressed')
+    os.replace(temp_name, filename)
+
+
+def load_table(filename, source_file, settings=None):
+    """
+    Load a DataFrame from a Parquet or Arrow IPC (Feather) file, if it is valid for the source file
+    Only the schema is read to check the source key, then the file is memory mapped, and uncompressed Feather files are
+    converted to pandas without copying the numeric columns. The file is invalid if the source file size or hash have
+    changed; the hash is only recalculated if the modification time has changed.
+    :param filename: name of file to load
+    :param source_file: name of file the table was read from
+    :param settings: optional dictionary of settings affecting the table data
+    :return: Pandas DataFrame, or None if the file is not valid
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    if not osp.exists(filename) or not osp.exists(source_file):
+        return None
+    fmt = table_format(filename)
+    if fmt == 'parquet':
+        schema = pq.read_schema(filename, memory_map=True)
+    else:
+        # Feather files are Arrow IPC files, whose schema is read from the footer without reading the columns
+        # https://arrow.apache.org/docs/python/generated/pyarrow.ipc.open_file.html
+        with pa.memory_map(filename) as source:
+            schema = pa.ipc.open_file(source).schema
+
+    metadata = schema.metadata or {}
+    if source_metadata_key not in metadata:
+        return None
+    key = json.loads(metadata[source_metadata_key].decode('utf-8'))
+    stat = os.stat(source_file)
+    if stat.st_size != key["size"] or key["settings"] != (settings if settings is not None else {}):
+        return None
+    if stat.st_mtime_ns != key["mtime_ns"] and file_hash(source_file) != key["sha256"]:
+        return None
+
+    if fmt == 'parquet':
+        table = pq.read_table(filename, memory_map=True)
+    else:
+        table = feather.read_table(filename, memory_map=True)
+    # https://arrow.apache.org/docs/python/pandas.html#zero-copy-series-conversions
+    return table.to_pandas(split_blocks=True, self_destruct=True)
@@ -0,0 +1,369 @@
+# Benchmarks for the users solutions
+import datetime as dt
+import os
+import re
+import timeit
+
+import numpy as np
+import pandas as pd
+from bs4 import BeautifulSoup
+
+import users
+import users_sqlite
+from html_text import count_words, strip_html
+from users_arrow import load_table, save_table
+from users_columns import GrowableArray, StringColumn
+from users_np_dtype import nlargest_counts
+from users_parallel import count_words_parallel
+from users_reader import iter_rows
+from users_scanner import AttributeScanner, map_source
+
+benchmarks = ['append', 'html', 'parallel_words', 'scan', 'table_files', 'nlargest', 'sqlite']     # names of benchmarks to run, see benchmark_functions in main()
+
+xml_source = 'Users.xml.gz'     # plain or compressed (.gz, .bz2, .xz) xml file
+
+append_row_counts = [10_000, 100_000, 1_000_000, 10_000_000]   # row counts for growable array appends
+row_stack_limit = 40_000    # max row count to time row_stack appends for, as they are O(n²)
+
+parallel_workers = [1, 2, 4, 8, 16, 32]     # numbers of worker processes for parallel benchmarks
+
+table_files = [('users_bench.parquet', 'zstd'), ('users_bench.parquet', 'snappy'), ('users_bench.feather', 'zstd'),
+               ('users_bench.feather', 'lz4'), ('users_bench.feather', None)]   # table file names and compressions
+csv_bench_file = 'users_bench.csv'      # csv file to compare the table files with
+
+nlargest_unique_counts = [10_000, 1_000_000, 10_000_000]    # numbers of unique entries for top-k selection
+nlargest_n = [1, 20, 1000]  # numbers of top entries to select
+
+sqlite_bench_file = 'users_bench.sqlite'    # SQLite database to compare the queries with the DataFrame and arrays
+sqlite_batch_rows = [100, 10_000, 50_000]   # numbers of rows inserted in each transaction when loading
+
+
+def time_call(func, number=1):
+    """
+    Time a function
+    :param func: function to time
+    :param number: number of executions
+    :return: average execution time in sec
+    """
+    # https://docs.python.org/3/library/timeit.html#timeit.timeit
+    return timeit.timeit(func, number=number) / number
+
+
+def print_timing(name, rows, seconds):
+    """
+    Print a timing result
+    :param name: name of what was timed
+    :param rows: number of rows processed
+    :param seconds: execution time
+    """
+    per_row = seconds / rows * 1e9 if rows > 0 else 0
+    print(f'{name:<30} {rows:>12,} rows {seconds:>10.3f} sec {per_row:>10.1f} ns/row')
+
+
+def bench_append():
+    """
+    Compare appending rows of string lengths with row_stack and a growable array
+    Time per row should stay flat for the growable array, showing linear scaling.
+    """
+    print('\nAppend string length rows\n----------------------------------')
+    len_type = np.dtype([('DisplayName', np.int32), ('WebsiteUrl', np.int32), ('Location', np.int32),
+                         ('AboutMe', np.int32)])
+    lens = (12, 24, 16, 300)
+
+    def row_stack_append(rows):
+        string_lens = np.empty([0, 1], len_type)
+        for _ in range(rows):
+            # https://docs.scipy.org/doc/numpy/reference/generated/numpy.vstack.html
+            string_lens = np.vstack((string_lens, np.array([lens], len_type)))
+        return string_lens
+
+    def growable_append(rows):
+        buffer = GrowableArray(len_type)
+        for _ in range(rows):
+            buffer.append(lens)
+        return buffer.array().reshape(-1, 1)
+
+    for rows in append_row_counts:
+        if rows <= row_stack_limit:
+            print_timing('row_stack', rows, time_call(lambda: row_stack_append(rows)))
+        print_timing('GrowableArray', rows, time_call(lambda: growable_append(rows)))
+
+
+def read_column(xml_file, name):
+    """
+    Read the values of an attribute for all users in an xml file
+    :param xml_file: name of file to read
+    :param name: name of attribute
+    :return: list of values, with '' for missing values
+    """
+    return [user.get(name, '') for user in iter_rows(xml_file) if int(user.get('Id')) > 0]
+
+
+def bench_html():
+    """
+    Assert the text from html_text matches BeautifulSoup's for the AboutMe entries in the xml source, and compare
+    their throughput
+    """
+    print('\nAboutMe html to text\n----------------------------------')
+    about_me = read_column(xml_source, 'AboutMe')
+
+    def soup_text(markup):
+        return BeautifulSoup(markup, 'html.parser').get_text()
+
+    expected = [soup_text(markup) for markup in about_me]
+    mismatches = [idx for idx, markup in enumerate(about_me) if strip_html(markup) != expected[idx]]
+    assert len(mismatches) == 0, f'text mismatches: {len(mismatches)} of {len(about_me)}, e.g. ' + \
+        ', '.join(f'row {idx}: {repr(about_me[idx][:100])}' for idx in mismatches[:5])
+    re_words = re.compile(r'(\w+)')
+    mismatches = [idx for idx, markup in enumerate(about_me)
+                  if count_words(markup) != len(re_words.findall(expected[idx]))]
+    assert len(mismatches) == 0, f'word count mismatches: {len(mismatches)} of {len(about_me)}'
+
+    rows = len(about_me)
+    print_timing('BeautifulSoup get_text', rows, time_call(lambda: [soup_text(markup) for markup in about_me]))
+    print_timing('strip_html', rows, time_call(lambda: [strip_html(markup) for markup in about_me]))
+    print_timing('count_words', rows, time_call(lambda: [count_words(markup) for markup in about_me]))
+
+
+def bench_parallel_words():
+    """
+    Compare AboutMe word counting in this process and in pools of worker processes
+    The counts of the pools are asserted to match those counted in this process.
+    """
+    print('\nAboutMe word counts\n----------------------------------')
+    about_me = StringColumn.from_strings(read_column(xml_source, 'AboutMe'))
+    rows = len(about_me)
+    expected = np.fromiter((count_words(markup) for markup in about_me), dtype=np.int32, count=rows)
+
+    print_timing('count_words', rows, time_call(lambda: [count_words(markup) for markup in about_me]))
+    for workers in parallel_workers:
+        assert np.array_equal(count_words_parallel(about_me, workers), expected), \
+            f'word count mismatch with {workers} workers'
+        print_timing(f'count_words_parallel {workers}', rows,
+                     time_call(lambda: count_words_parallel(about_me, workers)))
+
+
+def bench_scan():
+    """
+    Compare reading numeric, date and string attributes with ElementTree and with the attribute scanner
+    The scanned columns are asserted to match those read with ElementTree.
+    """
+    print('\nRead numeric, date and string attributes\n----------------------------------')
+    int_names = ['Id', 'Reputation', 'Views', 'UpVotes', 'DownVotes', 'Age']
+    date_names = ['CreationDate', 'LastAccessDate']
+    str_names = ['DisplayName', 'WebsiteUrl', 'Location', 'AboutMe']
+
+    def etree_read():
+        rows = [row.attrib for row in iter_rows(xml_source)]
+        columns = {name: np.array([int(row.get(name, 0)) for row in rows], dtype=np.int64) for name in int_names}
+        for name in date_names:
+            columns[name] = np.array([row.get(name, 'NaT') for row in rows], dtype='datetime64[ms]')
+        for name in str_names:
+            columns[name] = [row.get(name) for row in rows]
+        return columns
+
+    def scan_read():
+        buffer = map_source(xml_source)
+        scanner = AttributeScanner(buffer)
+        columns = {name: scanner.int_column(name) for name in int_names}
+        for name in date_names:
+            columns[name] = scanner.date_column(name)
+        for name in str_names:
+            columns[name] = scanner.str_column(name)
+        return columns
+
+    expected = etree_read()
+    scanned = scan_read()
+    mismatches = [name for name in int_names + date_names if not np.array_equal(expected[name], scanned[name])]
+    mismatches += [name for name in str_names if expected[name] != scanned[name]]
+    assert len(mismatches) == 0, f'column mismatches: {mismatches}'
+
+    rows = len(expected['Id'])
+    print_timing('ElementTree', rows, time_call(etree_read))
+    print_timing('AttributeScanner', rows, time_call(scan_read))
+
+
+def bench_table_files():
+    """
+    Compare saving and loading the users DataFrame as csv and as Parquet and Arrow IPC (Feather) files
+    """
+    print('\nUsers DataFrame files\n----------------------------------')
+    users.display_output = False
+    attributes = users.select_attributes(users.all_attributes)
+    df = users.load_dataframe(attributes)
+    rows = len(df)
+    dates = [attrib["name"] for attrib in attributes if attrib["type"] == users.dateAttrib]
+
+    def csv_load():
+        # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.read_csv.html
+        return pd.read_csv(csv_bench_file, parse_dates=dates, date_format='ISO8601')
+
+    print_timing('csv save', rows, time_call(lambda: users.export_csv_file(csv_bench_file, df)))
+    print_timing('csv load', rows, time_call(csv_load))
+    print(f'{"csv size":<30} {os.path.getsize(csv_bench_file):>12,} bytes')
+    os.remove(csv_bench_file)
+
+    try:
+        import pyarrow
+    except ImportError:
+        print('pyarrow is not installed, skipping Parquet and Arrow IPC (Feather) files')
+        return
+
+    for filename, compression in table_files:
+        name = f'{filename} {compression}'
+        print_timing(f'{name} save', rows,
+                     time_call(lambda: save_table(filename, df, xml_source, compression=compression,
+                                                  dictionary_columns=users.dictionary_columns)))
+        print_timing(f'{name} load', rows, time_call(lambda: load_table(filename, xml_source)))
+        print(f'{name + " size":<30} {os.path.getsize(filename):>12,} bytes')
+        os.remove(filename)
+
+
+def bench_nlargest():
+    """
+    Compare selecting the most frequent entries by sorting all the counts and by partitioning them
+    The results are asserted to match a stable sort, which gives the expected order for equal counts.
+    """
+    print('\nTop n most frequent entries\n----------------------------------')
+
+    def nlargest_argsort(values, counts, n):
+        # previous implementation, sorting all the counts
+        counts_indices = counts.argsort()
+        unique_count = len(counts_indices)
+        if unique_count < n:
+            return values[counts_indices[::-1]], counts[counts_indices[::-1]]
+        stop = unique_count - n - 1
+        return values[counts_indices[:stop:-1]], counts[counts_indices[:stop:-1]]
+
+    rng = np.random.default_rng(1)
+    for unique_count in nlargest_unique_counts:
+        values = np.arange(unique_count)
+        # https://numpy.org/doc/stable/reference/random/generated/numpy.random.Generator.zipf.html
+        counts = rng.zipf(1.5, unique_count).astype(np.int64)     # skewed counts, with many ties
+        for n in nlargest_n + [unique_count]:
+            # https://docs.scipy.org/doc/numpy/reference/generated/numpy.argsort.html
+            expected = np.argsort(-counts, kind='stable')[:n]
+            top_values, top_counts = nlargest_counts(values, counts, n)
+            assert np.array_equal(top_values, values[expected]) and np.array_equal(top_counts, counts[expected]), \
+                f'nlargest_counts mismatch for n={n} of {unique_count}'
+            old_count = len(nlargest_argsort(values, counts, n)[0])
+            if old_count != n:
+                print(f'argsort returned {old_count} entries for n={n} of {unique_count}')
+            print_timing(f'argsort n={n}', unique_count, time_call(lambda: nlargest_argsort(values, counts, n)))
+            print_timing(f'partition n={n}', unique_count, time_call(lambda: nlargest_counts(values, counts, n)))
+
+
+def bench_sqlite():
+    """
+    Compare loading the users into SQLite with batch sizes, then answering the questions with indexed SQL, with Pandas
+    and with NumPy
+    """
+    print('\nSQLite\n----------------------------------')
+    users_sqlite.display_output = False
+    connection = None
+    for batch_rows in sqlite_batch_rows:
+        if connection is not None:
+            connection.close()
+        start = timeit.default_timer()
+        connection = users_sqlite.create_database(sqlite_bench_file, xml_source, batch_rows=batch_rows)
+        seconds = timeit.default_timer() - start
+        rows = connection.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        print_timing(f'load, {batch_rows:,} rows/batch', rows, seconds)
+
+    users.display_output = False
+    df = users.load_dataframe(users.all_attributes)
+    arrays = {name: df[name].to_numpy() for name in df.columns}
+    rows = len(df)
+    limit = dt.datetime(2014, 6, 1) - dt.timedelta(days=180)
+    sql_limit = limit.isoformat(timespec='milliseconds')
+    np_limit = np.datetime64(limit, 'ms')
+    edges = users.age_bins
+    sql_edges = [None] + edges + [None]
+
+    def np_top(values, n):
+        values = values[values == values]   # NaN is not equal to itself
+        return nlargest_counts(*np.unique(values, return_counts=True), n)
+
+    def df_extremes(name, function):
+        value = getattr(df[name], function)()
+        return value, df[df[name] == value]
+
+    def np_extremes(name, function):
+        value = getattr(arrays[name], function)()
+        return value, np.flatnonzero(arrays[name] == value)
+
+    def split_average(words):
+        avg = words.mean()
+        return avg, (words < avg).sum(), (words > avg).sum(), (words == avg).sum()
+
+    # the database keeps the AboutMe word counts, so count them up front for the DataFrame and arrays too
+    about_me_words = np.fromiter((count_words(markup) if markup == markup else 0 for markup in arrays['AboutMe']),
+                                 dtype=np.int64, count=rows)
+    extreme_columns = [('DownVotes', 'MAX', 'max'), ('Views', 'MAX', 'max'), ('UpVotes', 'MAX', 'max'),
+                       ('Views', 'MIN', 'min')]
+
+    # each question answered by SQL, Pandas and NumPy
+    questions = {
+        'oldest/newest': (
+            lambda: [users_sqlite.extreme(connection, 'CreationDate', function, 1) for function in ['MIN', 'MAX']],
+            lambda: (df['CreationDate'].idxmin(), df['CreationDate'].idxmax()),
+            lambda: (arrays['CreationDate'].argmin(), arrays['CreationDate'].argmax())),
+        'average age': (
+            lambda: connection.execute('SELECT AVG(Age) FROM users').fetchone(),
+            lambda: df['Age'].mean(),
+            lambda: arrays['Age'].mean()),
+        'highest/lowest': (
+            lambda: [users_sqlite.extreme(connection, name, function) for name, function, _ in extreme_columns],
+            lambda: [df_extremes(name, function) for name, _, function in extreme_columns],
+            lambda: [np_extremes(name, function) for name, _, function in extreme_columns]),
+        'inactive': (
+            lambda: users_sqlite.range_users(connection, 'LastAccessDate', high=sql_limit),
+            lambda: df[df['LastAccessDate'] < np_limit],
+            lambda: np.flatnonzero(arrays['LastAccessDate'] < np_limit)),
+        'age groups': (
+            lambda: [users_sqlite.range_users(connection, 'Age', low, high)
+                     for low, high in zip(sql_edges[:-1], sql_edges[1:])],
+            # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.cut.html
+            lambda: pd.cut(df['Age'], [-np.inf] + edges + [np.inf], right=False).value_counts(sort=False),
+            lambda: np.bincount(np.digitize(arrays['Age'], edges))),
+        'top locations': (
+            lambda: users_sqlite.top_counts(connection, 'Location', 20),
+            lambda: df['Location'].value_counts().nlargest(20),
+            lambda: np_top(arrays['Location'], 20)),
+        'website urls': (
+            lambda: users_sqlite.top_counts(connection, 'WebsiteUrl', 15),
+            lambda: df['WebsiteUrl'].value_counts().nlargest(15),
+            lambda: np_top(arrays['WebsiteUrl'], 15)),
+        'AboutMe above/below': (
+            lambda: connection.execute(
+                "SELECT TOTAL(AboutMeWords < avg), TOTAL(AboutMeWords > avg), TOTAL(AboutMeWords = avg) "
+                "FROM users, (SELECT AVG(AboutMeWords) AS avg FROM users)").fetchone(),
+            lambda: split_average(pd.Series(about_me_words)),
+            lambda: split_average(about_me_words)),
+    }
+    for question, functions in questions.items():
+        for backend, function in zip(['SQLite', 'Pandas', 'NumPy'], functions):
+            print_timing(f'{question}, {backend}', rows, time_call(function, number=10))
+
+    connection.close()
+    for suffix in ['', '-wal', '-shm']:
+        if os.path.exists(sqlite_bench_file + suffix):
+            os.remove(sqlite_bench_file + suffix)
+
+
+def main():
+    benchmark_functions = {
+        'append': bench_append,
+        'html': bench_html,
+        'parallel_words': bench_parallel_words,
+        'scan': bench_scan,
+        'table_files': bench_table_files,
+        'nlargest': bench_nlargest,
+        'sqlite': bench_sqlite,
+    }
+    for name in benchmarks:
+        benchmark_functions[name]()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,589 @@
+# Column storage helpers for the users solutions
+import hashlib
+import json
+import os
+import os.path as osp
+
+import numpy as np
+
+initial_capacity = 1024     # initial number of entries allocated by a growable array
+
+
+class GrowableArray:
+    """
+    NumPy array which may be appended to, with amortized constant time appends
+    Capacity is doubled whenever the array is full, so n appends copy at most 2n entries in total.
+    """
+
+    def __init__(self, dtype, capacity=initial_capacity):
+        """
+        Create a growable array
+        :param dtype: NumPy data type of the entries
+        :param capacity: initial number of entries to allocate
+        """
+        self._data = np.empty(max(capacity, 1), dtype=dtype)
+        self._count = 0
+
+    @classmethod
+    def from_array(cls, array):
+        """
+        Create a growable array holding the entries of an existing array, without copying it
+        The entries are only copied if the array is appended to.
+        :param array: array of entries
+        :return: growable array
+        """
+        growable = cls.__new__(cls)
+        growable._data = array
+        growable._count = len(array)
+        return growable
+
+    def __len__(self):
+        return self._count
+
+    def _reserve(self, count):
+        """
+        Ensure there is room for the specified total number of entries
+        :param count: total number of entries required
+        """
+        capacity = len(self._data)
+        if count > capacity:
+            while capacity < count:
+                capacity *= 2
+            grown = np.empty(capacity, dtype=self._data.dtype)
+            grown[:self._count] = self._data[:self._count]
+            self._data = grown
+
+    def append(self, value):
+        """
+        Append an entry
+        :param value: value to append
+        """
+        if self._count == len(self._data):
+            self._reserve(self._count + 1)
+        self._data[self._count] = value
+        self._count += 1
+
+    def extend(self, values):
+        """
+        Append multiple entries
+        :param values: array of values to append
+        """
+        values = np.asarray(values, dtype=self._data.dtype)
+        self._reserve(self._count + len(values))
+        self._data[self._count:self._count + len(values)] = values
+        self._count += len(values)
+
+    def array(self):
+        """
+        Get the entries
+        :return: array view of the entries appended so far
+        """
+        return self._data[:self._count]
+
+
+def range_indices(starts, lengths):
+    """
+    Get the indices of all the entries in a set of ranges
+    :param starts: array of range start indices
+    :param lengths: array of range lengths
+    :return: int64 array of the indices in each range, range after range
+    """
+    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.repeat.html
+    ends = np.cumsum(lengths)
+    return np.arange(ends[-1] if len(ends) > 0 else 0, dtype=np.int64) + np.repeat(starts - ends + lengths, lengths)
+
+
+class StringColumn:
+    """
+    Column of strings stored Arrow-style, as a buffer of utf-8 bytes and the offsets of the entries in it
+    Entry i is data[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, offsets=None, data=None):
+        """
+        Create a string column
+        :param offsets: array of entry offsets, with one more entry than the column; or None for an empty column
+        :param data: array of utf-8 bytes
+        """
+        if offsets is None:
+            self._offsets = GrowableArray(np.int64)
+            self._offsets.append(0)
+            self._data = GrowableArray(np.uint8)
+        else:
+            self._offsets = GrowableArray.from_array(offsets)
+            self._data = GrowableArray.from_array(data)
+
+    @classmethod
+    def from_strings(cls, strings):
+        """
+        Create a string column from a sequence of strings
+        :param strings: sequence of strings
+        :return: string column
+        """
+        encoded = [value.encode('utf-8') for value in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.cumsum.html
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+    @classmethod
+    def concat(cls, columns):
+        """
+        Join string columns end to end
+        :param columns: list of string columns
+        :return: string column
+        """
+        offsets = [np.zeros(1, dtype=np.int64)]
+        data = []
+        base = 0
+        for column in columns:
+            arrays = column.arrays()
+            offsets.append(arrays["offsets"][1:] - arrays["offsets"][0] + base)
+            data.append(arrays["data"][arrays["offsets"][0]:arrays["offsets"][-1]])
+            base = offsets[-1][-1] if len(offsets[-1]) > 0 else base
+        return cls(np.concatenate(offsets), np.concatenate(data) if len(data) > 0 else np.empty(0, dtype=np.uint8))
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        offsets = self._offsets.array()
+        return self._data.array()[offsets[index]:offsets[index + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        offsets = self._offsets.array()
+        data = self._data.array()
+        for idx in range(len(self)):
+            yield data[offsets[idx]:offsets[idx + 1]].tobytes().decode('utf-8')
+
+    def slice(self, start, stop):
+        """
+        Get a range of entries, without copying them
+        :param start: index of first entry
+        :param stop: index after last entry
+        :return: string column
+        """
+        return StringColumn(self._offsets.array()[start:stop + 1], self._data.array())
+
+    def take(self, index):
+        """
+        Get entries by index
+        :param index: array of entry indices
+        :return: string column
+        """
+        offsets = self._offsets.array()
+        lengths = offsets[index + 1] - offsets[index]
+        taken = np.zeros(len(index) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=taken[1:])
+        return StringColumn(taken, self._data.array()[range_indices(offsets[index], lengths)])
+
+    def append(self, value):
+        """
+        Append an entry
+        :param value: string to append
+        """
+        self._data.extend(np.frombuffer(value.encode('utf-8'), dtype=np.uint8))
+        self._offsets.append(len(self._data))
+
+    def decode(self):
+        """
+        Decode all the entries
+        :return: object array of strings
+        """
+        offsets = self._offsets.array().tolist()
+        data = self._data.array().tobytes()
+        decoded = np.empty(len(self), dtype=object)
+        decoded[:] = [data[start:stop].decode('utf-8') for start, stop in zip(offsets[:-1], offsets[1:])]
+        return decoded
+
+    def arrays(self):
+        """
+        Get the arrays holding the column
+        :return: dictionary of array name and array
+        """
+        return {"offsets": self._offsets.array(), "data": self._data.array()}
+
+
+class DictionaryColumn:
+    """
+    Column of strings stored as integer codes into a table of unique values
+    """
+
+    def __init__(self, codes=None, values=None):
+        """
+        Create a dictionary encoded column
+        :param codes: array of codes; or None for an empty column
+        :param values: array of unique values
+        """
+        if codes is None:
+            self._codes = GrowableArray(np.int32)
+            self._values = []
+        else:
+            self._codes = GrowableArray.from_array(codes)
+            self._values = list(values)
+        self._lookup = {value: code for code, value in enumerate(self._values)}
+        self._array = None      # array of the unique values, created when first required
+
+    def _share(self, codes):
+        """
+        Create a column of codes into the same unique values, without copying them or their lookup
+        :param codes: array of codes
+        :return: dictionary encoded column
+        """
+        column = DictionaryColumn.__new__(DictionaryColumn)
+        column._codes = GrowableArray.from_array(codes)
+        column._values = self._values
+        column._lookup = self._lookup
+        column._array = self.values     # created once for the column and all its slices
+        return column
+
+    @classmethod
+    def concat(cls, columns):
+        """
+        Join dictionary encoded columns end to end
+        :param columns: list of dictionary encoded columns
+        :return: dictionary encoded column, with its unique values in ascending order
+        """
+        lookup = {}
+        codes = [np.empty(0, dtype=np.int32)]
+        for column in columns:
+            recode = np.array([lookup.setdefault(value, len(lookup)) for value in column._values], dtype=np.int32)
+            codes.append(recode[column.codes] if len(recode) > 0 else np.empty(0, dtype=np.int32))
+        joined = cls(np.concatenate(codes), list(lookup))
+        joined.sort()
+        return joined
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __getitem__(self, index):
+        return self._values[self._codes.array()[index]]
+
+    def __iter__(self):
+        for code in self._codes.array():
+            yield self._values[code]
+
+    @property
+    def codes(self):
+        return self._codes.array()
+
+    @property
+    def values(self):
+        # the unique values may have been appended to since the array was created
+        if self._array is None or len(self._array) != len(self._values):
+            self._array = np.array(self._values, dtype=np.str_)
+            self._array.flags.writeable = False
+        return self._array
+
+    def shares_values(self, other):
+        """
+        Check if another column has the same unique values, e.g. as both are slices of the same column
+        :param other: dictionary encoded column
+        :return: True if the codes of both columns are into the same unique values
+        """
+        return self._values is other._values
+
+    def slice(self, start, stop):
+        """
+        Get a range of entries, without copying their codes
+        :param start: index of first entry
+        :param stop: index after last entry
+        :return: dictionary encoded column, sharing the unique values
+        """
+        return self._share(self.codes[start:stop])
+
+    def take(self, index):
+        """
+        Get entries by index
+        :param index: array of entry indices
+        :return: dictionary encoded column, sharing the unique values
+        """
+        return self._share(self.codes[index])
+
+    def append(self, value):
+        """
+        Append an entry
+        :param value: string to append
+        """
+        code = self._lookup.get(value)
+        if code is None:
+            code = len(self._values)
+            self._lookup[value] = code
+            self._values.append(value)
+        self._codes.append(code)
+
+    def sort(self):
+        """
+        Sort the unique values into ascending order, updating the codes to match
+        """
+        values = self.values
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.argsort.html
+        order = np.argsort(values, kind='stable')
+        recode = np.empty(len(order), dtype=np.int32)
+        recode[order] = np.arange(len(order), dtype=np.int32)
+        self._codes = GrowableArray.from_array(recode[self.codes])
+        self._values = values[order].tolist()
+        self._lookup = {value: code for code, value in enumerate(self._values)}
+        self._array = None
+
+    def counts(self):
+        """
+        Count the occurrences of each unique value
+        :return: array of counts, in the same order as the unique values
+        """
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.bincount.html
+        return np.bincount(self.codes, minlength=len(self._values))
+
+    def arrays(self):
+        """
+        Get the arrays holding the column
+        :return: dictionary of array name and array
+        """
+        return {"codes": self.codes, "values": self.values}
+
+
+# encoded column types, by the names of the arrays holding them
+encoded_columns = {
+    ("data", "offsets"): StringColumn,
+    ("codes", "values"): DictionaryColumn,
+}
+
+
+class ColumnTable:
+    """
+    Table of named columns, which may be NumPy arrays or encoded string columns
+    Indexing by name gives a column, and indexing by row index gives the rows as a structured array.
+    """
+
+    def __init__(self, columns):
+        """
+        Create a table
+        :param columns: dictionary of column name and column, all of the same length
+        """
+        self.columns = columns
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if len(self.columns) > 0 else 0
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        return self.rows(key)
+
+    def rows(self, index):
+        """
+        Get rows as a structured array, decoding string columns
+        :param index: row index or array of row indices
+        :return: structured array of rows
+        """
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.atleast_1d.html
+        indices = np.atleast_1d(index)
+        values = {}
+        type_list = []
+        for name, column in self.columns.items():
+            if isinstance(column, np.ndarray):
+                values[name] = column[indices]
+            else:
+                values[name] = np.array([column[idx] for idx in indices], dtype=np.str_)
+            type_list.append((name, values[name].dtype))
+        rows = np.empty(len(indices), dtype=np.dtype(type_list))
+        for name in self.columns:
+            rows[name] = values[name]
+        return rows
+
+    def slice(self, start, stop):
+        """
+        Get a range of rows, without copying them
+        :param start: index of first row
+        :param stop: index after last row
+        :return: table
+        """
+        return ColumnTable({name: column[start:stop] if isinstance(column, np.ndarray) else column.slice(start, stop)
+                            for name, column in self.columns.items()})
+
+    def arrays(self):
+        """
+        Get the arrays holding the table, e.g. to save to a cache
+        Encoded columns are held in multiple arrays, named '<column>.<array>'.
+        :return: dictionary of array name and array
+        """
+        arrays = {}
+        for name, column in self.columns.items():
+            if isinstance(column, np.ndarray):
+                arrays[name] = column
+            else:
+                for part, array in column.arrays().items():
+                    arrays[f'{name}.{part}'] = array
+        return arrays
+
+    @classmethod
+    def concat(cls, tables):
+        """
+        Join tables with the same columns end to end
+        :param tables: list of tables
+        :return: table
+        """
+        columns = {}
+        for name, column in tables[0].columns.items():
+            parts = [table.columns[name] for table in tables]
+            if isinstance(column, np.ndarray):
+                # https://docs.scipy.org/doc/numpy/reference/generated/numpy.concatenate.html
+                columns[name] = np.concatenate(parts)
+            else:
+                columns[name] = type(column).concat(parts)
+        return cls(columns)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Create a table from the arrays holding it, as returned by arrays()
+        :param arrays: dictionary of array name and array
+        :return: table
+        """
+        parts = {}
+        for key, array in arrays.items():
+            name, _, part = key.partition('.')
+            parts.setdefault(name, {})[part] = array
+        columns = {}
+        for name, column_parts in parts.items():
+            if '' in column_parts:
+                columns[name] = column_parts['']
+            else:
+                column_type = encoded_columns[tuple(sorted(column_parts.keys()))]
+                columns[name] = column_type(**column_parts)
+        return cls(columns)
+
+
+# persistent columnar cache
+# https://docs.scipy.org/doc/numpy/reference/generated/numpy.save.html
+# https://docs.scipy.org/doc/numpy/reference/generated/numpy.load.html
+cache_manifest_name = 'manifest.json'   # name of cache file describing the source and columns
+cache_format = 6                        # version of the cache layout, caches with other versions are ignored
+hash_chunk_size = 16 * 1024 * 1024      # size of chunks read when hashing the source file
+
+
+def file_hash(filename):
+    """
+    Get the hash of a file's contents
+    :param filename: name of file to hash
+    :return: hex digest of sha256 hash
+    """
+    # https://docs.python.org/3/library/hashlib.html
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        while True:
+            chunk = file.read(hash_chunk_size)
+            if not chunk:
+                break
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def source_key(filename, settings=None):
+    """
+    Get the key identifying the contents of a source file
+    :param filename: name of source file
+    :param settings: optional dictionary of settings affecting the cached data
+    :return: dictionary of file size, modification time, hash and settings
+    """
+    stat = os.stat(filename)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_hash(filename),
+            "settings": settings if settings is not None else {}}
+
+
+def _column_path(cache_dir, name, suffix=''):
+    return osp.join(cache_dir, f'{name}{suffix}.npy')
+
+
+def save_columns(cache_dir, source_file, columns, settings=None, indexes=None, zones=None):
+    """
+    Save columns to a cache, one .npy file per column
+    Object columns are saved encoded as string columns, i.e. the offsets of the entries in a buffer of utf-8 bytes, with a
+    mask of the entries which were None or NaN.
+    :param cache_dir: cache directory
+    :param source_file: name of file the columns were read from
+    :param columns: dictionary of column name and array
+    :param settings: optional dictionary of settings affecting the cached data
+    :param indexes: optional dictionary of column name and sort order of the column, see users_index.sort_orders()
+    :param zones: optional dictionary of column name and chunk statistics of the column, see users_stats.column_zones()
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = osp.join(cache_dir, cache_manifest_name)
+    if osp.exists(manifest_path):
+        os.remove(manifest_path)    # invalidate until all columns are written
+
+    masked = []
+    for name, column in columns.items():
+        column = np.asarray(column)
+        if column.dtype == object:
+            # fixed-width strings are as wide as the longest entry, so store the entries end to end instead
+            mask = np.array([value is None or value != value for value in column], dtype=np.bool_)
+            np.save(_column_path(cache_dir, name, '.mask'), mask)
+            encoded = StringColumn.from_strings(np.where(mask, '', column).tolist())
+            for part, array in encoded.arrays().items():
+                np.save(_column_path(cache_dir, name, f'.{part}'), array)
+            masked.append(name)
+        else:
+            np.save(_column_path(cache_dir, name), column)
+    indexes = indexes if indexes is not None else {}
+    for name, order in indexes.items():
+        np.save(_column_path(cache_dir, name, '.order'), order)
+    zones = zones if zones is not None else {}
+    for name, column_zones in zones.items():
+        np.save(_column_path(cache_dir, name, '.zones'), column_zones)
+
+    manifest = source_key(source_file, settings)
+    manifest["format"] = cache_format
+    manifest["columns"] = list(columns.keys())
+    manifest["masked"] = masked
+    manifest["indexes"] = list(indexes.keys())
+    manifest["zones"] = list(zones.keys())
+    # write the manifest under another name and then rename it, so a partly written manifest is never loaded
+    # https://docs.python.org/3/library/os.html#os.replace
+    with open(manifest_path + '.tmp', 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+
+def load_columns(cache_dir, source_file, settings=None):
+    """
+    Load columns from a cache, if it is valid for the source file
+    The cache is invalid if the source file size or hash have changed; the hash is only recalculated if the
+    modification time has changed.
+    :param cache_dir: cache directory
+    :param source_file: name of file the columns were read from
+    :param settings: optional dictionary of settings affecting the cached data
+    :return: tuple of dictionary of column name and read-only memory-mapped array, or StringColumn for object
+             columns, dictionary of column name and mask of missing entries for object columns, dictionary of column
+             name and sort order for indexed columns, and dictionary of column name and chunk statistics; or None if
+             the cache is not valid
+    """
+    manifest_path = osp.join(cache_dir, cache_manifest_name)
+    if not osp.exists(manifest_path) or not osp.exists(source_file):
+        return None
+    try:
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+    except ValueError:
+        return None     # not a complete manifest
+
+    if manifest.get("format") != cache_format:
+        return None
+    stat = os.stat(source_file)
+    if stat.st_size != manifest["size"] or manifest["settings"] != (settings if settings is not None else {}):
+        return None
+    if stat.st_mtime_ns != manifest["mtime_ns"] and file_hash(source_file) != manifest["sha256"]:
+        return None
+
+    columns = {}
+    masks = {}
+    for name in manifest["columns"]:
+        if name in manifest["masked"]:
+            columns[name] = StringColumn(np.load(_column_path(cache_dir, name, '.offsets'), mmap_mode='r'),
+                                         np.load(_column_path(cache_dir, name, '.data'), mmap_mode='r'))
+            masks[name] = np.load(_column_path(cache_dir, name, '.mask'), mmap_mode='r')
+        else:
+            columns[name] = np.load(_column_path(cache_dir, name), mmap_mode='r')
+    indexes = {name: np.load(_column_path(cache_dir, name, '.order'), mmap_mode='r') for name in manifest["indexes"]}
+    zones = {name: np.load(_column_path(cache_dir, name, '.zones')) for name in manifest["zones"]}
+    return columns, masks, indexes, zones
@@ -0,0 +1,150 @@
+# Sorted indexes for the users solutions
+# An index is the sort order (argsort permutation) of a column, kept in the column cache alongside the data. Counting
+# the rows before or between values is then a binary search of the values in sort order, reading only the values it
+# compares, and the rows themselves are a slice of the sort order, so queries at many reference dates do not each scan
+# the column.
+import numpy as np
+
+from users_aggregate import valid_mask
+
+# https://docs.scipy.org/doc/numpy/reference/generated/numpy.argsort.html
+# https://docs.scipy.org/doc/numpy/reference/generated/numpy.searchsorted.html
+
+
+def sort_orders(columns, names):
+    """
+    Get the sort orders of columns
+    Missing values, i.e. NaN or NaT, are sorted to the end.
+    :param columns: dictionary-like of column name and array
+    :param names: names of columns to sort; names of columns not in columns are ignored
+    :return: dictionary of column name and int64 array of row indices in ascending order of value
+    """
+    return {name: np.argsort(columns[name], kind='stable').astype(np.int64) for name in names if name in columns}
+
+
+def refresh_order(order, column, rows):
+    """
+    Update the sort order of a column after some of its rows have changed or been added
+    The other rows keep their order, and the changed and added rows are merged into it.
+    :param order: sort order of the column before the change
+    :param column: array of the changed column
+    :param rows: array of the indices of the changed and added rows
+    :return: int64 array of row indices in ascending order of value
+    """
+    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.isin.html
+    kept = np.asarray(order)[~np.isin(order, rows)]
+    rows = rows[np.argsort(column[rows], kind='stable')]
+    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.insert.html
+    return np.insert(kept, np.searchsorted(column[kept], column[rows], side='right'), rows).astype(np.int64)
+
+
+def date_limits(reference_dates, days, dtype='datetime64[ms]'):
+    """
+    Get the dates a number of days before reference dates
+    :param reference_dates: reference date, or array-like of reference dates
+    :param days: number of days, or array-like of numbers of days; broadcast against reference_dates
+    :param dtype: NumPy datetime type of the result
+    :return: datetime array of limit dates
+    """
+    return np.asarray(reference_dates, dtype=dtype) - np.asarray(days).astype('timedelta64[D]')
+
+
+class SortedIndex:
+    """
+    Sorted index of a column
+    The sorted values are not gathered from the column, as that would read the whole column; searches read the values
+    through the sort order instead.
+    """
+
+    def __init__(self, values, order=None):
+        """
+        Create an index
+        :param values: array of column values
+        :param order: sort order of values, see sort_orders(), or None to sort them
+        """
+        if order is None:
+            order = np.argsort(values, kind='stable')
+        self.values = np.asarray(values)
+        self.order = order
+        # missing values are at the end of the sort order, and are never counted
+        if valid_mask(self.values[:0]) is None:
+            self.valid = len(self.order)
+        else:
+            self.valid = int(self._bisect(lambda sorted_values, _: valid_mask(sorted_values), 0, len(self.order)))
+
+    def __len__(self):
+        return self.valid
+
+    def _bisect(self, before, limits, count):
+        """
+        Binary search the first count values in sort order for many limits at once
+        :param before: function of an array of values and the limits, True where a value is before its limit; it must
+                       be True for the values in sort order up to some position, and False after it
+        :param limits: value, or array of values
+        :param count: number of values in sort order to search
+        :return: number, or int64 array of numbers, of the values before each limit
+        """
+        low = np.zeros(np.shape(limits), dtype=np.int64)
+        high = np.full(np.shape(limits), count, dtype=np.int64)
+        active = low < high
+        while active.any():
+            mid = (low + high) // 2
+            # only the values at the midpoints are read
+            right = active & before(self.values[self.order[np.minimum(mid, count - 1)]], limits)
+            low = np.where(right, mid + 1, low)
+            high = np.where(active & ~right, mid, high)
+            active = low < high
+        return low[()]
+
+    def count_before(self, limits):
+        """
+        Count the rows with values before limits
+        :param limits: value, or array of values
+        :return: count, or int64 array of counts
+        """
+        # missing limits are after all the values, as they are sorted
+        return self._bisect(lambda sorted_values, values: ~(sorted_values >= values), np.asarray(limits), self.valid)
+
+    def count_between(self, lows, highs):
+        """
+        Count the rows with values from lows up to but not including highs
+        :param lows: value, or array of values
+        :param highs: value, or array of values; broadcast against lows
+        :return: count, or int64 array of counts
+        """
+        return np.maximum(self.count_before(highs) - self.count_before(lows), 0)
+
+    def first_rows(self, count):
+        """
+        Get the rows with the lowest values
+        :param count: number of rows, e.g. from count_before()
+        :return: int64 array of row indices, in ascending order
+        """
+        return np.sort(self.order[:count])
+
+    def rows_before(self, limit):
+        """
+        Get the rows with values before a limit
+        :param limit: value
+        :return: int64 array of row indices, in ascending order
+        """
+        return self.first_rows(self.count_before(limit))
+
+    def count_inactive(self, reference_dates, days):
+        """
+        Count the rows with dates more than a number of days before reference dates, e.g. for many reference dates and
+        inactivity periods in a single call
+        :param reference_dates: reference date, or array-like of reference dates
+        :param days: number of days, or array-like of numbers of days; broadcast against reference_dates
+        :return: count, or int64 array of counts
+        """
+        return self.count_before(date_limits(reference_dates, days, self.values.dtype))
+
+    def inactive_rows(self, reference_date, days):
+        """
+        Get the rows with dates more than a number of days before a reference date
+        :param reference_date: reference date
+        :param days: number of days
+        :return: int64 array of row indices, in ascending order
+        """
+        return self.rows_before(date_limits(reference_date, days, self.values.dtype))
@@ -8,14 +8,23 @@
 # How many people with the sameWebsiteUrl
 # Users with above the average number of words AboutMe section
 # Users with below the average number of words AboutMe section
+import itertools
 import sys
-import time
-import xml.etree.ElementTree as eT
 import datetime as dt
 import numpy as np
-from bs4 import BeautifulSoup
-import re
 import timeit
+from concurrent.futures import ProcessPoolExecutor
+
+from html_text import count_words
+from users_aggregate import AggregationEngine, Bins, Counts, Extremes, Filter, Histogram, Mean, RowSet
+from users_columns import ColumnTable, DictionaryColumn, GrowableArray, StringColumn, load_columns, save_columns
+from users_index import SortedIndex, refresh_order, sort_orders
+from users_parallel import count_words_parallel, parse_parallel
+from users_reader import ProgressReporter, iter_rows
+from users_refresh import refresh_columns
+from users_scanner import AttributeScanner, read_blocks
+from users_sketch import HeavyHitters
+from users_stats import ColumnStats, refresh_zones, table_zones
 
 
 # https://docs.python.org/3/library/xml.etree.elementtree.html?highlight=elementtree
@@ -35,6 +44,7 @@ import timeit
 #
 
 strAttrib = "str"
+catAttrib = "cat"       # string with relatively few unique values, stored dictionary encoded
 dateAttrib = "date"
 htmlAttrib = "html"
 intAttrib = "int"
@@ -42,32 +52,95 @@ floatAttrib = "dbl"
 
 process_limit = sys.maxsize  # set to sys.maxsize to process all records or a smaller value
 
-pre_scan_string_lengths = True  # set to True to scan string lengths before processing
+pre_scan_string_lengths = False     # set to True to scan string lengths before processing (not needed to load)
 
 timeit_count = 0                        # set to desired number of executions, or 0 to disable timing
 display_output = (timeit_count == 0)    # display output if not timing execution
+progress_output = True                  # display progress while reading, if displaying output
+
+parse_workers = 1   # number of processes to parse the xml with, 1 to parse in this process or None for 1 per cpu;
+                    # only used when processing all records
+about_me_workers = 1    # number of processes to count AboutMe words with, 1 to count in this process or None for 1 per cpu
 
 max_array_display = 15      # max number of array entries to display
 
-xml_source = 'Users.xml'
+date_dtype = 'datetime64[ms]'   # NumPy type for dates
+
+xml_source = 'Users.xml.gz'     # plain or compressed (.gz, .bz2, .xz) xml file
+
+column_cache_dir = 'users_np_cache'     # directory for the binary column cache, or None to disable the cache
+refresh_source = None   # newer dump to refresh the users in the column cache from, e.g. 'Users-new.xml.gz', or None; only
+                        # its new and changed users are applied, and the refreshed cache is then kept for it
+
+stream_chunks = False   # set to True to stream the users through the reports a chunk at a time, so memory use does not
+                        # depend on the number of users; only max_array_display rows are kept for each report, and
+                        # approximate_counts must also be True, as exact counts keep every unique location and url
+stream_chunk_rows = 65536   # number of users in each chunk when streaming with the 'etree' xml engine
+
+xml_engine = 'etree'    # 'etree' to parse with ElementTree, or 'scan' to scan attribute values directly in the file
+scan_block_size = 64 * 1024 * 1024     # approx. size in bytes of the blocks of rows scanned at a time by the 'scan' engine
+
+approximate_counts = False  # set to True to count locations and website urls with bounded memory sketches; counts are
+                            # then approximate, and are displayed with the max amount they may be high by
+sketch_counters = 1000      # number of counters kept for the most frequent values; counts may be low by at most
+                            # users / (sketch_counters + 1) before the count-min sketch tightens them
+count_min_width = 65536     # width of count-min sketch; its counts may be high by at most e / width * users,
+count_min_depth = 5         # with probability 1 - e^-depth
+
+reports = ['oldest_newest', 'average_age', 'highest_lowest', 'inactive', 'age_groups', 'locations', 'website_urls',
+           'about_me']     # names of reports to run; only the columns they read are loaded, see report_columns
+row_columns = None      # columns to include when displaying the rows found by reports; None for all, or e.g. [] to only
+                        # load the columns the reports read
+
+# columns read by each report, and the reports which display the rows they find
+report_columns = {
+    'oldest_newest': ['CreationDate'],
+    'average_age': ['Age'],
+    'highest_lowest': ['DownVotes', 'Views', 'UpVotes'],
+    'inactive': ['LastAccessDate'],
+    'age_groups': ['Age'],
+    'locations': ['Location'],
+    'website_urls': ['WebsiteUrl'],
+    'about_me': ['AboutMe'],
+}
+row_reports = ['oldest_newest', 'highest_lowest', 'inactive', 'age_groups']
+
+age_bins = [18, 26, 36, 47]    # edges of the age groups; users are counted below the first edge, from each edge up to
+                                # the next, and from the last edge up
+sorted_index_columns = ['CreationDate', 'LastAccessDate']  # columns to keep a sorted index of in the column cache, for
+                                                            # date range queries such as inactive users
+
+
+def select_attributes(attributes):
+    """
+    Select the attributes to load for the reports to run
+    :param attributes: list of all attributes, the first of which is the user id
+    :return: list of attributes to load, in the same order
+    """
+    names = {attributes[0]["name"]}
+    for report in reports:
+        names.update(report_columns[report])
+    if any(report in row_reports for report in reports):
+        if row_columns is None:
+            return attributes
+        names.update(row_columns)
+    return [attrib for attrib in attributes if attrib["name"] in names]
 
 
-def read_attributes(entry, attributes, check_length=True):
+def read_attributes(entry, attributes):
     """
     Read the attributes for an user xml entry
     :param entry: xml entry string
     :param attributes: list of attributes to read
-    :param check_length: check lengths for html & string attributes
-    :return: dictionary of attribute values
+    :return: dictionary of attribute values; dates are left as ISO 8601 strings to be converted in bulk
     """
     attr_dict = {}
     for attrib in attributes:
         name = attrib["name"]
-        attrib_len = -1
         attrib_str = entry.get(name)
         if attrib_str is None:
             if attrib["type"] == dateAttrib:
-                attr_dict[name] = 0
+                attr_dict[name] = 'NaT'
             elif attrib["type"] == intAttrib:
                 attr_dict[name] = 0
             elif attrib["type"] == floatAttrib:
@@ -77,23 +150,13 @@ def read_attributes(entry, attributes, check_length=True):
             else:
                 attr_dict[name] = attrib_str
         elif attrib["type"] == dateAttrib:
-            attr_dict[name] = dt.datetime.fromisoformat(attrib_str)
+            attr_dict[name] = attrib_str
         elif attrib["type"] == intAttrib:
             attr_dict[name] = int(attrib_str)
         elif attrib["type"] == floatAttrib:
             attr_dict[name] = float(attrib_str)
-        elif attrib["type"] == htmlAttrib:
-            attr_dict[name] = attrib_str
-            if check_length:
-                attrib_len = len(attrib_str.encode('utf-8'))
         else:
             attr_dict[name] = attrib_str
-            if check_length:
-                attrib_len = len(attrib_str)
-
-        if attrib_len >= 0:
-            if attrib_len > attrib["size"]:
-                raise ValueError(f'size error {attrib_len} > {attrib["size"]} for {name}')
 
     return attr_dict
 
@@ -154,104 +217,88 @@ def print_array(array, indices, limit=max_array_display):
             count += 1
 
 
-def find_highest(title, name, array, column):
+def print_rows(array, row_set, limit=max_array_display):
     """
-    Display the entries with the highest value for the specified column in an array
-    :param title: header to display
-    :param name: name of column
-    :param array: NumPy array
-    :param column: column to find highest values for
+    Print the rows found by an aggregate
+    :param array: table of users, or None if the aggregate kept the values of the rows
+    :param row_set: RowSet of the aggregate
+    :param limit: max number of entries to print
     """
-    print_header(title)
-    search_column = array[column]
-    high = search_column.max()
-    display(f'highest {name}: {high}')
-    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.where.html#numpy.where
-    highest = np.where(search_column == high)
-    display(f'highest {name} count: {len(highest[0])}')
-    print_array(array, highest[0])
+    if array is not None:
+        print_array(array, row_set.rows, limit)
+    else:
+        for record in row_set.records[:limit]:
+            display_array(record, limit)
+        if row_set.count > limit:
+            display(f'{row_set.count - limit} additional entries')
 
 
-def find_lowest(title, name, array, column):
+def find_highest(title, name, array, extremes):
     """
-    Display the entries with the lowest value for the specified column in an array
+    Display the entries with the highest value for a column in an array
     :param title: header to display
     :param name: name of column
-    :param array: NumPy array
-    :param column: column to find lowest values for
+    :param array: table of users, or None if the aggregate kept the values of the rows
+    :param extremes: Extremes aggregate of the column
     """
     print_header(title)
-    search_column = array[column]
-    low = search_column.min()
-    display(f'lowest {name}: {low}')
-    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.where.html#numpy.where
-    lowest = np.where(search_column == low)
-    display(f'lowest {name} count: {len(lowest[0])}')
-    print_array(array, lowest[0])
+    display(f'highest {name}: {extremes.high}')
+    display(f'highest {name} count: {extremes.highs.count}')
+    print_rows(array, extremes.highs)
 
 
-def get_mean(array):
+def find_lowest(title, name, array, extremes):
     """
-    Get the mean of an array
-    :param array: array to get mean of
-    :return: mean value
+    Display the entries with the lowest value for a column in an array
+    :param title: header to display
+    :param name: name of column
+    :param array: table of users, or None if the aggregate kept the values of the rows
+    :param extremes: Extremes aggregate of the column
     """
-    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.nan_to_num.html
-    val_series = np.nan_to_num(array, nan=0)
-    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.mean.html?highlight=mean
-    return val_series.mean()
+    print_header(title)
+    display(f'lowest {name}: {extremes.low}')
+    display(f'lowest {name} count: {extremes.lows.count}')
+    print_rows(array, extremes.lows)
 
 
-def nlargest_array(array, n):
+def count_error(value_counts, idx):
     """
-    Find top most frequent entries in array
-    :param array: array to search
-    :param n: number of top entries
-    :return: tuple of entries and their counts
+    Get the count of a value for display, along with its error bound if it is approximate
+    :param value_counts: tuple of arrays of values and counts, and optionally errors
+    :param idx: index of value
+    :return: list of count and optional error bound
     """
-    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.unique.html
-    search_counts = np.unique(array, return_counts=True)    # tuple of unique locations and counts
-    counts = search_counts[1]
-    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.argsort.html
-    counts_indices = counts.argsort()   # indices of counts sorted in ascending order
-    unique_count = len(counts_indices)
-    if unique_count < n:
-        top_n = search_counts[0][counts_indices[::-1]]  # locations in descending count order
-        result = top_n, counts[counts_indices[::-1]]
-    else:
-        stop = unique_count - n - 1
-        top_n = search_counts[0][counts_indices[:stop:-1]]  # locations in descending count order
-        result = top_n, counts[counts_indices[:stop:-1]]
-    return result
+    if len(value_counts) > 2:
+        return [value_counts[1][idx], f'(error <= {value_counts[2][idx]})']
+    return [value_counts[1][idx]]
 
 
-def nlargest(array, n, column):
+def nlargest_counts(values, counts, n):
     """
-    Find top most frequent entries in a structured array
-    :param array: array to search
+    Find top most frequent entries from the counts of unique entries
+    The n largest counts are selected without sorting all the counts, and only they are sorted.
+    :param values: array of unique entries
+    :param counts: array of counts of the unique entries
     :param n: number of top entries
-    :param column: column to search
-    :return: tuple of entries and their counts
-    """
-    return nlargest_array(array[column], n)
-
-
-def show_progress(count, bs):
+    :return: tuple of min(n, number of unique entries) entries in descending count order, with equal counts in the
+             order of the entries, and their counts
     """
-    Show progress
-    :param count: count to display
-    :param bs: backspace string to overwrite current display
-    :return: backspace string to overwrite this display
-    """
-    # give some in progress feedback
-    msg = f'{count}'
-    if len(bs) > 0:
-        sys.stdout.write(bs)
-    bs = '\b' * (len(msg))
-    sys.stdout.write(msg)
-    sys.stdout.flush()
-    time.sleep(0.05)
-    return bs
+    n = max(min(n, len(counts)), 0)
+    if n == 0:
+        return values[:0], counts[:0]
+    if n < len(counts):
+        # the nth largest count; all larger counts are included, and the first of those equal to it
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.partition.html
+        threshold = np.partition(counts, len(counts) - n)[len(counts) - n]
+        larger = np.flatnonzero(counts > threshold)
+        equal = np.flatnonzero(counts == threshold)[:n - len(larger)]
+        top_n = np.sort(np.concatenate((larger, equal)))
+    else:
+        top_n = np.arange(len(counts))
+    # sort by descending count; the sort is stable, so equal counts stay in index order
+    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.argsort.html
+    top_n = top_n[np.argsort(-counts[top_n], kind='stable')]
+    return values[top_n], counts[top_n]
 
 
 def scan_strings(xml_file, attributes, skip=0):
@@ -262,25 +309,21 @@ def scan_strings(xml_file, attributes, skip=0):
     :param skip: number of lines at start of file to skip
     :return: array of lengths, or None if error occured
     """
-    # declare array, 0 rows, 1 column
+    # growable buffer of lengths, one entry per row
     type_list = []
     for attrib in attributes:
         type_list.append((attrib["name"], np.int32))
-    string_lens = np.empty([0, 1], np.dtype(type_list))
+    lens_buffer = GrowableArray(np.dtype(type_list))
 
     try:
-        tree = eT.parse(xml_file)
-        root = tree.getroot()
-
         # scan specified attributes
-        bs = ''
+        progress = ProgressReporter('string scan user count', enabled=display_output and progress_output)
         count = 0
-        display('string scan user count: ', end='')
-        for userXml in root:
+        for userXml in iter_rows(xml_file, progress):
             if skip > 0:
                 skip -= 1
             else:
-                user = read_attributes(userXml, attributes, check_length=False)
+                user = read_attributes(userXml, attributes)
                 lens = []
                 for attrib in attributes:
                     if user[attrib["name"]] is None:
@@ -288,19 +331,19 @@ def scan_strings(xml_file, attributes, skip=0):
                     else:
                         size = len(user[attrib["name"]])
                     lens.append(size)
-                # row_stack is an alias for vstack
-                # https://docs.scipy.org/doc/numpy/reference/generated/numpy.vstack.html?highlight=vstack#numpy.vstack
-                string_lens = np.row_stack((string_lens, np.array([tuple(lens)], np.dtype(type_list))))
-                count = string_lens.shape[0]
+                lens_buffer.append(tuple(lens))
+                count = len(lens_buffer)
 
-                if display_output and (count % 100 == 0):
-                    # give some in progress feedback
-                    bs = show_progress(count, bs)
+                # give some in progress feedback
+                progress.update(count)
 
                 global process_limit
                 if count > process_limit:
                     break
-        show_progress(count, bs)
+        progress.finish(count)
+
+        # array of lengths, 1 column
+        string_lens = lens_buffer.array().reshape(-1, 1)
 
     except FileNotFoundError as fne:
         print(f'Error: {xml_file} not found')
@@ -313,131 +356,282 @@ def scan_strings(xml_file, attributes, skip=0):
     return string_lens
 
 
-def attribute_dictionary(name, type, size=0):
-    return {"name": name, "type": type, "size": size}
+def attribute_dictionary(name, type):
+    return {"name": name, "type": type}
+
+
+def read_users(rows, attributes, progress=None):
+    """
+    Read users from xml entries into a table in a single pass
+    Values are collected in growable per-column buffers, so the row count does not need to be known in advance.
+    :param rows: iterable of xml entries
+    :param attributes: list of attributes to load, the first of which is the user id
+    :param progress: optional ProgressReporter to update
+    :return: table with a row per user
+    """
+    # per-column buffers
+    # strings are stored as utf-8 bytes and offsets, or as codes into a table of unique values for categories
+    # dates are collected as strings and converted together once all rows are read
+    columns = {}
+    for attrib in attributes:
+        if attrib["type"] == dateAttrib:
+            columns[attrib["name"]] = []
+        elif attrib["type"] == strAttrib or attrib["type"] == htmlAttrib:
+            columns[attrib["name"]] = StringColumn()
+        elif attrib["type"] == catAttrib:
+            columns[attrib["name"]] = DictionaryColumn()
+        else:
+            columns[attrib["name"]] = GrowableArray(np.int64)
+    id_name = attributes[0]["name"]
+
+    # load ignoring first row as it's not a user
+    count = 0
+    for userXml in rows:
+        user = read_attributes(userXml, attributes)
+        if user[id_name] > 0:
+            for attrib in attributes:
+                value = user[attrib["name"]]
+                if value is None:
+                    value = 'None'  # missing strings read as 'None', as they did in fixed-width string fields
+                columns[attrib["name"]].append(value)
+            count += 1
+
+            if progress is not None:
+                # give some in progress feedback
+                progress.update(count)
+
+            global process_limit
+            if count > process_limit:
+                break
+
+    for attrib in attributes:
+        column = columns[attrib["name"]]
+        if isinstance(column, GrowableArray):
+            columns[attrib["name"]] = column.array()
+        elif attrib["type"] == dateAttrib:
+            # https://docs.scipy.org/doc/numpy/reference/arrays.datetime.html
+            columns[attrib["name"]] = np.array(column, dtype=date_dtype)
+        elif isinstance(column, DictionaryColumn):
+            column.sort()
+    return ColumnTable(columns)
+
+
+def scan_block(buffer, attributes, limit=None):
+    """
+    Read users from a buffer of xml rows into a table, by scanning for attribute values
+    :param buffer: buffer containing whole xml rows
+    :param attributes: list of attributes to load, the first of which is the user id
+    :param limit: max number of users to read, or None to read all
+    :return: table with a row per user
+    """
+    scanner = AttributeScanner(buffer)
+    user_rows = np.flatnonzero(scanner.int_column(attributes[0]["name"]) > 0)   # ignore rows which are not users
+    user_rows = user_rows[:limit]
+    columns = {}
+    for attrib in attributes:
+        name = attrib["name"]
+        if attrib["type"] == dateAttrib:
+            columns[name] = scanner.date_column(name, date_dtype)[user_rows]
+        elif attrib["type"] == intAttrib:
+            columns[name] = scanner.int_column(name)[user_rows]
+        elif attrib["type"] == floatAttrib:
+            values = scanner.str_column(name, default='0')
+            columns[name] = np.array([values[idx] for idx in user_rows], dtype=np.float64)
+        else:
+            # missing strings read as 'None', as they do when parsing
+            values = scanner.str_column(name, default="" if attrib["type"] == htmlAttrib else 'None')
+            values = [values[idx] for idx in user_rows]
+            if attrib["type"] == catAttrib:
+                # https://docs.scipy.org/doc/numpy/reference/generated/numpy.unique.html
+                unique, codes = np.unique(np.array(values, dtype=np.str_), return_inverse=True)
+                columns[name] = DictionaryColumn(codes.astype(np.int32), unique)
+            else:
+                columns[name] = StringColumn.from_strings(values)
+    return ColumnTable(columns)
+
+
+def scan_blocks(xml_file, attributes, progress=None):
+    """
+    Read the users in an xml file, by scanning for attribute values rather than parsing, a block of rows at a time
+    Plain files are memory mapped, and scanned in blocks of rows without copying; compressed files are decompressed a
+    block at a time.
+    :param xml_file: name of file to read
+    :param attributes: list of attributes to load, the first of which is the user id
+    :param progress: optional ProgressReporter to update
+    :return: iterator of tables of users
+    """
+    count = 0
+    for block in read_blocks(xml_file, scan_block_size):
+        # load ignoring rows after the process limit
+        limit = process_limit + 1 - count if process_limit != sys.maxsize else None
+        users = scan_block(block, attributes, limit)
+        count += len(users)
+        if progress is not None:
+            progress.add_bytes(len(block))
+            progress.update(count)
+        del block
+        yield users
+        if count > process_limit:
+            break
+
+
+def scan_users(xml_file, attributes, progress=None):
+    """
+    Read the users in an xml file into a table, by scanning for attribute values rather than parsing
+    :param xml_file: name of file to read
+    :param attributes: list of attributes to load, the first of which is the user id
+    :param progress: optional ProgressReporter to update
+    :return: table with a row per user
+    """
+    return ColumnTable.concat(list(scan_blocks(xml_file, attributes, progress)))
+
+
+def stream_users(xml_file, attributes, progress=None):
+    """
+    Read the users in an xml file a chunk at a time, so only a chunk of users is held in memory
+    :param xml_file: name of file to read
+    :param attributes: list of attributes to load, the first of which is the user id
+    :param progress: optional ProgressReporter to update
+    :return: iterator of tables of users
+    """
+    if xml_engine == 'scan':
+        chunks = scan_blocks(xml_file, attributes, progress)
+    else:
+        def parse_chunks():
+            rows = iter_rows(xml_file, progress)
+            for first in rows:
+                # https://docs.python.org/3/library/itertools.html#itertools.islice
+                yield read_users(itertools.chain([first], itertools.islice(rows, stream_chunk_rows - 1)), attributes)
+
+        chunks = parse_chunks()
+
+    count = 0
+    for users in chunks:
+        if count + len(users) > process_limit:
+            users = users.slice(0, process_limit + 1 - count)   # load ignoring rows after the process limit
+        count += len(users)
+        if progress is not None:
+            progress.update(count)
+        if len(users) > 0:
+            yield users
+        if count > process_limit:
+            break
+    if progress is not None:
+        progress.finish(count)
+        display('\n')
+
+
+def load_users(xml_file, attributes):
+    """
+    Load the users in an xml file into a table
+    :param xml_file: name of file to load
+    :param attributes: list of attributes to load, the first of which is the user id
+    :return: table with a row per user, or None if error occurred
+    """
+    try:
+        progress = ProgressReporter('user count', enabled=display_output and progress_output)
+        if xml_engine == 'scan':
+            users = scan_users(xml_file, attributes, progress)
+        elif parse_workers == 1 or process_limit != sys.maxsize:
+            users = read_users(iter_rows(xml_file, progress), attributes, progress)
+        else:
+            # parse ranges of the file in parallel, and join the results in file order
+            users = ColumnTable.concat(parse_parallel(xml_file, read_users, (attributes,), parse_workers))
+        progress.finish(len(users))
+        display('\n')
+    except FileNotFoundError as fne:
+        print(f'Error: {xml_file} not found')
+        return None
+    except Exception as ex:
+        print(f'Error: {ex}')
+        return None
+    return users
+
+
+def refresh_users(users, orders, zones, user_attributes):
+    """
+    Refresh the users from refresh_source, applying only its new and changed users
+    :param users: table of users
+    :param orders: dictionary of column name and sort order
+    :param zones: dictionary of column name and chunk statistics
+    :param user_attributes: list of attributes to read, the first of which is the user id
+    :return: tuple of refreshed users, sort orders and chunk statistics
+    """
+    new_users = load_users(refresh_source, user_attributes)
+    if new_users is None:
+        exit(1)
+    columns, changed, added = refresh_columns(users.columns, new_users.columns, user_attributes[0]['name'])
+    display(f'refresh: {len(changed)} changed users, {len(added)} new users')
+
+    users = ColumnTable(columns)
+    rows = np.concatenate([changed, added])
+    orders = {name: refresh_order(order, users[name], rows) for name, order in orders.items()}
+    zones = {name: refresh_zones(column_zones, users[name], rows) for name, column_zones in zones.items()}
+    return users, orders, zones
 
 
 def main():
-    # max string length values from scan
-    # DisplayName size: 41
-    # WebsiteUrl size: 203
-    # Location size: 104
-    # AboutMe size: 3911
-    # string scan user count: 40324
-    row_count = 40324
     attr_id = attribute_dictionary("Id", intAttrib)
     attr_reputation = attribute_dictionary("Reputation", intAttrib)
     attr_creation_date = attribute_dictionary("CreationDate", dateAttrib)
-    attr_display_name = attribute_dictionary("DisplayName", strAttrib, 50)
+    attr_display_name = attribute_dictionary("DisplayName", strAttrib)
     attr_last_access_date = attribute_dictionary("LastAccessDate", dateAttrib)
-    attr_website_url = attribute_dictionary("WebsiteUrl", strAttrib, 210)
-    attr_location = attribute_dictionary("Location", strAttrib, 110)
-    attr_about_me = attribute_dictionary("AboutMe", htmlAttrib, 3920)
+    attr_website_url = attribute_dictionary("WebsiteUrl", catAttrib)
+    attr_location = attribute_dictionary("Location", catAttrib)
+    attr_about_me = attribute_dictionary("AboutMe", htmlAttrib)
     attr_views = attribute_dictionary("Views", intAttrib)
     attr_up_votes = attribute_dictionary("UpVotes", intAttrib)
     attr_down_votes = attribute_dictionary("DownVotes", intAttrib)
     attrib_age = attribute_dictionary("Age", intAttrib)
     attr_account_id = attribute_dictionary("AccountId", intAttrib)
-
-    if pre_scan_string_lengths:
-        # array of attributes of type text
-        str_attributes = [attr_display_name, attr_website_url, attr_location, attr_about_me]
-
-        # scan for max string lengths as need to know size to allocate for string in the numpy array
-        str_lens = scan_strings(xml_source, str_attributes, skip=1)
-        if str_lens is None:
-            exit(1)
-        else:
-            row_count = str_lens.shape[0]   # or could use len() as its only one column
-
-        idx = 0
-        for attrib in str_attributes:
-            attrib_to_set = None
-            if attrib["name"] == attr_display_name["name"]:
-                attrib_to_set = attr_display_name
-            elif attrib["name"] == attr_website_url["name"]:
-                attrib_to_set = attr_website_url
-            elif attrib["name"] == attr_location["name"]:
-                attrib_to_set = attr_location
-            elif attrib["name"] == attr_about_me["name"]:
-                attrib_to_set = attr_about_me
-            if attrib_to_set is not None:
-                max_size = str_lens[attrib["name"]].max()
-                attrib_to_set["size"] = max_size + 5   # add padding
-                display(f'{attrib_to_set["name"]} size: {attrib_to_set["size"]}')
-        display('\n')
-
-    # need to update the string lengths first as user_attributes gets its own copy of the attribute variables
     user_attributes = [
         attr_id, attr_reputation, attr_creation_date, attr_display_name, attr_last_access_date, attr_website_url,
         attr_location, attr_about_me, attr_views, attr_up_votes, attr_down_votes, attrib_age, attr_account_id
     ]
+    # only load the columns the reports read
+    user_attributes = select_attributes(user_attributes)
 
-    # create structured array
-    # need to know what sizes to allocate for strings
-    # https://docs.scipy.org/doc/numpy/user/basics.rec.html
-    # https://docs.scipy.org/doc/numpy/reference/arrays.dtypes.html#arrays-dtypes-constructing
-    type1 = np.dtype([(attr_id["name"], np.int64),
-                      (attr_reputation["name"], np.int64),
-                      (attr_creation_date["name"], np.int64),
-                      (attr_display_name["name"], np.str_, attr_display_name["size"]),
-                      (attr_last_access_date["name"], np.int64),
-                      (attr_website_url["name"], np.str_, attr_website_url["size"]),
-                      (attr_location["name"], np.str_, attr_location["size"]),
-                      (attr_about_me["name"], np.str_, attr_about_me["size"]),
-                      (attr_views["name"], np.int64), (attr_up_votes["name"], np.int64),
-                      (attr_down_votes["name"], np.int64), (attrib_age["name"], np.int64),
-                      (attr_account_id["name"], np.int64)
-                      ])
-    # pre-allocate array
-    users = np.empty([row_count, 1], dtype=type1)
-
-    # load into an array of dictionaries ignoring first row
-    try:
-        tree = eT.parse(xml_source)
-        root = tree.getroot()
-
-        bs = ''
-        count = 0
-        display('user count: ', end='')
-        for userXml in root:
-            user = read_attributes(userXml, user_attributes)
-            if user[attr_id["name"]] > 0:
-                row = np.array([(user[attr_id["name"]],
-                                 user[attr_reputation["name"]],
-                                 user[attr_creation_date["name"]].timestamp(),
-                                 user[attr_display_name["name"]],
-                                 user[attr_last_access_date["name"]].timestamp(),
-                                 user[attr_website_url["name"]],
-                                 user[attr_location["name"]],
-                                 user[attr_about_me["name"]],
-                                 user[attr_views["name"]],
-                                 user[attr_up_votes["name"]],
-                                 user[attr_down_votes["name"]],
-                                 user[attrib_age["name"]],
-                                 user[attr_account_id["name"]]
-                                 )
-                                ], dtype=type1)
-                # row_stack id an alias for vstack
-                # https://docs.scipy.org/doc/numpy/reference/generated/numpy.vstack.html?highlight=vstack#numpy.vstack
-                users[count] = row
-                count += 1
-
-                if display_output and (count % 100 == 0):
-                    # give some in progress feedback
-                    bs = show_progress(count, bs)
+    if pre_scan_string_lengths:
+        # not required to load, but report the string lengths in the file
+        str_lens = scan_strings(xml_source, [attr_display_name, attr_website_url, attr_location, attr_about_me],
+                                skip=1)
+        if str_lens is None:
+            exit(1)
 
-                global process_limit
-                if count > process_limit:
-                    break
-        show_progress(count, bs)
-        display('\n')
-    except FileNotFoundError as fne:
-        print(f'Error: {xml_source} not found')
-        exit(1)
-    except Exception as ex:
-        print(f'Error: {ex}')
-        exit(1)
+    # settings which change the data loaded, so invalidate the cache
+    cache_settings = {"process_limit": process_limit, "xml_engine": xml_engine,
+                      "columns": [attrib["name"] for attrib in user_attributes]}
+    cached = None
+    refresh = False     # refresh the cached users from refresh_source
+    source = xml_source if refresh_source is None else refresh_source
+    if column_cache_dir is not None and not stream_chunks:
+        cached = load_columns(column_cache_dir, source, cache_settings)
+        if cached is None and refresh_source is not None:
+            cached = load_columns(column_cache_dir, xml_source, cache_settings)
+            refresh = cached is not None
+
+    orders = {}
+    zones = {}
+    if stream_chunks:
+        users = None    # users are read a chunk at a time as the reports are computed
+    elif cached is not None:
+        display('load column cache')
+        users = ColumnTable.from_arrays(cached[0])
+        orders = cached[2]
+        zones = cached[3]
+        if refresh:
+            users, orders, zones = refresh_users(users, orders, zones, user_attributes)
+            save_columns(column_cache_dir, source, users.arrays(), cache_settings, orders, zones)
+    else:
+        users = load_users(source, user_attributes)
+        if users is None:
+            exit(1)
+        orders = sort_orders(users.arrays(), sorted_index_columns)
+        zones = table_zones(users.columns)
+        if column_cache_dir is not None:
+            save_columns(column_cache_dir, source, users.arrays(), cache_settings, orders, zones)
+    indexes = {name: SortedIndex(users[name], order) for name, order in orders.items()}
+    stats = {name: ColumnStats(column_zones) for name, column_zones in zones.items()}
 
     # misc
     # display(f'shape {users.shape}')
@@ -450,153 +644,170 @@ def main():
     # display(f'column {name}')
     # display(users[name])
 
+    # register the aggregates for the reports, so all are computed in a single pass over the columns
+    # when streaming, the table is not kept, so the aggregates keep the values of the rows they display
+    # the extremes and means of columns with statistics come from them instead
+    engine = AggregationEngine(keep_records=stream_chunks)
+    word_pool = None    # pool of workers counting AboutMe words
+    row_limit = max_array_display if stream_chunks else None
+
+    def extremes(name, limit):
+        if name in stats:
+            return stats[name].extremes(users[name], limit)
+        return engine.add(Extremes(name, limit))
+
+    if 'oldest_newest' in reports:
+        creation = extremes(attr_creation_date['name'], 1)
+    if 'average_age' in reports:
+        age_mean = stats[attrib_age['name']] if attrib_age['name'] in stats else engine.add(Mean(attrib_age['name']))
+    if 'highest_lowest' in reports:
+        down_votes = extremes(attr_down_votes['name'], row_limit)
+        views = extremes(attr_views['name'], row_limit)
+        up_votes = extremes(attr_up_votes['name'], row_limit)
+    if 'inactive' in reports:
+        num_days = 180
+        check_times = [dt.datetime.now(), dt.datetime(2014, 6, 1)]
+        date_limits = [np.datetime64(check_time - dt.timedelta(days=num_days), 'ms') for check_time in check_times]
+        last_access = indexes.get(attr_last_access_date['name'])
+        if last_access is not None:
+            # count for all the check times in one search of the sorted dates; the rows are a slice of the sort order
+            inactive = []
+            for count in last_access.count_inactive(check_times, num_days):
+                inactive.append(RowSet())
+                inactive[-1].add(last_access.first_rows(count), 0)
+        else:
+            inactive = [engine.add(Filter(attr_last_access_date['name'],
+                                          lambda values, limit=date_limit: values < limit, row_limit)).matches
+                        for date_limit in date_limits]
+    if 'age_groups' in reports:
+        age_groups = engine.add(Bins(attrib_age['name'], age_bins, row_limit))
+    if 'locations' in reports:
+        if approximate_counts:
+            locations = engine.add(HeavyHitters(attr_location['name'], sketch_counters))
+        else:
+            locations = engine.add(Counts(attr_location['name']))
+    if 'website_urls' in reports:
+        if approximate_counts:
+            web_urls = engine.add(HeavyHitters(attr_website_url['name'], sketch_counters,
+                                               count_min_width, count_min_depth))
+        else:
+            web_urls = engine.add(Counts(attr_website_url['name']))
+    if 'about_me' in reports:
+        # count the words in the text of the html, without building a document tree for each entry
+        # the words are counted for each chunk of rows, so the pool of workers is shared by all the chunks
+        if about_me_workers != 1:
+            word_pool = ProcessPoolExecutor(max_workers=about_me_workers)
+
+        def count_chunk_words(about_me):
+            if about_me_workers == 1:
+                # https://docs.scipy.org/doc/numpy/reference/generated/numpy.fromiter.html
+                return np.fromiter((count_words(markup) for markup in about_me), dtype=np.int64, count=len(about_me))
+            return count_words_parallel(about_me, about_me_workers, word_pool)
+
+        # a histogram of word counts is kept, rather than a count per user
+        about_me_words = engine.add(Histogram(attr_about_me['name'], count_chunk_words))
+
+    try:
+        if stream_chunks:
+            progress = ProgressReporter('user count', enabled=display_output and progress_output)
+            offset = 0
+            for chunk in stream_users(source, user_attributes, progress):
+                engine.update(chunk, offset)
+                offset += len(chunk)
+        else:
+            engine.run(users, len(users))
+    finally:
+        if word_pool is not None:
+            word_pool.shutdown()
+
     # The oldest user
-    print_header("Oldest user")
-    creation = users[attr_creation_date['name']]
-    # https://docs.python.org/3.5/library/datetime.html#datetime-objects
-    display(f"date for oldest user: {dt.datetime.fromtimestamp(creation.min())}")
-    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.argmin.html
-    index = np.argmin(creation)
-    display(f'row index of oldest user: {index}')
-    display_array(users[index])
-
-    # The newest user
-    print_header("Newest user")
-    display(f"date for newest user: {dt.datetime.fromtimestamp(creation.max())}")
-    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.argmax.html
-    index = np.argmax(creation)
-    display(f'row index of newest user: {index}')
-    display_array(users[index])
+    if 'oldest_newest' in reports:
+        print_header("Oldest user")
+        # https://docs.scipy.org/doc/numpy/reference/arrays.datetime.html
+        display(f"date for oldest user: {creation.low.astype(dt.datetime)}")
+        index = creation.argmin
+        display(f'row index of oldest user: {index}')
+        display_array(users[index] if users is not None else creation.lows.records[0])
+
+        # The newest user
+        print_header("Newest user")
+        display(f"date for newest user: {creation.high.astype(dt.datetime)}")
+        index = creation.argmax
+        display(f'row index of newest user: {index}')
+        display_array(users[index] if users is not None else creation.highs.records[0])
 
     # Average user age
-    print_header("Average user age")
-    avg = get_mean(users[attrib_age['name']])
-    display(f"average user age: {avg}")
+    if 'average_age' in reports:
+        print_header("Average user age")
+        display(f"average user age: {age_mean.mean}")
 
     # User with highest downvote and highest views
-    find_highest("User with highest downvote", "downvote", users, attr_down_votes['name'])
-    find_highest("User with highest views", "views", users, attr_views['name'])
+    if 'highest_lowest' in reports:
+        find_highest("User with highest downvote", "downvote", users, down_votes)
+        find_highest("User with highest views", "views", users, views)
 
-    # User with highest upvote and lowest views
-    find_highest("User with highest upvote", "upvote", users, attr_up_votes['name'])
-    find_lowest("User with lowest views", "views", users, attr_views['name'])
+        # User with highest upvote and lowest views
+        find_highest("User with highest upvote", "upvote", users, up_votes)
+        find_lowest("User with lowest views", "views", users, views)
 
     # Users that do not access the website for more than 180 days
-    check_time = dt.datetime.now()
-    num_days = 180
-    date_limit = (check_time - dt.timedelta(days=num_days)).timestamp()
-    search_column = users[attr_last_access_date['name']]
-    more_than_date_limit = np.where(search_column < date_limit)
-    print_header(f"Users that do not access the website for more than {num_days} days: {len(more_than_date_limit[0])}")
-    print_array(users, more_than_date_limit[0])
-
-    check_time = dt.datetime(2014, 6, 1)
-    date_limit = (check_time - dt.timedelta(days=num_days)).timestamp()
-    search_column = users[attr_last_access_date['name']]
-    more_than_date_limit = np.where(search_column < date_limit)
-    print_header(
-        f"Users that do not access the website for more than {num_days} days before {check_time} i.e. {date_limit}: {len(more_than_date_limit[0])}")
-    print_array(users, more_than_date_limit[0])
+    if 'inactive' in reports:
+        more_than_date_limit = inactive[0]
+        print_header(f"Users that do not access the website for more than {num_days} days: {more_than_date_limit.count}")
+        print_rows(users, more_than_date_limit)
+
+        check_time = check_times[1]
+        date_limit = date_limits[1]
+        more_than_date_limit = inactive[1]
+        print_header(
+            f"Users that do not access the website for more than {num_days} days before {check_time} i.e. {date_limit}: {more_than_date_limit.count}")
+        print_rows(users, more_than_date_limit)
 
     # How many people are below 18, from 18-25, 25-35,36-46, above 46
-    search_column = users[attrib_age['name']]
-    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.nonzero.html#numpy.nonzero
-    age_group = np.asarray(search_column < 18).nonzero()
-    x_indices = age_group[0]
-    print_header(f"Users that are below 18: {len(x_indices)}")
-    print_array(users, x_indices)
-
-    age_group = np.asarray((search_column >= 18) & (search_column <= 25)).nonzero()
-    x_indices = age_group[0]
-    print_header(f"Users that are from 18-25: {len(x_indices)}")
-    print_array(users, x_indices)
-
-    age_group = np.asarray((search_column >= 25) & (search_column <= 35)).nonzero()
-    x_indices = age_group[0]
-    print_header(f"Users that are from 25-35: {len(x_indices)}")
-    print_array(users, x_indices)
-
-    age_group = np.asarray((search_column >= 36) & (search_column <= 46)).nonzero()
-    x_indices = age_group[0]
-    print_header(f"Users that are from 36-46: {len(x_indices)}")
-    print_array(users, x_indices)
-
-    age_group = np.asarray(search_column > 46).nonzero()
-    x_indices = age_group[0]
-    print_header(f"Users that are above 46: {len(x_indices)}")
-    print_array(users, x_indices)
+    if 'age_groups' in reports:
+        for idx, title in enumerate(age_groups.titles()):
+            print_header(f"Users that are {title}: {age_groups.counts[idx]}")
+            print_rows(users, age_groups.matches(idx))
 
     # Calculate the top 20 frequent locations
-    top_count = 20
-    print_header(f"Top {top_count} locations:")
-    locations_counts = nlargest(users, top_count, attr_location['name'])
-    for idx in range(len(locations_counts[0])):
-        if idx == top_count:
-            break
-        display(locations_counts[0][idx], locations_counts[1][idx])
+    if 'locations' in reports:
+        top_count = 20
+        print_header(f"Top {top_count} locations:")
+        if approximate_counts:
+            locations_counts = locations.top(top_count)
+        else:
+            locations_counts = nlargest_counts(locations.values, locations.counts, top_count)
+        for idx in range(len(locations_counts[0])):
+            if idx == top_count:
+                break
+            display(locations_counts[0][idx], *count_error(locations_counts, idx))
 
     # How many people with the sameWebsiteUrl
-    web_url_counts = nlargest(users, sys.maxsize, attr_website_url['name'])
-    print_header(f"Counts of users with same website urls:")
-    if display_output:
-        for idx in range(min(len(web_url_counts[0]), max_array_display)):
-            url = web_url_counts[0][idx]
-            if url == '':
-                url = "''"
-            display(url, web_url_counts[1][idx])
+    if 'website_urls' in reports:
+        if approximate_counts:
+            web_url_counts = web_urls.top(max_array_display)
+        else:
+            web_url_counts = nlargest_counts(web_urls.values, web_urls.counts, max_array_display)
+        print_header(f"Counts of users with same website urls:")
+        if display_output:
+            for idx in range(min(len(web_url_counts[0]), max_array_display)):
+                url = web_url_counts[0][idx]
+                if url == '':
+                    url = "''"
+                display(url, *count_error(web_url_counts, idx))
 
     # Users with above the average number of words AboutMe section
     # Users with below the average number of words AboutMe section
-    print_header(f"Counts of users with above/below average number of words AboutMe section:")
-    about_me = users[attr_about_me['name']]  # array of about me text
-    about_me = np.where(about_me is np.nan, '', about_me)
-
-    def strip_html(markup):
-        """
-        Get the text from a html string
-        :param markup: html string
-        :return: text
-        """
-        soup = BeautifulSoup(markup, 'html.parser')
-        #display(f'{soup.get_text()}')
-        return soup.get_text()
-
-    # need to vectorise the function to be able to apply it to the array
-    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.vectorize.html#numpy.vectorize
-    vfunc = np.vectorize(strip_html)
-
-    about_me = vfunc(about_me)  # array of just text
-
-    # create vectorised version of regex to find all words in a string
-    # https://docs.python.org/3/library/re.html
-    re_words = re.compile(r'(\w+)')
-    vmatch = np.vectorize(lambda sentence: len(re_words.findall(sentence)))
-
-    about_me_lens = vmatch(about_me)    # array of word counts
-
-    avg = get_mean(about_me_lens)
-    display(f"average AboutMe word count: {avg}")
-
-    # replace < avg values with int32 min value, > avg values with int32 max value and == avg with 0
-    about_me_lens = np.where(about_me_lens < avg, np.iinfo(np.int32).min, about_me_lens)
-    about_me_lens = np.where(about_me_lens > avg, np.iinfo(np.int32).max, about_me_lens)
-    about_me_lens = np.where(about_me_lens == avg, 0, about_me_lens)
-
-    about_me_counts = nlargest_array(about_me_lens, 3)
-
-    idx = 0
-    for x in [np.iinfo(np.int32).min, np.iinfo(np.int32).max, 0]:
-        if x in about_me_counts[0]:
-            count = about_me_counts[1][idx]
-        else:
-            count = 0
-        idx += 1
-        if x == np.iinfo(np.int32).max:
-            display(f"number of users with above average number of words AboutMe section: {count}")
-        elif x == np.iinfo(np.int32).min:
-            display(f"number of users with below average number of words AboutMe section: {count}")
-        else:
-            display(f"number of users with average number of words AboutMe section: {count}")
+    if 'about_me' in reports:
+        print_header(f"Counts of users with above/below average number of words AboutMe section:")
+        avg = about_me_words.mean
+        display(f"average AboutMe word count: {avg}")
+
+        # count the users with word counts below, equal to and above the average from the histogram
+        below, equal, above = about_me_words.split(avg)
+        display(f"number of users with below average number of words AboutMe section: {below}")
+        display(f"number of users with above average number of words AboutMe section: {above}")
+        display(f"number of users with average number of words AboutMe section: {equal}")
 
 
 if __name__ == '__main__':
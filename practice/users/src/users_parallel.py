@@ -0,0 +1,158 @@
+# Parallel processing for the users solutions
+# Work is split into chunks of rows which are processed in a pool of worker processes.
+import io
+import math
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from html_text import count_words
+from users_columns import StringColumn
+from users_reader import compressed_openers, iter_rows, open_source, row_tag
+
+# https://docs.python.org/3/library/concurrent.futures.html#processpoolexecutor
+
+chunks_per_worker = 4       # number of chunks to split the work into for each worker, to balance the load
+min_chunk_rows = 1000       # min number of rows in a chunk
+
+
+def chunk_bounds(count, workers):
+    """
+    Split a number of rows into chunks for a pool of workers
+    :param count: number of rows
+    :param workers: number of workers
+    :return: list of tuples of chunk start and stop rows
+    """
+    chunk_rows = max(math.ceil(count / (workers * chunks_per_worker)), min_chunk_rows)
+    return [(start, min(start + chunk_rows, count)) for start in range(0, count, chunk_rows)]
+
+
+def _count_words_chunk(data, offsets):
+    """
+    Count the words in the text of html entries held in a buffer
+    :param data: bytes of utf-8 encoded entries
+    :param offsets: array of entry offsets in data, with one more entry than the number of entries
+    :return: int32 array of word counts
+    """
+    counts = np.empty(len(offsets) - 1, dtype=np.int32)
+    for idx in range(len(counts)):
+        counts[idx] = count_words(data[offsets[idx]:offsets[idx + 1]].decode('utf-8'))
+    return counts
+
+
+def count_words_parallel(markup, workers=None, executor=None):
+    """
+    Count the words in the text of html entries using a pool of worker processes
+    Entries are sent to the workers as buffers of utf-8 bytes rather than as individual strings.
+    :param markup: StringColumn or sequence of html strings
+    :param workers: number of worker processes, or None for one per cpu
+    :param executor: ProcessPoolExecutor with workers processes, to reuse a pool across calls, e.g. for each chunk of
+                     rows; or None to create a pool for the call
+    :return: int32 array of word counts
+    """
+    if not isinstance(markup, StringColumn):
+        markup = StringColumn.from_strings(markup)
+    arrays = markup.arrays()
+    offsets = arrays["offsets"]
+    data = arrays["data"]
+
+    if workers is None:
+        workers = os.cpu_count()
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return count_words_parallel(markup, workers, executor)
+
+    counts = np.empty(len(markup), dtype=np.int32)
+    bounds = chunk_bounds(len(markup), workers)
+    futures = []
+    for start, stop in bounds:
+        chunk_offsets = offsets[start:stop + 1] - offsets[start]
+        chunk_data = data[offsets[start]:offsets[stop]].tobytes()
+        futures.append(executor.submit(_count_words_chunk, chunk_data, chunk_offsets))
+    for (start, stop), future in zip(bounds, futures):
+        counts[start:stop] = future.result()
+    return counts
+
+
+def row_ranges(buffer, count):
+    """
+    Split the rows in a buffer of xml into byte ranges, each starting at the beginning of a row
+    The dump has a row per line, and '<' is escaped in attribute values, so a row tag only appears at the start of a row.
+    :param buffer: buffer of xml, e.g. bytes or mmap
+    :param count: number of ranges to split into
+    :return: list of tuples of range start and stop offsets
+    """
+    row_start = b'<' + row_tag.encode('utf-8') + b' '
+    first = buffer.find(row_start)
+    if first < 0:
+        return []
+    end = buffer.rfind(b'</')    # the root element's end tag
+    if end < first:
+        end = len(buffer)
+
+    starts = [first]
+    for idx in range(1, count):
+        start = buffer.find(row_start, max(first + (end - first) * idx // count, starts[-1] + 1), end)
+        if start < 0:
+            break
+        if start > starts[-1]:
+            starts.append(start)
+    return list(zip(starts, starts[1:] + [end]))
+
+
+def _parse_range(source, start, stop, parse_chunk, args):
+    """
+    Parse a range of rows from an xml dump
+    :param source: name of a plain xml file, or bytes of the range to parse
+    :param start: offset of the start of the range in the file; ignored for bytes
+    :param stop: offset of the end of the range in the file; ignored for bytes
+    :param parse_chunk: function called with an iterable of the xml entries in the range and args
+    :param args: additional arguments for parse_chunk
+    :return: result of parse_chunk
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as file:
+            # https://docs.python.org/3/library/mmap.html
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                source = buffer[start:stop]
+    # wrap the rows in a root element so they can be parsed as a document
+    document = io.BytesIO(b'<rows>' + source + b'</rows>')
+    return parse_chunk(iter_rows(document), *args)
+
+
+def parse_parallel(xml_file, parse_chunk, args=(), workers=None):
+    """
+    Parse an xml dump using a pool of worker processes
+    The file is split into byte ranges on row boundaries, and each range is parsed in a worker. Plain files are memory
+    mapped by the workers; compressed files are decompressed into memory and the ranges sent to the workers.
+    :param xml_file: name of xml file, plain or compressed, to parse
+    :param parse_chunk: module level function called in the workers with an iterable of the xml entries in a range and
+                        args, returning the result for the range
+    :param args: additional arguments for parse_chunk
+    :param workers: number of worker processes, or None for one per cpu
+    :return: list of the results for each range, in file order
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    count = workers * chunks_per_worker
+
+    compressed = os.path.splitext(xml_file)[1].lower() in compressed_openers
+    if compressed:
+        with open_source(xml_file) as source:
+            buffer = source.read()
+        ranges = row_ranges(buffer, count)
+    else:
+        with open(xml_file, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                ranges = row_ranges(buffer, count)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for start, stop in ranges:
+            if compressed:
+                futures.append(executor.submit(_parse_range, buffer[start:stop], start, stop, parse_chunk, args))
+            else:
+                futures.append(executor.submit(_parse_range, xml_file, start, stop, parse_chunk, args))
+        return [future.result() for future in futures]
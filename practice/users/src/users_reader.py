@@ -0,0 +1,136 @@
+# Shared streaming reader for Stack Exchange xml dumps
+# Rows are read one at a time using incremental parsing, so the full document tree is never built in memory.
+import bz2
+import gzip
+import io
+import lzma
+import os.path as osp
+import sys
+import time
+import xml.etree.ElementTree as eT
+
+# https://docs.python.org/3/library/xml.etree.elementtree.html#xml.etree.ElementTree.XMLPullParser
+
+row_tag = 'row'     # tag of the entries in the dump
+
+read_buffer_size = 16 * 1024 * 1024     # size of buffer used when reading the source file
+read_chunk_size = 1024 * 1024           # size of chunks fed to the parser
+
+progress_interval = 0.5     # min number of seconds between progress updates
+
+# openers for compressed sources, by file extension
+# https://docs.python.org/3/library/archiving.html
+compressed_openers = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open,
+    '.lzma': lzma.open,
+}
+
+
+def open_source(xml_file):
+    """
+    Open an xml source for binary reading, decompressing it on the fly if it is compressed
+    :param xml_file: name of file to open; compression is determined by the file extension
+    :return: buffered binary file object
+    """
+    ext = osp.splitext(xml_file)[1].lower()
+    opener = compressed_openers.get(ext, open)
+    # https://docs.python.org/3/library/io.html#io.BufferedReader
+    return io.BufferedReader(opener(xml_file, 'rb'), buffer_size=read_buffer_size)
+
+
+class ProgressReporter:
+    """
+    Report the progress of reading rows, at most once per interval, along with the row and byte throughput
+    """
+
+    def __init__(self, label, enabled=True, interval=progress_interval, file=None):
+        """
+        Create a progress reporter
+        :param label: label to display before the row count
+        :param enabled: display progress if True
+        :param interval: min number of seconds between updates
+        :param file: a file-like object (stream); defaults to the current sys.stdout.
+        """
+        self.label = label
+        self.enabled = enabled
+        self.interval = interval
+        self.file = file
+        self.bytes_read = 0
+        self._start = time.monotonic()
+        self._last = self._start
+        self._msg_len = 0
+
+    def add_bytes(self, count):
+        """
+        Add to the number of bytes read
+        :param count: number of bytes
+        """
+        self.bytes_read += count
+
+    def update(self, count):
+        """
+        Display progress, if the interval since the last update has elapsed
+        :param count: number of rows read
+        """
+        if self.enabled:
+            now = time.monotonic()
+            if now - self._last >= self.interval:
+                self._last = now
+                self._write(count, now)
+
+    def finish(self, count):
+        """
+        Display the final progress
+        :param count: number of rows read
+        """
+        if self.enabled:
+            self._write(count, time.monotonic())
+            self._file().write('\n')
+
+    def _file(self):
+        return self.file if self.file is not None else sys.stdout
+
+    def _write(self, count, now):
+        elapsed = max(now - self._start, 1e-9)
+        msg = f'{self.label}: {count} ({count / elapsed:,.0f} rows/sec, {self.bytes_read / elapsed / 1e6:,.1f} MB/sec)'
+        # overwrite the previous update
+        file = self._file()
+        file.write('\r' + msg.ljust(self._msg_len))
+        file.flush()
+        self._msg_len = len(msg)
+
+
+def iter_rows(xml_file, progress=None):
+    """
+    Iterate over the row entries of an xml dump, one at a time
+    Note: each entry is cleared once the next one is requested, so read what is required from it before moving on
+    :param xml_file: name of xml file, plain or compressed, or binary file object to read
+    :param progress: optional ProgressReporter to add the number of bytes read to
+    :return: generator of xml entries
+    """
+    if isinstance(xml_file, str):
+        with open_source(xml_file) as source:
+            yield from iter_rows(source, progress)
+        return
+
+    parser = eT.XMLPullParser(events=('start', 'end'))
+    root = None
+    while True:
+        chunk = xml_file.read(read_chunk_size)
+        if not chunk:
+            break
+        if progress is not None:
+            progress.add_bytes(len(chunk))
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if root is None:
+                root = elem     # first event is the start of the root element
+            elif event == 'end' and elem.tag == row_tag:
+                yield elem
+                elem.clear()
+        if root is not None:
+            # release the entries read so far so memory use stays flat
+            root.clear()
+    parser.close()
@@ -0,0 +1,108 @@
+# Incremental refresh for the users solutions
+# Newer dumps mostly add users and update the activity and votes of existing ones. Refreshing previously loaded columns
+# from a newer dump matches the users by Id, and only replaces the changed users and appends the new ones, so the
+# sorted indexes and chunk statistics only need updating for those rows rather than rebuilding.
+# Users missing from the newer dump are kept.
+import numpy as np
+
+from users_columns import DictionaryColumn, StringColumn, range_indices
+
+
+def match_rows(ids, new_ids):
+    """
+    Find the rows of ids in existing rows
+    :param ids: array of the ids of the existing rows
+    :param new_ids: array of ids to find
+    :return: int64 array of the existing row of each id, or -1 if it is new
+    """
+    if len(ids) == 0:
+        return np.full(len(new_ids), -1, dtype=np.int64)
+    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.searchsorted.html
+    order = np.argsort(ids, kind='stable')
+    sorted_ids = ids[order]
+    found = np.minimum(np.searchsorted(sorted_ids, new_ids), len(ids) - 1)
+    return np.where(sorted_ids[found] == new_ids, order[found], -1).astype(np.int64)
+
+
+def changed_values(column, new_column, rows, new_rows):
+    """
+    Compare the values of rows in two columns
+    :param column: existing column, array, StringColumn or DictionaryColumn
+    :param new_column: new column of the same type
+    :param rows: array of row indices in the existing column
+    :param new_rows: array of the row indices of the same users in the new column
+    :return: boolean array, True where the values differ; missing values are equal to each other
+    """
+    if isinstance(column, StringColumn):
+        offsets = column.arrays()["offsets"]
+        new_offsets = new_column.arrays()["offsets"]
+        lengths = offsets[rows + 1] - offsets[rows]
+        changed = lengths != new_offsets[new_rows + 1] - new_offsets[new_rows]
+        # compare the bytes of the entries with the same lengths, then combine the byte comparisons for each entry
+        same = np.flatnonzero(~changed & (lengths > 0))
+        differ = column.arrays()["data"][range_indices(offsets[rows[same]], lengths[same])] != \
+            new_column.arrays()["data"][range_indices(new_offsets[new_rows[same]], lengths[same])]
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.ufunc.reduceat.html
+        if len(same) > 0:
+            starts = np.zeros(len(same), dtype=np.int64)
+            np.cumsum(lengths[same][:-1], out=starts[1:])
+            changed[same] = np.logical_or.reduceat(differ, starts)
+        return changed
+    if isinstance(column, DictionaryColumn):
+        return column.values[column.codes[rows]] != new_column.values[new_column.codes[new_rows]]
+
+    values = column[rows]
+    new_values = new_column[new_rows]
+    changed = values != new_values
+    if values.dtype.kind in 'fMO':
+        changed &= ~((values != values) & (new_values != new_values))   # NaN and NaT are not equal to themselves
+    return changed
+
+
+def _append(column, new_column, rows):
+    if isinstance(column, StringColumn):
+        return StringColumn.concat([column, new_column.take(rows)])
+    if isinstance(column, DictionaryColumn):
+        return DictionaryColumn.concat([column, new_column.take(rows)])
+    return np.concatenate([column, new_column[rows]])
+
+
+def refresh_columns(columns, new_columns, key='Id'):
+    """
+    Refresh columns from the columns of a newer dump
+    Array columns are updated in a copy, as the existing columns may be read-only; encoded string columns are only
+    rebuilt if their values have changed, otherwise the new entries are appended.
+    :param columns: dictionary of column name and column
+    :param new_columns: dictionary of column name and column, with the same columns
+    :param key: name of column identifying the rows
+    :return: tuple of dictionary of column name and refreshed column, array of the indices of the changed rows, and
+             array of the indices of the new rows
+    """
+    count = len(columns[key])
+    matched = match_rows(np.asarray(columns[key]), np.asarray(new_columns[key]))
+    new_rows = np.flatnonzero(matched >= 0)
+    rows = matched[new_rows]
+    inserted = np.flatnonzero(matched < 0)
+
+    changes = {name: changed_values(column, new_columns[name], rows, new_rows) for name, column in columns.items()}
+    changed = np.zeros(len(rows), dtype=np.bool_)
+    for column_changes in changes.values():
+        changed |= column_changes
+    appended = np.arange(count, count + len(inserted), dtype=np.int64)
+
+    refreshed = {}
+    for name, column in columns.items():
+        new_column = new_columns[name]
+        column_changes = changes[name]
+        if isinstance(column, np.ndarray):
+            column = _append(column, new_column, inserted)
+            column[rows[column_changes]] = new_column[new_rows[column_changes]]
+        elif column_changes.any():
+            # take the unchanged entries from the existing column and the rest from the new one
+            index = np.concatenate([np.arange(count, dtype=np.int64), count + inserted])
+            index[rows[column_changes]] = count + new_rows[column_changes]
+            column = type(column).concat([column, new_column]).take(index)
+        else:
+            column = _append(column, new_column, inserted)
+        refreshed[name] = column
+    return refreshed, rows[changed], appended
@@ -0,0 +1,213 @@
+# Attribute scanner for Stack Exchange xml dumps
+# Finds the 'Name="value"' spans of attributes directly in a buffer of the file, without building xml elements.
+# Numeric and date values are converted with NumPy operations over the whole buffer, so no intermediate Python strings
+# are created for them.
+import mmap
+import os.path as osp
+import re
+
+import numpy as np
+
+from users_parallel import row_ranges
+from users_reader import compressed_openers, open_source, row_tag
+
+# https://docs.python.org/3/library/mmap.html
+# https://docs.scipy.org/doc/numpy/reference/generated/numpy.frombuffer.html
+
+_QUOTE = ord('"')
+_MINUS = ord('-')
+_ZERO = ord('0')
+
+# predefined xml entities and character references
+_xml_reference = re.compile(r'&(?:#x([0-9a-fA-F]+)|#([0-9]+)|(amp|lt|gt|quot|apos));')
+_xml_entities = {"amp": "&", "lt": "<", "gt": ">", "quot": '"', "apos": "'"}
+_attribute_whitespace = str.maketrans('\t\n', '  ')
+
+
+def _xml_replace(match):
+    if match.group(1) is not None:
+        return chr(int(match.group(1), 16))
+    if match.group(2) is not None:
+        return chr(int(match.group(2)))
+    return _xml_entities[match.group(3)]
+
+
+def unescape_attribute(value):
+    """
+    Get the value of an xml attribute from its raw text, as an xml parser would
+    :param value: raw attribute value
+    :return: attribute value
+    """
+    # literal whitespace is normalised to spaces, before references are replaced
+    # https://www.w3.org/TR/xml/#AVNormalize
+    if '\r' in value:
+        value = value.replace('\r\n', '\n').replace('\r', '\n')
+    value = value.translate(_attribute_whitespace)
+    if '&' in value:
+        value = _xml_reference.sub(_xml_replace, value)
+    return value
+
+
+def find_all(data, pattern):
+    """
+    Find all the occurrences of a pattern in a byte array
+    :param data: uint8 array to search
+    :param pattern: bytes to find
+    :return: array of the offsets of the occurrences
+    """
+    if len(data) < len(pattern):
+        return np.empty(0, dtype=np.int64)
+    # offsets where the last byte of the pattern would match, then check the preceding bytes
+    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.flatnonzero.html
+    candidates = np.flatnonzero(data[len(pattern) - 1:] == pattern[-1])
+    for k in range(len(pattern) - 1):
+        candidates = candidates[data[candidates + k] == pattern[k]]
+    return candidates.astype(np.int64)
+
+
+class AttributeScanner:
+    """
+    Scanner for the attributes of the row entries in a buffer of xml
+    """
+
+    def __init__(self, buffer):
+        """
+        Create a scanner
+        :param buffer: buffer of xml, e.g. bytes, mmap or memoryview, containing whole rows
+        """
+        self.data = np.frombuffer(buffer, dtype=np.uint8)
+        self.row_starts = find_all(self.data, b'<' + row_tag.encode('utf-8') + b' ')
+        self.quotes = np.flatnonzero(self.data == _QUOTE)
+
+    def __len__(self):
+        return len(self.row_starts)
+
+    def spans(self, name):
+        """
+        Find the values of an attribute
+        :param name: name of attribute
+        :return: tuple of arrays of the row index, value start offset and value end offset for each row with the
+                 attribute
+        """
+        # '"' is escaped in attribute values, so the pattern can only match the start of an attribute
+        pattern = b' ' + name.encode('utf-8') + b'="'
+        starts = find_all(self.data, pattern) + len(pattern)
+        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.searchsorted.html
+        rows = np.searchsorted(self.row_starts, starts, side='right') - 1
+        in_row = rows >= 0
+        rows = rows[in_row]
+        starts = starts[in_row]
+        stops = self.quotes[np.searchsorted(self.quotes, starts)]
+        return rows, starts, stops
+
+    def int_column(self, name, default=0):
+        """
+        Read an integer attribute for all rows
+        :param name: name of attribute
+        :param default: value for rows without the attribute
+        :return: int64 array
+        """
+        column = np.full(len(self), default, dtype=np.int64)
+        rows, starts, stops = self.spans(name)
+        negative = self.data[starts] == _MINUS
+        starts = starts + negative
+        lengths = stops - starts
+        values = np.zeros(len(rows), dtype=np.int64)
+        # accumulate a digit at a time for all values
+        for k in range(lengths.max() if len(lengths) > 0 else 0):
+            active = lengths > k
+            values[active] = values[active] * 10 + (self.data[starts[active] + k] - _ZERO)
+        values[negative] = -values[negative]
+        column[rows] = values
+        return column
+
+    def date_column(self, name, dtype='datetime64[ms]'):
+        """
+        Read an ISO 8601 date attribute for all rows
+        :param name: name of attribute
+        :param dtype: NumPy datetime type
+        :return: datetime array, with NaT for rows without the attribute
+        """
+        column = np.full(len(self), np.datetime64('NaT'), dtype=dtype)
+        rows, starts, stops = self.spans(name)
+        if len(rows) > 0:
+            width = (stops - starts).max()
+            # gather the value bytes into fixed-width, null padded byte strings
+            index = starts[:, np.newaxis] + np.arange(width)
+            chars = np.where(index < stops[:, np.newaxis], self.data[np.minimum(index, len(self.data) - 1)], 0)
+            column[rows] = chars.astype(np.uint8).view(f'S{width}').ravel().astype(dtype)
+        return column
+
+    def str_column(self, name, default=None):
+        """
+        Read a string attribute for all rows
+        :param name: name of attribute
+        :param default: value for rows without the attribute
+        :return: list of strings
+        """
+        column = [default] * len(self)
+        rows, starts, stops = self.spans(name)
+        data = self.data
+        for row, start, stop in zip(rows.tolist(), starts.tolist(), stops.tolist()):
+            column[row] = unescape_attribute(data[start:stop].tobytes().decode('utf-8'))
+        return column
+
+
+def map_source(xml_file):
+    """
+    Get a buffer of the contents of an xml file
+    Plain files are memory mapped; compressed files are decompressed into memory.
+    :param xml_file: name of xml file, plain or compressed
+    :return: buffer, which should be closed when no longer required if it is a mmap
+    """
+    if osp.splitext(xml_file)[1].lower() in compressed_openers:
+        with open_source(xml_file) as source:
+            return source.read()
+    with open(xml_file, 'rb') as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_blocks(xml_file, block_size):
+    """
+    Read the contents of an xml file a block of whole rows at a time
+    Plain files are memory mapped, and the blocks are views of the mapping; compressed files are decompressed a block at
+    a time, so only about a block of the file is held in memory however large it is.
+    :param xml_file: name of xml file, plain or compressed
+    :param block_size: approx. size in bytes of the blocks
+    :return: iterator of uint8 arrays of blocks of whole rows
+    """
+    row_start = b'<' + row_tag.encode('utf-8') + b' '
+    if osp.splitext(xml_file)[1].lower() in compressed_openers:
+        with open_source(xml_file) as source:
+            pending = b''
+            while True:
+                block = source.read(block_size)
+                if not block:
+                    break
+                block = pending + block
+                # the last row in the block may be incomplete, so keep it for the next block
+                last = block.rfind(row_start)
+                if last <= 0:
+                    pending = block
+                    continue
+                pending = block[last:]
+                yield np.frombuffer(block, dtype=np.uint8, count=last)
+            if len(pending) > 0:
+                yield np.frombuffer(pending, dtype=np.uint8)
+        return
+
+    with open(xml_file, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        # the rows up to the first are not scanned for attributes, so the blocks only need to start at a row
+        ends = [stop for _, stop in row_ranges(buffer, max(len(buffer) // block_size, 1))]
+        for start, stop in zip([0] + ends[:-1], ends):
+            yield data[start:stop]
+        del data
+    finally:
+        try:
+            buffer.close()
+        except BufferError:
+            pass    # a block is still in use, the mapping is closed when it is released
+
@@ -0,0 +1,177 @@
+# Approximate counting for the users solutions
+# Counts the most frequent values of a column in bounded memory, for when the number of unique values makes exact
+# counts too large, e.g. when streaming a large dump. Every approximate count is reported with a bound on its error.
+#  - MisraGries keeps a fixed number of counters; each count is low by at most the total of the decrements
+#    applied to all the counters, which is at most rows / (counters + 1)
+#  - CountMinSketch keeps a fixed size table of counters for all values; each count is high by at most
+#    e / width * rows, with probability 1 - e^-depth
+import math
+
+import numpy as np
+
+from users_aggregate import Aggregate, chunk_counts
+
+# https://en.wikipedia.org/wiki/Misra%E2%80%93Gries_summary
+# https://en.wikipedia.org/wiki/Count%E2%80%93min_sketch
+# Agarwal et al., Mergeable Summaries, https://doi.org/10.1145/2500128
+
+
+class MisraGries:
+    """
+    Misra-Gries summary of the most frequent values
+    Chunks of counts are merged into the summary, which is then reduced to the number of counters by subtracting the
+    next largest count from all the counters and dropping those which are not positive.
+    """
+
+    def __init__(self, counters):
+        """
+        Create a summary
+        :param counters: number of counters to keep
+        """
+        self.capacity = counters
+        self.counters = {}
+        self.decrement = 0      # total subtracted from each counter, i.e. max amount a count is low by
+        self.total = 0
+
+    def update(self, values, counts):
+        """
+        Add the counts of values
+        :param values: array of unique values
+        :param counts: array of the counts of the values
+        """
+        counters = self.counters
+        for value, count in zip(values.tolist(), counts.tolist()):
+            counters[value] = counters.get(value, 0) + count
+        self.total += int(counts.sum())
+
+        if len(counters) > self.capacity:
+            keys = list(counters.keys())
+            kept = np.array(list(counters.values()), dtype=np.int64)
+            # https://docs.scipy.org/doc/numpy/reference/generated/numpy.partition.html
+            excess = len(kept) - self.capacity - 1
+            decrement = np.partition(kept, excess)[excess]    # largest count not fitting in the counters
+            kept -= decrement
+            self.counters = {keys[idx]: int(kept[idx]) for idx in np.flatnonzero(kept > 0).tolist()}
+            self.decrement += int(decrement)
+
+    @property
+    def error(self):
+        """
+        Max amount the count of any value is low by
+        """
+        return self.decrement
+
+    @property
+    def bound(self):
+        """
+        Guaranteed max amount the count of any value is low by, from the number of counters
+        """
+        return self.total // (self.capacity + 1)
+
+
+class CountMinSketch:
+    """
+    Count-min sketch of the counts of all values
+    """
+
+    def __init__(self, width, depth, seed=0):
+        """
+        Create a sketch
+        :param width: number of counters per row
+        :param depth: number of rows, each with an independent hash of the values
+        :param seed: seed for the hashes
+        """
+        self.width = width
+        self.depth = depth
+        # random odd multipliers and increments of a multiply-shift hash for each row, so the rows are independent
+        # https://en.wikipedia.org/wiki/Universal_hashing#Avoiding_modular_arithmetic
+        rng = np.random.default_rng(seed)
+        self.multipliers = rng.integers(0, 2 ** 64, depth, dtype=np.uint64, endpoint=False) | np.uint64(1)
+        self.increments = rng.integers(0, 2 ** 64, depth, dtype=np.uint64, endpoint=False)
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    def _columns(self, values):
+        # python string hashes are randomised per process, but are consistent for the life of the sketch
+        # the values are hashed once, and each row rehashes them, keeping the high bits; uint64 products wrap around
+        hashes = np.array([hash(value) for value in values], dtype=np.int64).view(np.uint64)
+        return [(((hashes * multiplier + increment) >> np.uint64(32)) % np.uint64(self.width)).astype(np.int64)
+                for multiplier, increment in zip(self.multipliers, self.increments)]
+
+    def update(self, values, counts):
+        """
+        Add the counts of values
+        :param values: array of unique values
+        :param counts: array of the counts of the values
+        """
+        values = values.tolist()
+        for row, columns in enumerate(self._columns(values)):
+            # https://docs.scipy.org/doc/numpy/reference/generated/numpy.bincount.html
+            self.table[row] += np.bincount(columns, weights=counts, minlength=self.width).astype(np.int64)
+        self.total += int(counts.sum())
+
+    def estimate(self, values):
+        """
+        Estimate the counts of values; estimates are never low
+        :param values: array of values
+        :return: int64 array of estimated counts
+        """
+        values = list(values)
+        if len(values) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.min([self.table[row, columns] for row, columns in enumerate(self._columns(values))], axis=0)
+
+    @property
+    def error(self):
+        """
+        Max amount the count of a value is high by, with probability confidence
+        """
+        return math.ceil(math.e / self.width * self.total)
+
+    @property
+    def confidence(self):
+        return 1 - math.exp(-self.depth)
+
+
+class HeavyHitters(Aggregate):
+    """
+    Approximate counts of the most frequent values of a column, in bounded memory; missing values are not counted
+    The candidates and lower bounds of their counts come from a Misra-Gries summary; if a count-min sketch is used
+    the upper bounds are tightened by its estimates.
+    """
+
+    def __init__(self, column, counters, width=None, depth=None):
+        """
+        Create a heavy hitters aggregate
+        :param column: name of column to count
+        :param counters: number of Misra-Gries counters
+        :param width: count-min sketch width, or None to not use a sketch
+        :param depth: count-min sketch depth
+        """
+        super().__init__(column)
+        self.summary = MisraGries(counters)
+        self.sketch = CountMinSketch(width, depth) if width is not None else None
+
+    def update(self, values, offset, table=None):
+        unique, counts = chunk_counts(values)
+        self.summary.update(unique, counts)
+        if self.sketch is not None:
+            self.sketch.update(unique, counts)
+
+    def top(self, n):
+        """
+        Get the n most frequent values
+        The count of each value is an upper bound, and the true count is at most error lower.
+        :param n: number of values
+        :return: tuple of arrays of values, counts and errors, in descending order of count, with equal counts in
+                 ascending order of value
+        """
+        values = np.array(list(self.summary.counters.keys()), dtype=object)
+        low = np.array(list(self.summary.counters.values()), dtype=np.int64)
+        high = low + self.summary.error
+        if self.sketch is not None:
+            high = np.minimum(high, self.sketch.estimate(values))
+        # the counters are in the order the chunks added them, so ties are ordered by value, then the sort is stable
+        by_value = np.argsort(values, kind='stable')
+        order = by_value[np.lexsort((-low[by_value], -high[by_value]))][:n]    # by upper bound, then lower bound
+        return values[order], high[order], high[order] - low[order]
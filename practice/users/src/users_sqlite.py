@@ -0,0 +1,382 @@
+# The oldest and newest users
+# Average user age
+# User with highest downvote and highest views
+# User with highest upvote and lowest views
+# Users that do not access the website for more than 180 days
+# How many people are below 18, from 18-25, 25-35,36-46, above 46
+# Calculate the top 20 frequent locations
+# How many people with the sameWebsiteUrl
+# Users with above the average number of words AboutMe section
+# Users with below the average number of words AboutMe section
+import datetime as dt
+import json
+import os
+import os.path as osp
+import sqlite3
+import sys
+import timeit
+
+from html_text import count_words
+from users_columns import file_hash, source_key
+from users_reader import ProgressReporter, iter_rows
+
+# https://docs.python.org/3/library/sqlite3.html
+# https://www.sqlite.org/wal.html
+# https://www.sqlite.org/pragma.html#pragma_synchronous
+
+process_limit = sys.maxsize  # set to sys.maxsize to process all records or a smaller value
+
+timeit_count = 0                        # set to desired number of executions, or 0 to disable timing
+display_output = (timeit_count == 0)    # display output if not timing execution
+progress_output = True                  # display progress while loading, if displaying output
+
+max_array_display = 15      # max number of rows to display
+
+xml_source = 'Users.xml.gz'     # plain or compressed (.gz, .bz2, .xz) xml file
+
+database_file = 'users.sqlite'  # SQLite database to load the users into; it is reloaded if the xml source changes
+load_batch_rows = 50_000        # number of users inserted in each transaction when loading
+
+age_bins = [18, 26, 36, 47]    # edges of the age groups; users are counted below the first edge, from each edge up to
+                                # the next, and from the last edge up
+
+# columns of the users table, the attributes of a user entry and the number of words in its AboutMe html
+# missing integers are 0, and missing or empty strings and missing dates are NULL, as the other solutions read them
+user_columns = [
+    ("Id", "INTEGER PRIMARY KEY"),
+    ("Reputation", "INTEGER"),
+    ("CreationDate", "TEXT"),   # ISO 8601, so dates compare as text
+    ("DisplayName", "TEXT"),
+    ("LastAccessDate", "TEXT"),
+    ("WebsiteUrl", "TEXT"),
+    ("Location", "TEXT"),
+    ("AboutMe", "TEXT"),
+    ("Views", "INTEGER"),
+    ("UpVotes", "INTEGER"),
+    ("DownVotes", "INTEGER"),
+    ("Age", "INTEGER"),
+    ("AccountId", "INTEGER"),
+]
+words_column = ("AboutMeWords", "INTEGER")
+indexed_columns = ['CreationDate', 'LastAccessDate', 'Age', 'Location', 'WebsiteUrl']
+
+user_names = [name for name, _ in user_columns]
+select_users = f"SELECT {', '.join(user_names)} FROM users"
+
+
+def display(*args, sep=' ', end='\n', file=None):
+    """
+    Prints the values to a stream, or to sys.stdout by default, if display is enabled
+    :param args: what to print
+    Optional keyword arguments:
+    :param file:  a file-like object (stream); defaults to the current sys.stdout.
+    :param sep:   string inserted between values, default a space.
+    :param end:   string appended after the last value, default a newline.
+    """
+    if display_output:
+        op = ""
+        for arg in args:
+            if len(op) > 0:
+                op += sep
+            op += str(arg)
+        print(op, sep=sep, end=end, file=file)
+
+
+def print_header(title):
+    """
+    Display a header
+    :param title: header title to display
+    """
+    display(f"\n{title}\n----------------------------------")
+
+
+def print_rows(rows, count, limit=max_array_display):
+    """
+    Print rows found by a query
+    :param rows: list of rows, of at most limit rows
+    :param count: number of rows the query found
+    :param limit: max number of rows to print
+    """
+    for row in rows[:limit]:
+        display(row)
+    if count > limit:
+        display(f'{count - limit} additional entries')
+
+
+def read_row(entry):
+    """
+    Read the values of the users table columns for a user xml entry
+    :param entry: xml entry
+    :return: tuple of column values
+    """
+    values = []
+    for name, column_type in user_columns:
+        value = entry.get(name)
+        if column_type.startswith("INTEGER"):
+            value = int(value) if value is not None else 0
+        elif value is not None and len(value) == 0:
+            value = None
+        values.append(value)
+    values.append(count_words(values[user_names.index("AboutMe")] or ''))
+    return tuple(values)
+
+
+def read_rows(xml_file, progress=None):
+    """
+    Read the users from an xml file
+    :param xml_file: name of xml file, plain or compressed
+    :param progress: optional ProgressReporter to update
+    :return: generator of tuples of column values
+    """
+    # load ignoring rows after the process limit, as the other solutions do
+    count = 0
+    for entry in iter_rows(xml_file, progress):
+        row = read_row(entry)
+        if row[0] > 0:
+            count += 1
+            yield row
+            if count > process_limit:
+                break
+
+
+def create_database(db_file, xml_file, settings=None, batch_rows=None):
+    """
+    Load the users from an xml file into a new SQLite database
+    Rows are inserted in batches, each in one transaction, with write-ahead logging and without syncing to disk; the
+    indexes are created once all the rows are inserted, and the source key is stored last, so a partly loaded database
+    is never used.
+    :param db_file: name of database file; any existing file is replaced
+    :param xml_file: name of xml file, plain or compressed
+    :param settings: optional dictionary of settings affecting the data loaded
+    :param batch_rows: number of rows inserted in each transaction, or None for load_batch_rows
+    :return: connection to the database
+    """
+    batch_rows = batch_rows if batch_rows is not None else load_batch_rows
+    for suffix in ['', '-wal', '-shm']:
+        if osp.exists(db_file + suffix):
+            os.remove(db_file + suffix)
+
+    # transactions are started explicitly, so each batch is committed once
+    connection = sqlite3.connect(db_file, isolation_level=None)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = OFF")
+    columns = ', '.join(f'{name} {column_type}' for name, column_type in user_columns + [words_column])
+    connection.execute(f"CREATE TABLE users ({columns})")
+    connection.execute("CREATE TABLE source (key TEXT)")
+
+    insert = f"INSERT INTO users VALUES ({', '.join(['?'] * (len(user_columns) + 1))})"
+    progress = ProgressReporter('user count', enabled=display_output and progress_output)
+    rows = read_rows(xml_file, progress)
+    count = 0
+    while True:
+        batch = [row for _, row in zip(range(batch_rows), rows)]
+        if len(batch) == 0:
+            break
+        connection.execute("BEGIN")
+        connection.executemany(insert, batch)
+        connection.execute("COMMIT")
+        count += len(batch)
+        progress.update(count)
+    progress.finish(count)
+    display('\n')
+
+    connection.execute("BEGIN")
+    for name in indexed_columns:
+        connection.execute(f"CREATE INDEX users_{name} ON users ({name})")
+    connection.execute("INSERT INTO source VALUES (?)", (json.dumps(source_key(xml_file, settings)),))
+    connection.execute("COMMIT")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.execute("ANALYZE")
+    return connection
+
+
+def open_database(db_file, xml_file, settings=None):
+    """
+    Open a SQLite database of users, if it is valid for the xml file
+    The database is invalid if the xml file size or hash have changed; the hash is only recalculated if the
+    modification time has changed.
+    :param db_file: name of database file
+    :param xml_file: name of xml file the users were loaded from
+    :param settings: optional dictionary of settings affecting the data loaded
+    :return: connection to the database, or None if it is not valid
+    """
+    if not osp.exists(db_file) or not osp.exists(xml_file):
+        return None
+    connection = sqlite3.connect(db_file, isolation_level=None)
+    try:
+        stored = connection.execute("SELECT key FROM source").fetchone()
+    except sqlite3.DatabaseError:
+        stored = None
+    if stored is not None:
+        key = json.loads(stored[0])
+        stat = os.stat(xml_file)
+        if stat.st_size == key["size"] and key["settings"] == (settings if settings is not None else {}) and \
+                (stat.st_mtime_ns == key["mtime_ns"] or file_hash(xml_file) == key["sha256"]):
+            return connection
+    connection.close()
+    return None
+
+
+def extreme(connection, name, function, limit=max_array_display):
+    """
+    Find the lowest or highest value of a column, and the users holding it
+    :param connection: database connection
+    :param name: name of column
+    :param function: 'MIN' or 'MAX'
+    :param limit: max number of users to get
+    :return: tuple of value, number of users holding it, and list of the first users holding it
+    """
+    value = connection.execute(f"SELECT {function}({name}) FROM users").fetchone()[0]
+    count = connection.execute(f"SELECT COUNT(*) FROM users WHERE {name} = ?", (value,)).fetchone()[0]
+    rows = connection.execute(f"{select_users} WHERE {name} = ? ORDER BY Id LIMIT ?", (value, limit)).fetchall()
+    return value, count, rows
+
+
+def range_users(connection, name, low=None, high=None, limit=max_array_display):
+    """
+    Find the users with values of a column in a range
+    :param connection: database connection
+    :param name: name of column
+    :param low: lowest value of range, or None for no lower limit
+    :param high: value after the range, or None for no upper limit
+    :param limit: max number of users to get
+    :return: tuple of number of users in the range, and list of the first users in it
+    """
+    conditions = [f"{name} IS NOT NULL"]
+    params = []
+    if low is not None:
+        conditions.append(f"{name} >= ?")
+        params.append(low)
+    if high is not None:
+        conditions.append(f"{name} < ?")
+        params.append(high)
+    where = ' AND '.join(conditions)
+    count = connection.execute(f"SELECT COUNT(*) FROM users WHERE {where}", params).fetchone()[0]
+    rows = connection.execute(f"{select_users} WHERE {where} ORDER BY Id LIMIT ?", params + [limit]).fetchall()
+    return count, rows
+
+
+def top_counts(connection, name, n):
+    """
+    Find the most frequent values of a column; missing values are not counted
+    :param connection: database connection
+    :param name: name of column
+    :param n: number of values
+    :return: list of tuples of value and count, in descending order of count; ties are in order of first occurrence
+    """
+    return connection.execute(f"SELECT {name}, COUNT(*) AS count FROM users WHERE {name} IS NOT NULL "
+                              f"GROUP BY {name} ORDER BY count DESC, MIN(Id) LIMIT ?", (n,)).fetchall()
+
+
+def bin_titles(edges):
+    """
+    Get titles for the bins between integer edges, e.g. 'below 18', 'from 18-25' and 'above 46'
+    :param edges: ascending list of bin edges
+    :return: list of titles
+    """
+    return [f'below {edges[0]}'] + \
+           [f'from {low}-{high - 1}' for low, high in zip(edges[:-1], edges[1:])] + \
+           [f'above {edges[-1] - 1}']
+
+
+def date_limit(check_time, num_days):
+    """
+    Get the date a number of days before a time, as stored in the database
+    :param check_time: datetime
+    :param num_days: number of days
+    :return: ISO 8601 date string
+    """
+    return (check_time - dt.timedelta(days=num_days)).isoformat(timespec='milliseconds')
+
+
+def main():
+    settings = {"process_limit": process_limit}
+    connection = open_database(database_file, xml_source, settings)
+    if connection is not None:
+        display('load database')
+    else:
+        connection = create_database(database_file, xml_source, settings)
+
+    # The oldest user
+    print_header("Oldest user")
+    oldest, _, rows = extreme(connection, "CreationDate", "MIN", 1)
+    display(f"date for oldest user: {dt.datetime.fromisoformat(oldest)}")
+    display(rows[0])
+
+    # The newest user
+    print_header("Newest user")
+    newest, _, rows = extreme(connection, "CreationDate", "MAX", 1)
+    display(f"date for newest user: {dt.datetime.fromisoformat(newest)}")
+    display(rows[0])
+
+    # Average user age
+    print_header("Average user age")
+    display(f"average user age: {connection.execute('SELECT AVG(Age) FROM users').fetchone()[0]}")
+
+    # User with highest downvote and highest views
+    # User with highest upvote and lowest views
+    for title, label, name, function in [("User with highest downvote", "downvote", "DownVotes", "MAX"),
+                                         ("User with highest views", "views", "Views", "MAX"),
+                                         ("User with highest upvote", "upvote", "UpVotes", "MAX"),
+                                         ("User with lowest views", "views", "Views", "MIN")]:
+        print_header(title)
+        value, count, rows = extreme(connection, name, function)
+        direction = 'highest' if function == 'MAX' else 'lowest'
+        display(f'{direction} {label}: {value}')
+        display(f'{direction} {label} count: {count}')
+        print_rows(rows, count)
+
+    # Users that do not access the website for more than 180 days
+    num_days = 180
+    check_time = dt.datetime.now()
+    count, rows = range_users(connection, "LastAccessDate", high=date_limit(check_time, num_days))
+    print_header(f"Users that do not access the website for more than {num_days} days: {count}")
+    print_rows(rows, count)
+
+    check_time = dt.datetime(2014, 6, 1)
+    limit = date_limit(check_time, num_days)
+    count, rows = range_users(connection, "LastAccessDate", high=limit)
+    print_header(
+        f"Users that do not access the website for more than {num_days} days before {check_time} i.e. {limit}: {count}")
+    print_rows(rows, count)
+
+    # How many people are below 18, from 18-25, 25-35,36-46, above 46
+    edges = [None] + age_bins + [None]
+    for idx, title in enumerate(bin_titles(age_bins)):
+        count, rows = range_users(connection, "Age", edges[idx], edges[idx + 1])
+        print_header(f"Users that are {title}: {count}")
+        print_rows(rows, count)
+
+    # Calculate the top 20 frequent locations
+    top_count = 20
+    print_header(f"Top {top_count} locations:")
+    for location, count in top_counts(connection, "Location", top_count):
+        display(location, count)
+
+    # How many people with the sameWebsiteUrl
+    print_header(f"Counts of users with same website urls:")
+    for url, count in top_counts(connection, "WebsiteUrl", max_array_display):
+        display(url, count)
+
+    # Users with above the average number of words AboutMe section
+    # Users with below the average number of words AboutMe section
+    print_header(f"Counts of users with above/below average number of words AboutMe section:")
+    avg = connection.execute("SELECT AVG(AboutMeWords) FROM users").fetchone()[0]
+    display(f"average AboutMe word count: {avg}")
+    below, above, equal = connection.execute(
+        "SELECT TOTAL(AboutMeWords < :avg), TOTAL(AboutMeWords > :avg), TOTAL(AboutMeWords = :avg) FROM users",
+        {"avg": avg}).fetchone()
+    display(f"number of users with above average number of words AboutMe section: {int(above)}")
+    display(f"number of users with below average number of words AboutMe section: {int(below)}")
+    display(f"number of users with average number of words AboutMe section: {int(equal)}")
+
+    connection.close()
+
+
+if __name__ == '__main__':
+    if timeit_count == 0:
+        main()
+    else:
+        print(f'\n\nBeginning timeit of {timeit_count} execution(s)')
+        timed = timeit.timeit('main()', number=timeit_count)
+        print(f'\n\nexecution time: {timed} sec')
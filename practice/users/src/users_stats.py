@@ -0,0 +1,186 @@
+# Column statistics for the users solutions
+# The min, max, null count and sum of the numeric and date columns are kept for each chunk of rows, like zone maps,
+# in the column cache alongside the data. Column totals come from the chunk statistics without reading the column,
+# the rows holding the extremes are only searched for in the chunks holding them, and range filters skip the chunks
+# whose values are all outside the range.
+import numpy as np
+
+from users_aggregate import Extremes, valid_mask
+
+stats_chunk_rows = 65536    # number of rows in each chunk with its own statistics
+
+
+def has_stats(column):
+    """
+    Check if statistics are kept for a column
+    :param column: array
+    :return: True if the column is numeric or dates
+    """
+    return isinstance(column, np.ndarray) and column.dtype.kind in 'iufM'
+
+
+def column_zones(column, chunk_rows=None):
+    """
+    Calculate the statistics of each chunk of a column
+    :param column: numeric or datetime array
+    :param chunk_rows: number of rows in each chunk, or None for stats_chunk_rows
+    :return: structured array with the start and stop row, min, max, null count and sum of each chunk; min and max are
+             missing if all the values in the chunk are, and dates are summed as int64
+    """
+    chunk_rows = chunk_rows if chunk_rows is not None else stats_chunk_rows
+    sum_dtype = np.float64 if column.dtype.kind == 'f' else np.int64
+    starts = np.arange(0, len(column), chunk_rows, dtype=np.int64)
+    zones = np.zeros(len(starts), dtype=[('start', np.int64), ('stop', np.int64), ('min', column.dtype),
+                                         ('max', column.dtype), ('nulls', np.int64), ('sum', sum_dtype)])
+    zones['start'] = starts
+    zones['stop'] = np.minimum(starts + chunk_rows, len(column))
+    for zone in zones:
+        _zone_stats(zone, column)
+    return zones
+
+
+def _zone_stats(zone, column):
+    values = column[zone['start']:zone['stop']]
+    zone['nulls'] = 0
+    zone['sum'] = 0
+    valid = valid_mask(values)
+    if valid is not None:
+        zone['nulls'] = len(values) - np.count_nonzero(valid)
+        values = values[valid]
+    if len(values) > 0:
+        zone['min'] = values.min()
+        zone['max'] = values.max()
+        zone['sum'] = values.view(np.int64).sum() if values.dtype.kind == 'M' else values.sum()
+    elif column.dtype.kind in 'fM':
+        zone['min'] = zone['max'] = np.array('NaT' if column.dtype.kind == 'M' else np.nan, dtype=column.dtype)
+
+
+def refresh_zones(zones, column, rows):
+    """
+    Update the statistics of the chunks of a column after some of its rows have changed or been added
+    Only the chunks holding the rows are recalculated.
+    :param zones: chunk statistics before the change, see column_zones()
+    :param column: array of the changed column
+    :param rows: array of the indices of the changed and added rows
+    :return: chunk statistics
+    """
+    chunk_rows = zones['stop'][0] - zones['start'][0] if len(zones) > 1 else stats_chunk_rows
+    starts = np.arange(0, len(column), chunk_rows, dtype=np.int64)
+    refreshed = np.zeros(len(starts), dtype=zones.dtype)
+    refreshed[:len(zones)] = zones
+    refreshed['start'] = starts
+    refreshed['stop'] = np.minimum(starts + chunk_rows, len(column))
+    for chunk in np.unique(rows // chunk_rows).tolist():
+        _zone_stats(refreshed[chunk], column)
+    return refreshed
+
+
+def table_zones(columns, chunk_rows=None):
+    """
+    Calculate the chunk statistics of the numeric and date columns of a table
+    :param columns: dictionary of column name and column
+    :param chunk_rows: number of rows in each chunk, or None for stats_chunk_rows
+    :return: dictionary of column name and chunk statistics, see column_zones()
+    """
+    return {name: column_zones(column, chunk_rows) for name, column in columns.items() if has_stats(column)}
+
+
+class ColumnStats:
+    """
+    Statistics of a column, from the statistics of its chunks
+    """
+
+    def __init__(self, zones):
+        """
+        Create the statistics
+        :param zones: chunk statistics, see column_zones()
+        """
+        self.zones = zones
+        valid = valid_mask(zones['min'])
+        self._valid = zones if valid is None else zones[valid]    # chunks with values
+
+    @property
+    def rows(self):
+        return int(self.zones['stop'][-1]) if len(self.zones) > 0 else 0
+
+    @property
+    def null_count(self):
+        return int(self.zones['nulls'].sum())
+
+    @property
+    def count(self):
+        """
+        Number of values which are not missing
+        """
+        return self.rows - self.null_count
+
+    @property
+    def sum(self):
+        return self.zones['sum'].sum()
+
+    @property
+    def mean(self):
+        """
+        Mean of the column, with missing values counted as 0, as the Mean aggregate would calculate
+        """
+        return self.sum / self.rows if self.rows > 0 else np.nan
+
+    @property
+    def min(self):
+        return self._valid['min'].min() if len(self._valid) > 0 else None
+
+    @property
+    def max(self):
+        return self._valid['max'].max() if len(self._valid) > 0 else None
+
+    def extremes(self, column, limit=None):
+        """
+        Find the lowest and highest values of the column and the rows holding them, only reading the chunks which hold
+        them
+        :param column: array of column values
+        :param limit: max number of rows holding each extreme to keep, or None to keep all
+        :return: Extremes aggregate
+        """
+        extremes = Extremes(None, limit)
+        if len(self._valid) > 0:
+            candidates = (self._valid['min'] == self.min) | (self._valid['max'] == self.max)
+            # chunks are read in row order, so the extremes keep the rows in order
+            for zone in self._valid[candidates]:
+                extremes.update(column[zone['start']:zone['stop']], zone['start'])
+        return extremes
+
+    def chunks_between(self, low=None, high=None):
+        """
+        Get the chunks which may hold values in a range
+        :param low: lowest value of range, or None for no lower limit
+        :param high: value after the range, or None for no upper limit
+        :return: chunk statistics of the chunks
+        """
+        candidates = np.ones(len(self._valid), dtype=np.bool_)
+        if low is not None:
+            candidates &= self._valid['max'] >= low
+        if high is not None:
+            candidates &= self._valid['min'] < high
+        return self._valid[candidates]
+
+    def rows_between(self, column, low=None, high=None):
+        """
+        Find the rows with values in a range, skipping the chunks with no values in it
+        Missing values are not in any range, even one with no limits.
+        :param column: array of column values
+        :param low: lowest value of range, or None for no lower limit
+        :param high: value after the range, or None for no upper limit
+        :return: int64 array of row indices, in ascending order
+        """
+        rows = [np.empty(0, dtype=np.int64)]
+        for zone in self.chunks_between(low, high):
+            values = column[zone['start']:zone['stop']]
+            matches = valid_mask(values)
+            if matches is None:
+                matches = np.ones(len(values), dtype=np.bool_)
+            if low is not None:
+                matches &= values >= low
+            if high is not None:
+                matches &= values < high
+            rows.append(np.flatnonzero(matches) + zone['start'])
+        return np.concatenate(rows)
@@ -0,0 +1,8 @@
+# Test configuration for the users solutions
+# The solutions are scripts run with src as the working directory, so make their modules importable.
+import os.path as osp
+import sys
+
+sys.path.insert(0, osp.join(osp.dirname(__file__), '..', 'src'))
+
+users_source = osp.join(osp.dirname(__file__), '..', 'Users.xml.gz')   # bundled dump
@@ -0,0 +1,51 @@
+# Tests for the html to text extraction, against BeautifulSoup
+import re
+import warnings
+
+import pytest
+
+from conftest import users_source
+from html_text import count_words, strip_html
+from users_reader import iter_rows
+
+bs4 = pytest.importorskip('bs4')
+
+_words = re.compile(r'(\w+)')
+
+
+def soup_text(markup):
+    with warnings.catch_warnings():
+        # markup which looks like a url or file name is still parsed as html
+        warnings.simplefilter('ignore')
+        return bs4.BeautifulSoup(markup, 'html.parser').get_text()
+
+
+@pytest.mark.parametrize('markup', [
+    '',
+    'plain text',
+    '<p>Developer on the <b>team</b>.</p>\n\n<p>Find me on <a href="http://example.com" rel="nofollow">Twitter</a></p>',
+    '<p>a</p>   <p>b</p>\n  \n<p>c</p>',
+    '<pre>  indented\n\n  code  </pre> <pre>\n</pre>',
+    '<script type="text/javascript">var a = "<p>";</script>after',
+    '<style>p { color: red; }</style><p>styled</p>',
+    '<!-- hidden <p>comment</p> -->shown',
+    '<a title="1 > 0">greater</a>',
+    "<a title='quote \" inside'>quoted</a>",
+    'AT&amp;T &lt;tag&gt; &quot;quoted&quot; &#39;apos&#39; &#x263A; &eacute;',
+    '<br/>line<br />break<hr>',
+    '<p>unterminated',
+])
+def test_matches_soup(markup):
+    expected = soup_text(markup)
+    assert strip_html(markup) == expected
+    assert count_words(markup) == len(_words.findall(expected))
+
+
+def test_about_me_matches_soup():
+    about_me = [user.get('AboutMe', '') for user in iter_rows(users_source) if int(user.get('Id')) > 0]
+    expected = [soup_text(markup) for markup in about_me]
+    text_mismatches = [idx for idx, markup in enumerate(about_me) if strip_html(markup) != expected[idx]]
+    assert text_mismatches == []
+    word_mismatches = [idx for idx, markup in enumerate(about_me)
+                       if count_words(markup) != len(_words.findall(expected[idx]))]
+    assert word_mismatches == []
@@ -0,0 +1,44 @@
+# Tests for the top n selection of the most frequent entries
+import numpy as np
+import pytest
+
+from users_np_dtype import nlargest_counts
+
+
+def expected_top(values, counts, n):
+    # a stable sort gives the expected order for equal counts
+    # https://docs.scipy.org/doc/numpy/reference/generated/numpy.argsort.html
+    order = np.argsort(-counts, kind='stable')[:n]
+    return values[order], counts[order]
+
+
+@pytest.mark.parametrize('unique_count', [1, 10, 1000, 100_000])
+@pytest.mark.parametrize('n', [1, 2, 20, 1000, 200_000])
+def test_matches_stable_sort(unique_count, n):
+    rng = np.random.default_rng(unique_count + n)
+    values = np.arange(unique_count)
+    counts = rng.zipf(1.5, unique_count).astype(np.int64)     # skewed counts, with many ties
+    top_values, top_counts = nlargest_counts(values, counts, n)
+    expected_values, expected_counts = expected_top(values, counts, n)
+    assert len(top_values) == min(n, unique_count)
+    np.testing.assert_array_equal(top_values, expected_values)
+    np.testing.assert_array_equal(top_counts, expected_counts)
+
+
+def test_ties_in_entry_order():
+    values = np.array(['a', 'b', 'c', 'd', 'e'], dtype=object)
+    counts = np.array([1, 3, 2, 3, 3])
+    top_values, top_counts = nlargest_counts(values, counts, 2)
+    assert top_values.tolist() == ['b', 'd']
+    assert top_counts.tolist() == [3, 3]
+
+
+@pytest.mark.parametrize('n', [0, -1])
+def test_no_entries(n):
+    top_values, top_counts = nlargest_counts(np.arange(5), np.array([5, 4, 3, 2, 1]), n)
+    assert len(top_values) == 0 and len(top_counts) == 0
+
+
+def test_no_counts():
+    top_values, top_counts = nlargest_counts(np.empty(0, dtype=object), np.empty(0, dtype=np.int64), 20)
+    assert len(top_values) == 0 and len(top_counts) == 0
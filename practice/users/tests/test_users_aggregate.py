@@ -0,0 +1,111 @@
+# Tests for the single pass aggregation engine, against direct NumPy computations over the whole columns
+import numpy as np
+import pytest
+
+import users_np_dtype
+from conftest import users_source
+from html_text import count_words
+from users_aggregate import AggregationEngine, Bins, Counts, Extremes, Filter, Histogram, Mean
+from users_reader import iter_rows
+
+attributes = [users_np_dtype.attribute_dictionary(name, attr_type) for name, attr_type in [
+    ("Id", users_np_dtype.intAttrib), ("CreationDate", users_np_dtype.dateAttrib),
+    ("LastAccessDate", users_np_dtype.dateAttrib), ("Location", users_np_dtype.catAttrib),
+    ("AboutMe", users_np_dtype.htmlAttrib), ("Views", users_np_dtype.intAttrib), ("Age", users_np_dtype.intAttrib)]]
+date_limit = np.datetime64('2013-12-03', 'ms')
+age_edges = [18, 26, 36, 47]
+
+
+@pytest.fixture(scope='module')
+def users():
+    return users_np_dtype.read_users(iter_rows(users_source), attributes)
+
+
+def add_aggregates(engine):
+    return {
+        'creation': engine.add(Extremes('CreationDate')),
+        'views': engine.add(Extremes('Views')),
+        'age_mean': engine.add(Mean('Age')),
+        'inactive': engine.add(Filter('LastAccessDate', lambda values: values < date_limit)),
+        'locations': engine.add(Counts('Location')),
+        'age_groups': engine.add(Bins('Age', age_edges)),
+        'words': engine.add(Histogram('AboutMe', lambda about_me: [count_words(markup) for markup in about_me])),
+    }
+
+
+def run_chunks(users):
+    # chunks of the loaded table, sharing its dictionaries
+    engine = AggregationEngine(chunk_rows=3000)
+    aggregates = add_aggregates(engine)
+    engine.run(users, len(users))
+    return aggregates
+
+
+def run_stream(users):
+    # chunks read from the file, each with its own dictionaries
+    engine = AggregationEngine(keep_records=True)
+    aggregates = add_aggregates(engine)
+    offset = 0
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(users_np_dtype, 'stream_chunk_rows', 3000)
+        for chunk in users_np_dtype.stream_users(users_source, attributes):
+            engine.update(chunk, offset)
+            offset += len(chunk)
+    assert offset == len(users)
+    return aggregates
+
+
+@pytest.fixture(scope='module', params=['chunks', 'stream'])
+def aggregates(request, users):
+    if request.param == 'chunks':
+        return run_chunks(users)
+    return run_stream(users)
+
+
+@pytest.fixture(scope='module')
+def words(users):
+    return np.array([count_words(markup) for markup in users['AboutMe']])
+
+
+@pytest.mark.parametrize('name, column', [('creation', 'CreationDate'), ('views', 'Views')])
+def test_extremes(users, aggregates, name, column):
+    values = users[column]
+    extremes = aggregates[name]
+    valid = values[values == values]
+    assert extremes.low == valid.min() and extremes.high == valid.max()
+    np.testing.assert_array_equal(extremes.low_rows, np.flatnonzero(values == valid.min()))
+    np.testing.assert_array_equal(extremes.high_rows, np.flatnonzero(values == valid.max()))
+    assert extremes.argmin == np.argmin(np.where(values == values, values, valid.max()))
+    if name == 'views':
+        assert extremes.lows.count > 1     # ties span the chunks
+
+
+def test_mean(users, aggregates):
+    assert aggregates['age_mean'].mean == pytest.approx(users['Age'].mean())
+
+
+def test_filter(users, aggregates):
+    np.testing.assert_array_equal(aggregates['inactive'].rows, np.flatnonzero(users['LastAccessDate'] < date_limit))
+
+
+def test_counts(users, aggregates):
+    unique, counts = np.unique(np.array(list(users['Location']), dtype=np.str_), return_counts=True)
+    np.testing.assert_array_equal(aggregates['locations'].values, unique)
+    np.testing.assert_array_equal(aggregates['locations'].counts, counts)
+
+
+def test_bins(users, aggregates):
+    bins = np.digitize(users['Age'], age_edges)
+    age_groups = aggregates['age_groups']
+    np.testing.assert_array_equal(age_groups.counts, np.bincount(bins, minlength=len(age_edges) + 1))
+    for idx in range(len(age_edges) + 1):
+        np.testing.assert_array_equal(age_groups.rows(idx), np.flatnonzero(bins == idx))
+
+
+def test_histogram(aggregates, words):
+    histogram = aggregates['words']
+    np.testing.assert_array_equal(histogram.counts, np.bincount(words))
+    assert histogram.mean == pytest.approx(words.mean())
+    mean = words.mean()
+    assert histogram.split(mean) == ((words < mean).sum(), (words == mean).sum(), (words > mean).sum())
+    assert histogram.split(3) == ((words < 3).sum(), (words == 3).sum(), (words > 3).sum())
@@ -0,0 +1,96 @@
+# Tests for the Parquet and Arrow IPC (Feather) table files
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import users
+from conftest import users_source
+from users_arrow import load_table, save_table
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture(scope='module')
+def users_df():
+    display_output, process_limit = users.display_output, users.process_limit
+    users.display_output, users.process_limit = False, 500
+    try:
+        return users.load_dataframe(users.select_attributes(users.all_attributes), users_source)
+    finally:
+        users.display_output, users.process_limit = display_output, process_limit
+
+
+@pytest.fixture
+def source(tmp_path):
+    filename = str(tmp_path / 'Users.xml.gz')
+    shutil.copyfile(users_source, filename)
+    return filename
+
+
+@pytest.mark.parametrize('filename, compression', [('users.parquet', 'zstd'), ('users.parquet', None),
+                                                   ('users.feather', 'zstd'), ('users.feather', 'lz4'),
+                                                   ('users.feather', None)])
+def test_round_trip(users_df, source, tmp_path, filename, compression):
+    filename = str(tmp_path / filename)
+    save_table(filename, users_df, source, {"columns": 1}, compression, users.dictionary_columns)
+    loaded = load_table(filename, source, {"columns": 1})
+    assert loaded is not None
+
+    # the typed columns keep their types, and dictionary encoded strings load as categories of the same values
+    for name in users_df.columns:
+        if name in users.dictionary_columns:
+            assert isinstance(loaded[name].dtype, pd.CategoricalDtype)
+            pd.testing.assert_series_equal(loaded[name].astype(users_df[name].dtype), users_df[name],
+                                           check_names=False)
+        else:
+            assert loaded[name].dtype == users_df[name].dtype, name
+            pd.testing.assert_series_equal(loaded[name], users_df[name], check_names=False)
+
+
+@pytest.mark.parametrize('filename', ['users.parquet', 'users.feather'])
+def test_source_key(users_df, source, tmp_path, filename):
+    filename = str(tmp_path / filename)
+    save_table(filename, users_df, source, {"columns": 1})
+    assert load_table(filename, source, {"columns": 2}) is None     # different settings
+
+    # touching the source keeps the table valid, as its hash has not changed
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert load_table(filename, source, {"columns": 1}) is not None
+
+    # changing the contents invalidates it, even with the same size
+    with open(source, 'r+b') as file:
+        file.seek(-1, os.SEEK_END)
+        last = file.read(1)
+        file.seek(-1, os.SEEK_END)
+        file.write(bytes([last[0] ^ 0xff]))
+    assert os.stat(source).st_size == stat.st_size
+    assert load_table(filename, source, {"columns": 1}) is None
+
+
+def test_missing_key(users_df, source, tmp_path):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    filename = str(tmp_path / 'users.feather')
+    feather.write_feather(pa.Table.from_pandas(users_df, preserve_index=False), filename)
+    assert load_table(filename, source) is None
+
+
+@pytest.mark.parametrize('filename', ['users.parquet', 'users.feather'])
+def test_invalid_table_not_read(users_df, source, tmp_path, monkeypatch, filename):
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    filename = str(tmp_path / filename)
+    save_table(filename, users_df, source, {"columns": 1})
+
+    def read_table(*args, **kwargs):
+        raise AssertionError('table read before checking the source key')
+
+    # only the schema is read for a table which is not valid
+    monkeypatch.setattr(feather, 'read_table', read_table)
+    monkeypatch.setattr(pq, 'read_table', read_table)
+    assert load_table(filename, source, {"columns": 2}) is None
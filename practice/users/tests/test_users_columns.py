@@ -0,0 +1,84 @@
+# Tests for the column cache invalidation
+import json
+import os
+
+import numpy as np
+import pytest
+
+import users_columns
+from users_columns import StringColumn, cache_manifest_name, load_columns, save_columns
+
+settings = {"process_limit": 100, "columns": ["Id", "DisplayName"]}
+
+
+@pytest.fixture
+def source(tmp_path):
+    source = tmp_path / 'Users.xml'
+    source.write_text('<users>\n  <row Id="1" DisplayName="one" />\n</users>')
+    return str(source)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, source):
+    cache_dir = str(tmp_path / 'cache')
+    columns = {'Id': np.array([1, 2, 3]), 'DisplayName': np.array(['one', None, 'three'], dtype=object)}
+    save_columns(cache_dir, source, columns, settings)
+    return cache_dir
+
+
+def test_load(source, cache_dir):
+    columns, masks, indexes, zones = load_columns(cache_dir, source, settings)
+    np.testing.assert_array_equal(columns['Id'], [1, 2, 3])
+    assert isinstance(columns['DisplayName'], StringColumn)
+    assert list(columns['DisplayName']) == ['one', '', 'three']
+    np.testing.assert_array_equal(masks['DisplayName'], [False, True, False])
+    assert indexes == {} and zones == {}
+
+
+def test_touch(source, cache_dir):
+    # a new modification time with the same contents keeps the cache, as the hash is unchanged
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+    assert load_columns(cache_dir, source, settings) is not None
+
+
+@pytest.mark.parametrize('contents', ['<users>\n  <row Id="1" DisplayName="two" />\n</users>',  # same size
+                                      '<users>\n  <row Id="1" />\n</users>'])
+def test_content_change(source, cache_dir, contents):
+    stat = os.stat(source)
+    with open(source, 'w') as file:
+        file.write(contents)
+    # a later modification time, even if the file system clock is coarse; with the same size the hash rejects it
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+    assert load_columns(cache_dir, source, settings) is None
+
+
+def test_settings_change(source, cache_dir):
+    assert load_columns(cache_dir, source, dict(settings, process_limit=200)) is None
+    assert load_columns(cache_dir, source) is None
+
+
+def test_stale_format(source, cache_dir, monkeypatch):
+    monkeypatch.setattr(users_columns, 'cache_format', users_columns.cache_format + 1)
+    assert load_columns(cache_dir, source, settings) is None
+
+
+def test_partial_manifest(source, cache_dir):
+    manifest_path = os.path.join(cache_dir, cache_manifest_name)
+    with open(manifest_path) as file:
+        manifest = file.read()
+    with open(manifest_path, 'w') as file:
+        file.write(manifest[:len(manifest) // 2])
+    assert load_columns(cache_dir, source, settings) is None
+
+
+def test_interrupted_save(source, cache_dir, monkeypatch):
+    # a save which fails part way through leaves no manifest, so the columns written so far are not loaded
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(json, 'dump', fail)
+    with pytest.raises(OSError):
+        save_columns(cache_dir, source, {'Id': np.array([4, 5])}, settings)
+    assert load_columns(cache_dir, source, settings) is None
+    assert os.listdir(cache_dir).count(cache_manifest_name) == 0
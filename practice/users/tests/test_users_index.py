@@ -0,0 +1,42 @@
+# Tests for the sorted indexes, against searching the gathered sorted values
+import numpy as np
+import pytest
+
+from users_index import SortedIndex
+
+
+def column(kind, count, rng):
+    if kind == 'int':
+        return rng.integers(0, 50, count)
+    if kind == 'float':
+        values = rng.random(count)
+        values[rng.random(count) < 0.3] = np.nan
+        return values
+    values = np.datetime64('2014-01-01', 'ms') + rng.integers(0, 10**9, count).astype('timedelta64[ms]')
+    values[rng.random(count) < 0.3] = np.datetime64('NaT')
+    return values
+
+
+@pytest.mark.parametrize('kind', ['int', 'float', 'date'])
+@pytest.mark.parametrize('count', [0, 1, 2, 7, 1000])
+def test_count_before(kind, count):
+    rng = np.random.default_rng(count)
+    values = column(kind, count, rng)
+    index = SortedIndex(values)
+    sorted_values = np.sort(values)     # missing values are sorted to the end
+    valid = count if kind == 'int' else int(np.count_nonzero(sorted_values == sorted_values))
+    assert len(index) == valid
+
+    limits = np.concatenate([sorted_values, values[:1] + 1, values[:1] - 1])
+    expected = np.searchsorted(sorted_values[:valid], limits, side='left')
+    np.testing.assert_array_equal(index.count_before(limits), expected)
+    for limit, count_before in zip(limits[:10], expected[:10]):
+        assert index.count_before(limit) == count_before
+    np.testing.assert_array_equal(np.sort(index.first_rows(valid)), np.flatnonzero(values == values))
+
+
+def test_count_inactive():
+    dates = np.array(['2014-01-01', '2014-03-01', 'NaT', '2013-06-01', '2014-05-31'], dtype='datetime64[ms]')
+    index = SortedIndex(dates)
+    np.testing.assert_array_equal(index.count_inactive(['2014-06-01', '2015-01-01'], 180), [1, 4])
+    np.testing.assert_array_equal(index.inactive_rows('2014-06-01', 180), [3])
@@ -0,0 +1,122 @@
+# Tests for the parallel xml parsing, against the serial loaders
+import gzip
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+import users
+import users_np_dtype
+import users_parallel
+from conftest import users_source
+from html_text import count_words
+from users_columns import ColumnTable, StringColumn
+from users_parallel import count_words_parallel, parse_parallel, row_ranges
+from users_reader import iter_rows
+
+np_attributes = [users_np_dtype.attribute_dictionary(name, attr_type) for name, attr_type in [
+    ("Id", users_np_dtype.intAttrib), ("Reputation", users_np_dtype.intAttrib),
+    ("CreationDate", users_np_dtype.dateAttrib), ("DisplayName", users_np_dtype.strAttrib),
+    ("LastAccessDate", users_np_dtype.dateAttrib), ("WebsiteUrl", users_np_dtype.catAttrib),
+    ("Location", users_np_dtype.catAttrib), ("AboutMe", users_np_dtype.htmlAttrib),
+    ("Views", users_np_dtype.intAttrib), ("UpVotes", users_np_dtype.intAttrib),
+    ("DownVotes", users_np_dtype.intAttrib), ("Age", users_np_dtype.intAttrib),
+    ("AccountId", users_np_dtype.intAttrib)]]
+
+small_xml = (
+    '<?xml version="1.0" encoding="utf-8"?>\n<users>\n'
+    '  <row Id="-1" Reputation="1" CreationDate="2010-07-19T06:55:26.860" DisplayName="Community" />\n'
+    '  <row Id="2" Reputation="101" CreationDate="2010-07-19T14:01:36.697" DisplayName="Geoff" Location="Corvallis" '
+    'AboutMe="&lt;p&gt;text&lt;/p&gt;" Age="37" />\n'
+    '  <row Id="3" Reputation="5" LastAccessDate="2014-01-01T00:00:00.000" WebsiteUrl="http://example.com" />\n'
+    '</users>'
+)
+
+
+@pytest.fixture(scope='module', params=['users.xml', 'users.xml.gz', 'small.xml', 'small.xml.gz'])
+def source(request, tmp_path_factory):
+    filename = str(tmp_path_factory.mktemp('parallel') / request.param)
+    if request.param.startswith('small'):
+        data = small_xml.encode('utf-8')
+    else:
+        with gzip.open(users_source, 'rb') as file:
+            data = file.read()
+    with (gzip.open if filename.endswith('.gz') else open)(filename, 'wb') as file:
+        file.write(data)
+    return filename
+
+
+def missing(column):
+    return np.array([value is None or value != value for value in column], dtype=np.bool_)
+
+
+@pytest.mark.parametrize('workers', [1, 3, 8])
+def test_read_users(source, workers):
+    expected = users_np_dtype.read_users(iter_rows(source), np_attributes).arrays()
+    parsed = ColumnTable.concat(parse_parallel(source, users_np_dtype.read_users, (np_attributes,), workers)).arrays()
+    # string offsets and data, dictionary codes and values, and the typed columns
+    assert parsed.keys() == expected.keys()
+    for name in expected:
+        np.testing.assert_array_equal(parsed[name], expected[name], err_msg=name)
+
+
+@pytest.mark.parametrize('workers', [1, 3, 8])
+def test_read_rows(source, workers):
+    attributes = users.all_attributes
+    expected = users.read_rows(iter_rows(source), attributes)
+    chunks = parse_parallel(source, users.read_rows, (attributes,), workers)
+    for attrib in attributes:
+        name = attrib["name"]
+        column = np.concatenate([chunk[name] for chunk in chunks])
+        assert column.dtype == expected[name].dtype, name
+        if column.dtype == object:
+            mask = missing(column)
+            np.testing.assert_array_equal(mask, missing(expected[name]), err_msg=name)
+            column, expected_column = column[~mask], expected[name][~mask]
+        else:
+            expected_column = expected[name]
+        np.testing.assert_array_equal(column, expected_column, err_msg=name)
+
+
+def test_row_ranges():
+    data = small_xml.encode('utf-8')
+    for count in [1, 2, 3, 8]:
+        ranges = row_ranges(data, count)
+        assert 1 <= len(ranges) <= 3
+        assert all(data[start:].startswith(b'<row ') for start, _ in ranges)
+        assert all(stop == start for (_, stop), (start, _) in zip(ranges, ranges[1:]))
+        assert data[ranges[-1][1]:] == b'</users>'
+    assert row_ranges(b'<users>\n</users>', 4) == []
+
+
+@pytest.fixture(scope='module')
+def about_me():
+    return [user.get('AboutMe', '') for user in iter_rows(users_source) if int(user.get('Id')) > 0]
+
+
+@pytest.mark.parametrize('workers', [1, 3, 8])
+def test_count_words_parallel(about_me, workers):
+    expected = [count_words(markup) for markup in about_me]
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        # small chunks, so each worker counts several
+        monkeypatch.setattr(users_parallel, 'min_chunk_rows', 100)
+        counts = count_words_parallel(StringColumn.from_strings(about_me), workers)
+    assert counts.dtype == np.int32
+    np.testing.assert_array_equal(counts, expected)
+
+
+def test_count_words_parallel_small(about_me):
+    assert len(count_words_parallel([], 4)) == 0
+    assert len(count_words_parallel(StringColumn(), 4)) == 0
+    # fewer rows than workers, and entries with no words
+    markup = ['', about_me[1], '<p></p>']
+    np.testing.assert_array_equal(count_words_parallel(markup, 8), [count_words(entry) for entry in markup])
+
+
+def test_count_words_shared_executor(about_me):
+    # the pool is reused for each chunk of rows, as the solutions do
+    column = StringColumn.from_strings(about_me)
+    with ProcessPoolExecutor(max_workers=3) as executor:
+        for start, stop in [(0, 2500), (2500, 2500), (2500, 2503), (2503, len(about_me))]:
+            np.testing.assert_array_equal(count_words_parallel(column.slice(start, stop), 3, executor),
+                                          [count_words(markup) for markup in about_me[start:stop]])
@@ -0,0 +1,86 @@
+# Tests for the progress reporting while reading rows
+import io
+
+import pytest
+
+import users_np_dtype
+import users_reader
+from conftest import users_source
+from users_reader import ProgressReporter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(users_reader.time, 'monotonic', clock)
+    return clock
+
+
+def test_rate_limit(clock):
+    output = io.StringIO()
+    progress = ProgressReporter('user count', interval=1.0, file=output)
+    written = []
+    for elapsed, count in [(0.5, 50), (1.0, 100), (1.5, 150), (1.9, 190), (2.5, 250), (2.6, 260)]:
+        clock.now = 100.0 + elapsed
+        progress.add_bytes(10000)
+        progress.update(count)
+        written.append(output.getvalue())
+    # updates are written once the interval since the last one has elapsed
+    assert written[0] == '' and written[1] != ''
+    assert written[2] == written[3] == written[1]
+    assert written[4] != written[3] and written[5] == written[4]
+    updates = output.getvalue().split('\r')
+    assert updates == ['', 'user count: 100 (100 rows/sec, 0.0 MB/sec)', 'user count: 250 (100 rows/sec, 0.0 MB/sec)']
+    assert '\n' not in output.getvalue()
+
+
+def test_finish(clock):
+    output = io.StringIO()
+    progress = ProgressReporter('user count', interval=1.0, file=output)
+    clock.now += 2.0
+    progress.add_bytes(4_000_000)
+    progress.update(1000)
+    clock.now += 0.5
+    progress.finish(40)
+    # the final count is written even within the interval, padded to overwrite the longer previous update, then ends
+    # the line
+    updates = output.getvalue().split('\r')
+    assert updates[1] == 'user count: 1000 (500 rows/sec, 2.0 MB/sec)'
+    assert updates[2] == 'user count: 40 (16 rows/sec, 1.6 MB/sec)'.ljust(len(updates[1])) + '\n'
+    assert output.getvalue().count('\n') == 1
+
+
+def test_stdout(clock, capsys):
+    progress = ProgressReporter('user count')
+    progress.finish(0)
+    assert capsys.readouterr().out.startswith('\ruser count: 0 (0 rows/sec')
+
+
+def test_disabled(clock, capsys):
+    output = io.StringIO()
+    progress = ProgressReporter('user count', enabled=False, file=output)
+    for count in range(5):
+        clock.now += 10.0
+        progress.update(count)
+    progress.finish(5)
+    assert output.getvalue() == ''
+    assert capsys.readouterr().out == ''
+
+
+def test_progress_output(monkeypatch, capsys):
+    # the solutions only display progress if progress_output is set
+    attributes = [users_np_dtype.attribute_dictionary("Id", users_np_dtype.intAttrib)]
+    monkeypatch.setattr(users_np_dtype, 'parse_workers', 1)
+    users = users_np_dtype.load_users(users_source, attributes)
+    assert f'\ruser count: {len(users)} (' in capsys.readouterr().out
+    monkeypatch.setattr(users_np_dtype, 'progress_output', False)
+    users_np_dtype.load_users(users_source, attributes)
+    assert 'user count' not in capsys.readouterr().out
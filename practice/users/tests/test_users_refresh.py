@@ -0,0 +1,152 @@
+# Tests for refreshing loaded columns from a newer dump, against a fresh load of the merged dump
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+import pytest
+
+import users_np_dtype
+from users_columns import ColumnTable, DictionaryColumn, StringColumn
+from users_index import refresh_order, sort_orders
+from users_reader import iter_rows
+from users_refresh import changed_values, match_rows, refresh_columns
+from users_stats import column_zones, refresh_zones
+
+attributes = [users_np_dtype.attribute_dictionary(name, attr_type) for name, attr_type in [
+    ("Id", users_np_dtype.intAttrib), ("Reputation", users_np_dtype.intAttrib),
+    ("CreationDate", users_np_dtype.dateAttrib), ("DisplayName", users_np_dtype.strAttrib),
+    ("LastAccessDate", users_np_dtype.dateAttrib), ("Location", users_np_dtype.catAttrib),
+    ("AboutMe", users_np_dtype.htmlAttrib), ("Age", users_np_dtype.intAttrib)]]
+order_columns = ['Reputation', 'CreationDate', 'LastAccessDate']
+zone_rows = 4
+
+
+def old_users():
+    users = {}
+    for user_id in range(1, 13):
+        users[user_id] = {
+            "Id": user_id, "Reputation": 100 - user_id % 5 * 10,
+            "CreationDate": f"2012-0{user_id % 9 + 1}-15T10:00:00.000",
+            "DisplayName": f"user {user_id}", "LastAccessDate": f"2014-01-{user_id + 10}T08:30:00.000",
+            "Location": ["Paris", "Oslo", "Lima"][user_id % 3], "AboutMe": f"<p>about {user_id}</p>",
+            "Age": 20 + user_id,
+        }
+    # some values start missing
+    del users[6]["Location"], users[9]["DisplayName"], users[10]["CreationDate"], users[11]["AboutMe"]
+    return users
+
+
+def new_users():
+    users = old_users()
+    del users[2]                                        # missing from the newer dump, so kept
+    users[3]["Reputation"] = 250
+    del users[5]["DisplayName"]                         # changes to missing
+    users[6]["Location"] = "Quito"                      # changes from missing to a new value
+    users[7]["AboutMe"] = "<p>about 7, updated</p>"
+    users[8]["AboutMe"] = "<p>about 0</p>"              # same length string which differs
+    del users[8]["LastAccessDate"]
+    users[9]["DisplayName"] = "user nine"
+    users[11]["AboutMe"] = "<p>about 11</p>"            # changes from missing
+    users[12]["LastAccessDate"] = "2014-02-01T00:00:00.000"
+    for user_id in [20, 21, 13]:                        # appended users, not in id order
+        users[user_id] = {"Id": user_id, "Reputation": 90, "CreationDate": "2014-03-01T00:00:00.000",
+                          "DisplayName": f"user {user_id}", "Location": "Oslo"}
+    return users
+
+
+changed_ids = [3, 5, 6, 7, 8, 9, 11, 12]
+appended_ids = [20, 21, 13]
+
+
+def write_dump(filename, users):
+    with open(filename, 'w', encoding='utf-8') as file:
+        file.write('<?xml version="1.0" encoding="utf-8"?>\n<users>\n  <row Id="-1" DisplayName="Community" />\n')
+        for user in users:
+            file.write('  <row ' + ' '.join(f'{name}={quoteattr(str(value))}' for name, value in user.items())
+                       + ' />\n')
+        file.write('</users>')
+    return filename
+
+
+def load(tmp_path, name, users):
+    return users_np_dtype.read_users(iter_rows(write_dump(str(tmp_path / name), users)), attributes)
+
+
+@pytest.fixture
+def refreshed(tmp_path):
+    old = load(tmp_path, 'old.xml', old_users().values())
+    orders = sort_orders(old.arrays(), order_columns)
+    zones = {name: column_zones(old[name], zone_rows) for name in order_columns}
+
+    columns, changed, added = refresh_columns(old.columns, load(tmp_path, 'new.xml', new_users().values()).columns)
+    users = ColumnTable(columns)
+    rows = np.concatenate([changed, added])
+    orders = {name: refresh_order(order, users[name], rows) for name, order in orders.items()}
+    zones = {name: refresh_zones(column_zones, users[name], rows) for name, column_zones in zones.items()}
+    return users, changed, added, orders, zones
+
+
+@pytest.fixture
+def merged(tmp_path):
+    # the users of the old dump in their rows, updated from the newer dump, then the new users in dump order
+    old, new = old_users(), new_users()
+    merged = [new.get(user_id, user) for user_id, user in old.items()] + [new[user_id] for user_id in appended_ids]
+    return load(tmp_path, 'merged.xml', merged)
+
+
+def decoded(column):
+    if isinstance(column, StringColumn):
+        return column.decode()
+    if isinstance(column, DictionaryColumn):
+        # the refreshed dictionary may keep values no longer used, so compare the values of the rows
+        return column.values[column.codes]
+    return column
+
+
+def test_match_rows():
+    ids = np.array([5, 3, 9, 1])
+    np.testing.assert_array_equal(match_rows(ids, np.array([9, 4, 1, 10, 0, 3])), [2, -1, 3, -1, -1, 1])
+    np.testing.assert_array_equal(match_rows(ids[:0], np.array([1, 2])), [-1, -1])
+
+
+def test_changed_values(tmp_path):
+    old = load(tmp_path, 'old.xml', old_users().values())
+    new = load(tmp_path, 'new.xml', new_users().values())
+    new_rows = np.arange(len(new))
+    rows = match_rows(old['Id'], new['Id'])
+    new_rows, rows = new_rows[rows >= 0], rows[rows >= 0]
+    for attrib in attributes:
+        name = attrib["name"]
+        changed = changed_values(old[name], new[name], rows, new_rows)
+        old_values, new_values = decoded(old[name])[rows], decoded(new[name])[new_rows]
+        expected = [not (a == b or (a != a and b != b)) for a, b in zip(old_values, new_values)]
+        np.testing.assert_array_equal(changed, expected, err_msg=name)
+
+
+def test_refresh_columns(refreshed, merged):
+    users, changed, added, _, _ = refreshed
+    np.testing.assert_array_equal(users['Id'][changed], changed_ids)
+    np.testing.assert_array_equal(users['Id'][added], appended_ids)
+    np.testing.assert_array_equal(added, np.arange(len(old_users()), len(merged)))
+    assert len(users) == len(merged)
+    for name in users.columns:
+        assert type(users[name]) is type(merged[name]), name
+        np.testing.assert_array_equal(decoded(users[name]), decoded(merged[name]), err_msg=name)
+    # the user missing from the newer dump keeps its values
+    assert users['DisplayName'][1] == "user 2"
+
+
+def test_refresh_order(refreshed, merged):
+    _, _, _, orders, _ = refreshed
+    for name, order in sort_orders(merged.arrays(), order_columns).items():
+        # rows with equal values may be in a different order, but the order must sort the same values
+        np.testing.assert_array_equal(np.sort(orders[name]), np.arange(len(merged)), err_msg=name)
+        np.testing.assert_array_equal(merged[name][orders[name]], merged[name][order], err_msg=name)
+
+
+def test_refresh_zones(refreshed, merged):
+    _, _, _, _, zones = refreshed
+    for name in order_columns:
+        expected = column_zones(merged[name], zone_rows)
+        assert zones[name].dtype == expected.dtype
+        for field in expected.dtype.names:
+            np.testing.assert_array_equal(zones[name][field], expected[field], err_msg=f'{name} {field}')
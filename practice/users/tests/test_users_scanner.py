@@ -0,0 +1,65 @@
+# Tests for the attribute scanner, against ElementTree
+import io
+import xml.etree.ElementTree as eT
+
+import numpy as np
+
+from conftest import users_source
+from users_reader import iter_rows
+from users_scanner import AttributeScanner, map_source
+
+int_names = ['Id', 'Reputation', 'Views', 'UpVotes', 'DownVotes', 'Age', 'AccountId']
+date_names = ['CreationDate', 'LastAccessDate']
+str_names = ['DisplayName', 'WebsiteUrl', 'Location', 'AboutMe']
+
+# rows with escaped, normalised and missing attribute values
+rows_xml = (
+    '<?xml version="1.0" encoding="utf-8"?>\r\n<users>\r\n'
+    '  <row Id="-1" Reputation="1" CreationDate="2010-07-19T06:55:26.860" DisplayName="Community" />\r\n'
+    '  <row Id="2" Reputation="101" CreationDate="2010-07-19T14:01:36.697" DisplayName="Geoff &amp; co" '
+    'Location="Corvallis, OR" AboutMe="&lt;p&gt;line&#xD;&#xA;break &quot;quoted&quot;&lt;/p&gt;" Age="37" />\r\n'
+    '  <row Id="3" Reputation="0" DisplayName="tab\there" WebsiteUrl="" Views="12" UpVotes="-3" '
+    'AboutMe="literal\r\nnewline &#x263A; café" />\r\n'
+    '</users>'
+)
+
+
+def etree_columns(rows):
+    rows = [dict(row.attrib) for row in rows]   # entries are cleared as they are iterated
+    columns = {name: np.array([int(row.get(name, 0)) for row in rows], dtype=np.int64) for name in int_names}
+    for name in date_names:
+        columns[name] = np.array([row.get(name, 'NaT') for row in rows], dtype='datetime64[ms]')
+    for name in str_names:
+        columns[name] = [row.get(name) for row in rows]
+    return columns
+
+
+def assert_scan_matches(scanner, expected):
+    assert len(scanner) == len(expected['Id'])
+    for name in int_names:
+        np.testing.assert_array_equal(scanner.int_column(name), expected[name], err_msg=name)
+    for name in date_names:
+        np.testing.assert_array_equal(scanner.date_column(name), expected[name], err_msg=name)
+    for name in str_names:
+        assert scanner.str_column(name) == expected[name], name
+
+
+def test_escaped_values():
+    data = rows_xml.encode('utf-8')
+    expected = etree_columns(eT.parse(io.BytesIO(data)).getroot())
+    assert expected['AboutMe'][1] == '<p>line\r\nbreak "quoted"</p>'    # check the fixture is escaped as intended
+    assert_scan_matches(AttributeScanner(data), expected)
+
+
+def test_str_default():
+    scanner = AttributeScanner(rows_xml.encode('utf-8'))
+    assert scanner.str_column('WebsiteUrl', default='None') == ['None', 'None', '']
+
+
+def test_users_match_etree():
+    buffer = map_source(users_source)
+    try:
+        assert_scan_matches(AttributeScanner(buffer), etree_columns(iter_rows(users_source)))
+    finally:
+        if hasattr(buffer, 'close'):
+            buffer.close()
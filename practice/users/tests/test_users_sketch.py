@@ -0,0 +1,106 @@
+# Tests for the approximate counts, against exact counts of a skewed stream
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import users
+import users_np_dtype
+from conftest import users_source
+from users_aggregate import AggregationEngine
+from users_reader import iter_rows
+from users_sketch import CountMinSketch, HeavyHitters, MisraGries
+
+chunk_rows = 2000
+
+
+@pytest.fixture(scope='module')
+def stream():
+    # zipf distributed values, so a few are very frequent and most are rare
+    return np.random.default_rng(7).zipf(1.3, 40000)
+
+
+def chunks(values):
+    for start in range(0, len(values), chunk_rows):
+        yield np.unique(values[start:start + chunk_rows], return_counts=True)
+
+
+def test_count_min(stream):
+    sketch = CountMinSketch(512, 4)
+    for unique, counts in chunks(stream):
+        sketch.update(unique, counts)
+    assert sketch.total == len(stream)
+    values, counts = np.unique(stream, return_counts=True)
+    estimates = sketch.estimate(values)
+    assert np.all(counts <= estimates)
+    assert np.all(estimates <= counts + sketch.error)
+    assert len(sketch.estimate([])) == 0
+
+
+@pytest.mark.parametrize('counters', [1, 20, 100])
+def test_misra_gries(stream, counters):
+    summary = MisraGries(counters)
+    for unique, counts in chunks(stream):
+        summary.update(unique, counts)
+        # each chunk holds more unique values than counters, so every merge is reduced to the counters
+        assert len(summary.counters) <= counters
+    assert summary.total == len(stream)
+    assert 0 < summary.error <= summary.bound
+
+    values, counts = np.unique(stream, return_counts=True)
+    estimates = np.array([summary.counters.get(value, 0) for value in values.tolist()])
+    assert np.all(estimates <= counts)
+    assert np.all(counts <= estimates + summary.error)
+    # every value more frequent than the bound has a counter
+    assert set(values[counts > summary.bound].tolist()) <= set(summary.counters)
+
+
+@pytest.mark.parametrize('width', [None, 256])
+def test_heavy_hitters(stream, width):
+    heavy_hitters = HeavyHitters('value', 20, width, 4)
+    strings = np.array([f'value {value}' for value in stream.tolist()], dtype=object)
+    strings[::7] = np.nan   # missing values are not counted
+    for start in range(0, len(strings), chunk_rows):
+        heavy_hitters.update(strings[start:start + chunk_rows], start)
+
+    exact = Counter(value for value in strings.tolist() if value == value)
+    values, counts, errors = heavy_hitters.top(10)
+    assert len(values) == 10
+    for value, count, error in zip(values, counts, errors):
+        assert count - error <= exact[value] <= count
+    assert np.all(np.diff(counts) <= 0)
+    # the most frequent values are found
+    assert set(values[:3]) == {value for value, _ in exact.most_common(3)}
+
+
+@pytest.fixture(scope='module')
+def solution_counts():
+    # the heavy hitters of both solutions, as their main() would count them
+    def count(columns, rows):
+        engine = AggregationEngine()
+        locations = engine.add(HeavyHitters('Location', users.sketch_counters))
+        web_urls = engine.add(HeavyHitters('WebsiteUrl', users.sketch_counters, users.count_min_width,
+                                           users.count_min_depth))
+        engine.run(columns, rows)
+        return locations, web_urls
+
+    names = ['Id', 'Location', 'WebsiteUrl']
+    attributes = [attrib for attrib in users.all_attributes if attrib["name"] in names]
+    columns = users.read_rows(iter_rows(users_source), attributes)
+    np_attributes = [users_np_dtype.attribute_dictionary(name, users_np_dtype.catAttrib)
+                     for name in names]
+    np_attributes[0]["type"] = users_np_dtype.intAttrib
+    table = users_np_dtype.read_users(iter_rows(users_source), np_attributes)
+    return count(columns, len(columns['Id'])), count(table, len(table))
+
+
+@pytest.mark.parametrize('column, n', [(0, 20), (1, 50)])
+def test_solutions_agree(solution_counts, column, n):
+    values, counts, errors = solution_counts[0][column].top(n)
+    np_values, np_counts, np_errors = solution_counts[1][column].top(n + 2)
+    # users_np_dtype counts missing strings as 'None' and keeps empty ones, users reads both as missing
+    reported = ~np.isin(np_values, ['None', ''])
+    assert np.count_nonzero(~reported) > 0
+    np.testing.assert_array_equal(np_values[reported][:n], values)
+    np.testing.assert_array_equal(np_counts[reported][:n], counts)
+    np.testing.assert_array_equal(np_errors[reported][:n], errors)
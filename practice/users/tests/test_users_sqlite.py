@@ -0,0 +1,49 @@
+# Tests for the SQLite solution
+import sqlite3
+
+import pytest
+
+import users_sqlite
+from conftest import users_source
+from users_reader import iter_rows
+
+
+@pytest.fixture
+def quiet(monkeypatch):
+    monkeypatch.setattr(users_sqlite, 'display_output', False)
+
+
+@pytest.mark.parametrize('process_limit', [0, 1000])
+def test_process_limit(quiet, monkeypatch, tmp_path, process_limit):
+    # the other solutions load process_limit + 1 users
+    monkeypatch.setattr(users_sqlite, 'process_limit', process_limit)
+    connection = users_sqlite.create_database(str(tmp_path / 'users.sqlite'), users_source, batch_rows=300)
+    ids = [row[0] for row in connection.execute("SELECT Id FROM users ORDER BY rowid")]
+    connection.close()
+
+    expected = []
+    for entry in iter_rows(users_source):
+        if int(entry.get('Id')) > 0:
+            expected.append(int(entry.get('Id')))
+            if len(expected) > process_limit:
+                break
+    assert ids == expected
+
+
+def test_reopen(quiet, tmp_path):
+    db_file = str(tmp_path / 'users.sqlite')
+    settings = {"process_limit": 10}
+    users_sqlite.create_database(db_file, users_source, settings, batch_rows=4).close()
+    connection = users_sqlite.open_database(db_file, users_source, settings)
+    assert connection is not None
+    connection.close()
+    assert users_sqlite.open_database(db_file, users_source, {"process_limit": 20}) is None
+
+
+def test_single_progress_line(monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(users_sqlite, 'process_limit', 100)
+    users_sqlite.create_database(str(tmp_path / 'users.sqlite'), users_source, batch_rows=10).close()
+    lines = capsys.readouterr().out.split('\n')
+    assert [line for line in lines if 'user count' in line] == [lines[0]]
+    # the final count is written once, after all the batches
+    assert lines[0].rpartition('\r')[2].startswith('user count: 101 ')
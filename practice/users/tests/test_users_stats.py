@@ -0,0 +1,102 @@
+# Tests for the column chunk statistics, against computations over the whole columns
+import numpy as np
+import pytest
+
+from users_columns import load_columns, save_columns
+from users_stats import ColumnStats, column_zones, table_zones
+
+chunk_rows = 4
+
+
+def date(day):
+    return np.datetime64('2014-01-01', 'ms') + np.timedelta64(day, 'D')
+
+
+@pytest.fixture
+def columns():
+    nat = np.datetime64('NaT', 'ms')
+    return {
+        # the min and max tie across chunk boundaries, and the last chunk is partial
+        'Views': np.array([5, 1, 9, 9, 9, 2, 1, 3, 4, 4, 4, 4, 1, 9], dtype=np.int64),
+        # a chunk with all the dates missing, and missing dates next to the extremes
+        'LastAccessDate': np.array([date(3), nat, date(0), date(7), nat, nat, nat, nat, date(7), date(2), date(0), nat,
+                                    date(5), nat], dtype='datetime64[ms]'),
+        'Score': np.array([0.5, np.nan, -1.5, 2.0, -1.5, 0.0, 2.0, np.nan, np.nan, np.nan, np.nan, np.nan, 1.0, 0.5]),
+    }
+
+
+def valid_values(values):
+    return values[~np.isnat(values)] if values.dtype.kind == 'M' else values[values == values]
+
+
+def check_stats(stats, values):
+    valid = valid_values(values)
+    assert stats.rows == len(values)
+    assert stats.count == len(valid)
+    assert stats.null_count == len(values) - len(valid)
+    assert stats.min == valid.min()
+    assert stats.max == valid.max()
+    total = valid.view(np.int64).sum() if values.dtype.kind == 'M' else valid.sum()
+    assert stats.sum == total
+    assert stats.mean == pytest.approx(total / len(values))
+
+    extremes = stats.extremes(values)
+    assert extremes.low == valid.min()
+    assert extremes.high == valid.max()
+    np.testing.assert_array_equal(extremes.lows.rows, np.flatnonzero(values == valid.min()))
+    np.testing.assert_array_equal(extremes.highs.rows, np.flatnonzero(values == valid.max()))
+    limited = stats.extremes(values, limit=1)
+    assert limited.lows.count == np.count_nonzero(values == valid.min())
+    np.testing.assert_array_equal(limited.lows.rows, np.flatnonzero(values == valid.min())[:1])
+
+    limits = list(np.unique(valid))
+    limits = [None] + limits + [limits[0] - (limits[1] - limits[0]), limits[-1] + (limits[1] - limits[0])]
+    for low in limits:
+        for high in limits:
+            in_range = values == values     # missing values are not in any range
+            if low is not None:
+                in_range &= values >= low
+            if high is not None:
+                in_range &= values < high
+            rows = stats.rows_between(values, low, high)
+            np.testing.assert_array_equal(rows, np.flatnonzero(in_range), err_msg=f'{low} {high}')
+            # the chunks with rows in the range are read, and none of the chunks without values
+            chunks = stats.chunks_between(low, high)
+            assert set((rows // chunk_rows).tolist()) <= set((chunks['start'] // chunk_rows).tolist())
+            assert np.all(chunks['nulls'] < chunks['stop'] - chunks['start'])
+
+
+@pytest.mark.parametrize('name', ['Views', 'LastAccessDate', 'Score'])
+def test_column_stats(columns, name):
+    zones = column_zones(columns[name], chunk_rows)
+    np.testing.assert_array_equal(zones['start'], np.arange(0, len(columns[name]), chunk_rows))
+    assert zones['stop'][-1] == len(columns[name])
+    check_stats(ColumnStats(zones), columns[name])
+
+
+def test_all_missing():
+    values = np.full(6, np.datetime64('NaT', 'ms'))
+    stats = ColumnStats(column_zones(values, chunk_rows))
+    assert stats.count == 0 and stats.null_count == 6
+    assert stats.min is None and stats.max is None
+    assert stats.extremes(values).low is None
+    assert len(stats.chunks_between(date(0), date(1))) == 0
+    assert len(stats.rows_between(values, date(0))) == 0
+    empty = ColumnStats(column_zones(np.empty(0, dtype=np.int64), chunk_rows))
+    assert empty.rows == 0 and np.isnan(empty.mean)
+
+
+def test_cache(columns, tmp_path):
+    source = tmp_path / 'Users.xml'
+    source.write_text('<users />')
+    zones = table_zones(columns, chunk_rows)
+    save_columns(str(tmp_path / 'cache'), str(source), columns, zones=zones)
+    cached = load_columns(str(tmp_path / 'cache'), str(source))
+    assert cached is not None
+    cached_columns, _, _, cached_zones = cached
+    assert cached_zones.keys() == zones.keys()
+    for name, column_zones in zones.items():
+        assert cached_zones[name].dtype == column_zones.dtype
+        for field in column_zones.dtype.names:
+            np.testing.assert_array_equal(cached_zones[name][field], column_zones[field], err_msg=f'{name} {field}')
+        check_stats(ColumnStats(cached_zones[name]), cached_columns[name])